@@ -0,0 +1,83 @@
+"""
+Benchmark of decoding and parsing filter pages.
+
+    python benchmarks/advert_decoding.py [--fixtures ~/.cache/cars/responses] [--repeat 20]
+
+Fixtures are page responses saved as `.json` files or a response cache directory,
+record one with `cars --http-cache cache collecting collect`.
+Without fixtures pages of the local av.by stand-in are used.
+Compares the standard library decoder with the one used by the transport (orjson with the `fastjson` extra).
+"""
+import gzip
+import json
+from argparse import ArgumentParser
+from pathlib import Path
+from time import perf_counter
+from typing import List, Callable, Any
+
+from cars.domain.data_collectors.collectors import CarsParser
+from cars.domain.data_collectors.decoding import loads
+from fake_avby import FakeAvBy
+
+
+def load_fixtures(path: Path) -> List[bytes]:
+    pages = []
+    for fixture in sorted(path.rglob("*")):
+        if fixture.suffix == ".gz":
+            data = gzip.decompress(fixture.read_bytes())
+        elif fixture.suffix == ".json":
+            data = fixture.read_bytes()
+        else:
+            continue
+        # response caches keep homepages and metadata as well
+        if data.startswith(b"{") and b'"adverts"' in data:
+            pages.append(data)
+    return pages
+
+
+def generate_pages(pages_count: int) -> List[bytes]:
+    fake = FakeAvBy(pages=pages_count, advert_properties=40)
+    group = [{"name": "brand", "value": 1}, {"name": "model", "value": 1001}]
+    return [
+        json.dumps(
+            fake.get_page_response({"page": page_id, "properties": [{"value": [group]}]}), ensure_ascii=False
+        ).encode()
+        for page_id in range(1, pages_count + 1)
+    ]
+
+
+def measure(decode: Callable[[bytes], Any], pages: List[bytes], repeat: int) -> float:
+    start = perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            CarsParser.parse_page(decode(page))
+    return (perf_counter() - start) / repeat / len(pages)
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--fixtures", type=Path)
+    parser.add_argument("--pages", type=int, default=20, help="Generated pages, without fixtures.")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = load_fixtures(args.fixtures.expanduser()) if args.fixtures else generate_pages(args.pages)
+    if not pages:
+        raise SystemExit("No page fixtures found")
+    adverts = sum(len(CarsParser.parse_page(loads(page))[0]) for page in pages)
+    size = sum(len(page) for page in pages)
+    print(f"pages: {len(pages)}, adverts: {adverts}, average page size: {size / len(pages) / 1024:.1f} KB")
+    same = all(CarsParser.parse_page(loads(page)) == CarsParser.parse_page(json.loads(page)) for page in pages)
+    print(f"same result: {same}")
+
+    baseline = measure(json.loads, pages, args.repeat)
+    current = measure(loads, pages, args.repeat)
+    print(f"json:      {baseline * 1000:6.3f} ms per page, {size / len(pages) / baseline / 1024 / 1024:6.1f} MB/s")
+    print(
+        f"{loads.__module__:10} {current * 1000:6.3f} ms per page, "
+        f"{size / len(pages) / current / 1024 / 1024:6.1f} MB/s ({baseline / current:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main()
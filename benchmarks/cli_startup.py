@@ -0,0 +1,96 @@
+"""
+Benchmark of the CLI startup.
+
+    python benchmarks/cli_startup.py [--repeat 20] [--max-import-ms 150]
+
+Every command runs in a fresh interpreter in an empty directory, so a config read on import fails the run.
+Reported: median wall time of a bare interpreter, of `import cars.cli` and of `--help` of the commands.
+Exits with an error if the help loads any of `HEAVY_MODULES` or the import is slower than `--max-import-ms`.
+"""
+import subprocess
+import sys
+from argparse import ArgumentParser
+from statistics import median
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import List
+
+# only commands that collect or write data may need them
+HEAVY_MODULES = (
+    "yaml",
+    "pydantic",
+    "requests",
+    "aiohttp",
+    "xlwt",
+    "xlsxwriter",
+    "googleapiclient",
+    "numpy",
+    "pyarrow",
+    "pkg_resources",
+)
+
+HELP_RUNNER = """
+import sys
+from cars.cli import cli_root
+try:
+    cli_root(sys.argv[1:], standalone_mode=False)
+finally:
+    print(" ".join(name for name in {heavy!r} if name in sys.modules), file=sys.stderr)
+"""
+
+COMMANDS = (
+    ["--help"],
+    ["collecting", "collect", "--help"],
+    ["google_collecting", "collect", "--help"],
+    ["metadata", "--help"],
+)
+
+
+def measure(args: List[str], cwd: str, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = perf_counter()
+        subprocess.run(
+            [sys.executable, *args], cwd=cwd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        timings.append(perf_counter() - start)
+    return median(timings)
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-import-ms", type=float, default=150, help="Allowed `import cars.cli` over bare python.")
+    args = parser.parse_args()
+
+    failures = []
+    with TemporaryDirectory() as work_dir:
+        bare = measure(["-c", "pass"], work_dir, args.repeat)
+        imported = measure(["-c", "import cars.cli"], work_dir, args.repeat)
+        print(f"{'python':34} {bare * 1000:7.1f} ms")
+        print(f"{'import cars.cli':34} {imported * 1000:7.1f} ms (+{(imported - bare) * 1000:.1f} ms)")
+        if (imported - bare) * 1000 > args.max_import_ms:
+            failures.append(f"import cars.cli takes over {args.max_import_ms:.0f} ms")
+
+        runner = HELP_RUNNER.format(heavy=HEAVY_MODULES)
+        for command in COMMANDS:
+            elapsed = measure(["-c", runner, *command], work_dir, args.repeat)
+            process = subprocess.run(
+                [sys.executable, "-c", runner, *command],
+                cwd=work_dir,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                text=True,
+            )
+            loaded = process.stderr.split()
+            print(f"{' '.join(command):34} {elapsed * 1000:7.1f} ms")
+            if loaded:
+                failures.append(f"`{' '.join(command)}` loads {', '.join(loaded)}")
+
+    if failures:
+        raise SystemExit("\n".join(failures))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+End-to-end benchmark of the collect commands against the local av.by stand-in.
+
+    python benchmarks/collection.py [--cars 10] [--pages 10] [--latency 0.05] [--error-rate 0.01] [--jobs 4]
+        [--requests-per-second 10] [--adverts-per-car 30] [--batch]
+
+Every command runs in a separate process with a temporary config pointing at `fake_avby.py`.
+`collecting collect` runs with both engines, threads and async, unless `--batch` is given.
+Reported: wall time, pages per second, p50/p99 of request handling time on the server (with the added latency)
+and peak RSS of the process.
+`google_collecting collect` writes to `InMemorySheetsBackend`, so the export to Sheets is part of its numbers,
+the Sheets api calls it made are reported too.
+"""
+import json
+import subprocess
+import sys
+from argparse import ArgumentParser
+from os import environ
+from pathlib import Path
+from statistics import quantiles
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import List, Dict, Any, Optional, Union
+
+from fake_avby import FakeAvBy, start_server, FILTER_REQUEST, MODELS_REQUEST
+
+# runs a command and reports peak RSS of its own process, spreadsheets are kept in memory
+RUNNER = """
+import json, resource, sys
+import cars.cli.helpers
+from cars.cli import cli_root
+from cars.domain.google_sheets_integration.fake_backend import InMemorySheetsBackend
+
+backend = InMemorySheetsBackend()
+cars.cli.helpers.get_sheets_backend = lambda _: backend
+try:
+    cli_root(sys.argv[1:], standalone_mode=False)
+finally:
+    print("peak_rss_kb", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, file=sys.stderr)
+    print("sheets_calls", json.dumps(backend.calls), file=sys.stderr)
+"""
+
+
+def write_config(path: Path, address: str, max_page_requests: int, cars_count: int, requests_per_second: float) -> None:
+    app_config = {
+        "host": address,
+        "homepage_url": f"{address}/",
+        "filter_request": FILTER_REQUEST,
+        "models_request": MODELS_REQUEST,
+        "max_page_requests": max_page_requests,
+        "http": {"retries": 5, "backoff_base": 0.05, "backoff_max": 1},
+        "rate_limit": {"enabled": requests_per_second > 0, "requests_per_second": requests_per_second or 1},
+        "metadata_cache": {"enabled": False},
+    }
+    cars: List[Dict[str, Any]] = []
+    for i in range(1, cars_count + 1):
+        car: Dict[str, Any] = {"brand": f"Brand {i}", "model": "Model 1"}
+        if i % 2 == 0:
+            car["generations"] = ["Gen 1", "Gen 2"]
+        cars.append(car)
+    # json is valid yaml
+    (path / "config.yaml").write_text(json.dumps(app_config), encoding="utf-8")
+    (path / "cars.yaml").write_text(json.dumps({"cars": cars}), encoding="utf-8")
+
+
+def percentile(values: List[float], q: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return quantiles(values, n=100, method="inclusive")[q - 1]
+
+
+def run_command(fake: FakeAvBy, work_dir: Path, args: List[str]) -> Optional[Dict[str, Union[float, Dict[str, int]]]]:
+    fake.reset_stats()
+    # the spreadsheet is in memory, the settings are only checked to be set
+    env = dict(environ, CONFIG_PATH=f"{work_dir}/config/", SPREADSHEET_ID="benchmark", TOKEN_PATH="token.json")
+    start = perf_counter()
+    process = subprocess.run(
+        [sys.executable, "-c", RUNNER, *args], cwd=work_dir, env=env, capture_output=True, text=True
+    )
+    wall_time = perf_counter() - start
+    if process.returncode != 0:
+        print(process.stderr, file=sys.stderr)
+        return None
+
+    lines = process.stderr.splitlines()
+    peak_rss_kb = next(int(line.split()[1]) for line in lines if line.startswith("peak_rss_kb"))
+    sheets_calls = next(json.loads(line.split(maxsplit=1)[1]) for line in lines if line.startswith("sheets_calls"))
+    timings = [duration for durations in fake.timings.values() for duration in durations]
+    pages = len(fake.timings.get(FILTER_REQUEST, []))
+    return {
+        "wall_time": wall_time,
+        "pages": pages,
+        "pages_per_second": pages / wall_time,
+        "p50_ms": percentile(timings, 50) * 1000,
+        "p99_ms": percentile(timings, 99) * 1000,
+        "errors": fake.errors,
+        "peak_rss_mb": peak_rss_kb / 1024,
+        "sheets_calls": sheets_calls,
+    }
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--cars", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--adverts-per-page", type=int, default=25)
+    parser.add_argument("--adverts-per-car", type=int, help="Adverts of every car, full pages by default.")
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--max-page-requests", type=int, default=4)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--requests-per-second", type=float, default=10, help="Rate limit, 0 disables it.")
+    parser.add_argument("--batch", action="store_true", help="Collect cars by shared queries.")
+    args = parser.parse_args()
+
+    fake = FakeAvBy(
+        brands_count=max(args.cars, 60),
+        pages=args.pages,
+        adverts_per_page=args.adverts_per_page,
+        car_adverts=args.adverts_per_car,
+        latency=args.latency,
+        error_rate=args.error_rate,
+    )
+    server = start_server(fake)
+    address = f"http://127.0.0.1:{server.server_address[1]}"
+
+    commands = {
+        "collecting collect": ["collecting", "collect", "--jobs", str(args.jobs)],
+        "google_collecting collect": ["google_collecting", "collect", "--jobs", str(args.jobs)],
+    }
+    if args.batch:
+        for command in commands.values():
+            command.append("--batch")
+    else:
+        # batched queries are collected by threads only
+        commands["collecting collect --engine async"] = [
+            "collecting",
+            "collect",
+            "--jobs",
+            str(args.jobs),
+            "--engine",
+            "async",
+        ]
+
+    print(
+        f"cars: {args.cars}, adverts per car: {fake.car_adverts}, latency: {args.latency * 1000:.0f} ms, "
+        f"error rate: {args.error_rate:.0%}, max page requests: {args.max_page_requests}, jobs: {args.jobs}, "
+        f"rate limit: {args.requests_per_second or 'none'}, batch: {args.batch}"
+    )
+    with TemporaryDirectory() as tmp_dir:
+        work_dir = Path(tmp_dir)
+        (work_dir / "config").mkdir()
+        (work_dir / "dumps").mkdir()
+        write_config(work_dir / "config", address, args.max_page_requests, args.cars, args.requests_per_second)
+        for name, command in commands.items():
+            result = run_command(fake, work_dir, command)
+            if result is None:
+                print(f"{name}: failed")
+                continue
+            print(
+                f"{name}: {result['wall_time']:.2f} s, {result['pages']:.0f} pages, "
+                f"{result['pages_per_second']:.1f} pages/s, "
+                f"request p50 {result['p50_ms']:.1f} ms, p99 {result['p99_ms']:.1f} ms, "
+                f"{result['errors']:.0f} errors served, peak RSS {result['peak_rss_mb']:.1f} MB"
+            )
+            if result["sheets_calls"]:
+                print(f"  sheets api calls: {result['sheets_calls']}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""
+Local stand-in for the av.by homepage and api used by benchmarks.
+
+    python benchmarks/fake_avby.py [--port 8080] [--pages 10] [--latency 0.05] [--error-rate 0.01]
+
+Serves the homepage at `/`, models and generations at `models_request` and adverts at `filter_request`,
+point `host` and `homepage_url` of config.yaml at it, for example `http://127.0.0.1:8080`.
+Brands are named `Brand 1`, `Brand 2`..., models `Model 1`..., generations `Gen 1`..., body types `Body 1`...
+Every brand, model and generation has the same number of pages (or `--adverts-per-car` adverts),
+adverts are stable between requests.
+A filter with several brand groups lists adverts of every group one after another.
+"""
+import json
+import random
+from argparse import ArgumentParser
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Lock, Thread
+from time import sleep, perf_counter
+from typing import Dict, Any, List, Tuple, Optional
+
+from homepage_extraction import generate_homepage
+
+FILTER_REQUEST = "/offer-types/cars/filters/main/apply"
+MODELS_REQUEST = "/home/filters/home/update"
+
+
+class FakeAvBy:
+    def __init__(
+        self,
+        brands_count: int = 60,
+        models_count: int = 5,
+        generations_count: int = 3,
+        pages: int = 10,
+        adverts_per_page: int = 25,
+        advert_properties: int = 20,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        car_adverts: Optional[int] = None,
+    ) -> None:
+        self.brands_count = brands_count
+        self.models_count = models_count
+        self.generations_count = generations_count
+        self.pages = pages
+        self.adverts_per_page = adverts_per_page
+        # adverts of every brand, model and generation, full `pages` by default
+        self.car_adverts = pages * adverts_per_page if car_adverts is None else car_adverts
+        # extra properties of every advert, the parser skips them, they make pages heavier like real ones
+        self.advert_properties = advert_properties
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+        self.homepage = generate_homepage(brands_count, adverts_count=0)
+        self._random = random.Random(seed)
+        self._lock = Lock()
+        # path -> request handling times in seconds
+        self.timings: Dict[str, List[float]] = {}
+        self.errors = 0
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            return self._random.random() < self.error_rate
+
+    def record(self, path: str, duration: float, failed: bool) -> None:
+        with self._lock:
+            self.timings.setdefault(path, []).append(duration)
+            self.errors += failed
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.timings = {}
+            self.errors = 0
+
+    def get_models_response(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        selected = {item["name"]: item["value"] for item in payload["properties"][0]["value"][0]}
+        brand_id = selected["brand"]
+        if "model" not in selected:
+            options = [
+                {"label": f"Model {i}", "intValue": brand_id * 1000 + i} for i in range(1, self.models_count + 1)
+            ]
+            return {"properties": [{"value": [[None, None, {"options": options}]]}]}
+        options = [
+            {"label": f"Gen {i}", "intValue": selected["model"] * 100 + i} for i in range(1, self.generations_count + 1)
+        ]
+        return {"properties": [{"value": [[None, None, None, {"options": options}]]}]}
+
+    def get_advert(self, car_key: Tuple[int, int, Optional[int]], advert_id: int) -> Dict[str, Any]:
+        brand_id, model_id, generation_id = car_key
+        rnd = random.Random(f"{self.seed}:{car_key}:{advert_id}")
+        generation = generation_id % 100 if generation_id is not None else rnd.randint(1, self.generations_count)
+        properties = [
+            {"name": "brand", "value": f"Brand {brand_id}"},
+            {"name": "model", "value": f"Model {model_id % 1000}"},
+            {"name": "generation", "value": f"Gen {generation}"},
+            {"name": "body_type", "value": f"Body {rnd.randint(1, 5)}"},
+        ]
+        properties.extend(
+            {"id": j, "name": f"property_{j}", "value": f"value {rnd.randint(0, 1000)}"}
+            for j in range(self.advert_properties)
+        )
+        return {
+            "id": advert_id,
+            "price": {"usd": {"amount": rnd.randint(1000, 30000)}},
+            "year": rnd.randint(1990, 2022),
+            "publicUrl": f"https://cars.av.by/{'/'.join(map(str, car_key))}/{advert_id}",
+            "originalDaysOnSale": rnd.randint(1, 300),
+            "properties": properties,
+        }
+
+    def get_page_response(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Every brand group of the filter has `car_adverts` adverts, adverts of groups follow each other.
+        """
+        car_keys = []
+        for group in payload["properties"][0]["value"]:
+            selected = {item["name"]: item["value"] for item in group}
+            car_keys.append((selected["brand"], selected["model"], selected.get("generation")))
+        page_id = payload["page"]
+        count = self.car_adverts * len(car_keys)
+        start = (page_id - 1) * self.adverts_per_page
+        end = min(start + self.adverts_per_page, count)
+        adverts = [
+            self.get_advert(car_keys[index // self.car_adverts], index % self.car_adverts)
+            for index in range(start, end)
+        ]
+        return {
+            "adverts": adverts,
+            "pageCount": max(1, -(-count // self.adverts_per_page)),
+            "count": count,
+        }
+
+    def handle(self, method: str, path: str, body: bytes) -> Tuple[int, str, bytes]:
+        if self.latency:
+            sleep(self.latency)
+        if self.should_fail():
+            return 503, "text/plain", b"Service Unavailable"
+        if method == "GET" and path == "/":
+            return 200, "text/html; charset=utf-8", self.homepage.encode()
+        if method == "POST" and path == MODELS_REQUEST:
+            return 200, "application/json", json.dumps(self.get_models_response(json.loads(body))).encode()
+        if method == "POST" and path == FILTER_REQUEST:
+            return 200, "application/json", json.dumps(self.get_page_response(json.loads(body))).encode()
+        return 404, "text/plain", b"Not Found"
+
+
+def create_server(fake: FakeAvBy, port: int = 0) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _respond(self, method: str) -> None:
+            start = perf_counter()
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            status, content_type, data = fake.handle(method, self.path, body)
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            fake.record(self.path, perf_counter() - start, status != 200)
+
+        def do_GET(self) -> None:
+            self._respond("GET")
+
+        def do_POST(self) -> None:
+            self._respond("POST")
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_server(fake: FakeAvBy, port: int = 0) -> ThreadingHTTPServer:
+    """
+    Serve in a background thread, the address is `server.server_address`.
+    """
+    server = create_server(fake, port)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--brands", type=int, default=60)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--adverts-per-page", type=int, default=25)
+    parser.add_argument("--adverts-per-car", type=int, help="Adverts of every car, full pages by default.")
+    parser.add_argument("--advert-properties", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests answered with 503.")
+    args = parser.parse_args()
+
+    fake = FakeAvBy(
+        brands_count=args.brands,
+        pages=args.pages,
+        adverts_per_page=args.adverts_per_page,
+        car_adverts=args.adverts_per_car,
+        advert_properties=args.advert_properties,
+        latency=args.latency,
+        error_rate=args.error_rate,
+    )
+    server = create_server(fake, args.port)
+    print(f"serving on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
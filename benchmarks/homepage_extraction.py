@@ -0,0 +1,97 @@
+"""
+Benchmark of homepage metadata extraction.
+
+    python benchmarks/homepage_extraction.py [--fixture saved_homepage.html] [--repeat 10]
+
+Without a fixture a synthetic page of a similar shape and size is generated.
+A real fixture can be saved with `curl -o homepage.html https://cars.av.by/`.
+"""
+import json
+import re
+from argparse import ArgumentParser
+from pathlib import Path
+from time import perf_counter
+from typing import Dict, Tuple, Callable, Any
+
+from cars.domain.data_collectors.homepage import extract_homepage_metadata
+
+
+def generate_homepage(brands_count: int = 250, adverts_count: int = 3000) -> str:
+    brands = [{"id": i, "label": f"Brand {i}", "intValue": i} for i in range(1, brands_count + 1)]
+    body_types = [{"id": i, "label": f"Body {i}", "intValue": i} for i in range(1, 20)]
+    adverts = [
+        {
+            "id": 100000 + i,
+            "publicUrl": f"https://cars.av.by/brand/model/{100000 + i}",
+            "properties": [{"id": j, "name": f"property_{j}", "value": f"value {j}"} for j in range(20)],
+        }
+        for i in range(adverts_count)
+    ]
+    state = {
+        "props": {
+            "initialState": {
+                "filter": {
+                    "brands": {"name": "brand", "options": brands},
+                    "body_type": {"name": "body_type", "options": body_types},
+                },
+                "adverts": adverts,
+            }
+        }
+    }
+    buttons = "".join(f'<button data-property-name="brand">{brand["label"]}</button>' for brand in brands[:60])
+    return (
+        f"<html><body>{buttons}"
+        f'<script id="__NEXT_DATA__" type="application/json">{json.dumps(state, ensure_ascii=False, separators=(",", ":"))}</script>'
+        f"</body></html>"
+    )
+
+
+def legacy_extract(data: str) -> Tuple[Dict[str, int], Dict[str, int]]:
+    """
+    Per-vendor regex scans used before the single-pass extractor, kept for comparison.
+    """
+    names = set(name[1] for name in re.findall(r'(data-property-name="brand">)(.*?)(</button>)', data))
+    vendors = {}
+    for name in names:
+        name_fixed = name.replace("(", r"\(").replace(")", r"\)")
+        ids = set(_id[1] for _id in re.findall(f'("id":)([0-9]*?)(,"label":"{name_fixed}")', data))
+        if len(ids) == 1:
+            vendors[name] = int(ids.pop())
+
+    body_types_str = re.findall(r'("body_type":\{.*?"options":\[)(.*?)(\].*?\})', data)[0][1]
+    body_types = {}
+    for match in re.findall(r"\{.*?\}", body_types_str):
+        body_types[re.findall('("label":")(.*?)(")', match)[0][1]] = int(
+            re.findall('("intValue":)([0-9]*)', match)[0][1]
+        )
+    return vendors, body_types
+
+
+def measure(func: Callable[[str], Any], data: str, repeat: int) -> float:
+    start = perf_counter()
+    for _ in range(repeat):
+        func(data)
+    return (perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--fixture", type=Path)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    data = args.fixture.read_text(encoding="utf-8") if args.fixture else generate_homepage()
+    metadata = extract_homepage_metadata(data)
+    legacy_vendors, legacy_body_types = legacy_extract(data)
+
+    print(f"page size: {len(data) / 1024 / 1024:.2f} MB, brands: {len(metadata.vendors)}")
+    print(f"ambiguous brands: {metadata.ambiguous_vendors}")
+    print(f"same result as legacy: {(metadata.vendors, metadata.body_types) == (legacy_vendors, legacy_body_types)}")
+    legacy_time = measure(legacy_extract, data, args.repeat)
+    new_time = measure(extract_homepage_metadata, data, args.repeat)
+    print(f"legacy:      {legacy_time * 1000:8.1f} ms")
+    print(f"single pass: {new_time * 1000:8.1f} ms ({legacy_time / new_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark of writing collected data to Google Sheets, against the in-memory backend.
+
+    python benchmarks/sheets_backend.py [--sheets 10 100 1000] [--rows 100]
+
+For every number of car sheets, three runs are made on the same spreadsheet:
+a full rewrite, a sync with unchanged data and a full rewrite through the values api.
+Reported: time to build operations, time to split and send them, api calls and payload bytes.
+"""
+import random
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import List, Tuple, Dict, Any
+
+from cars.cli.helpers import add_gsheet_operations
+from cars.domain.data_collectors.batch import CarJob, CarJobResultT
+from cars.domain.google_sheets_integration.fake_backend import InMemorySheetsBackend
+from cars.domain.google_sheets_integration.sheets import SheetsRequests
+
+RUNS: Dict[str, Dict[str, Any]] = {
+    "rewrite": {},
+    "sync, unchanged": {"sync": True},
+    "values api": {"values_api_sheets": True},
+}
+
+
+def generate_results(sheets_count: int, rows_count: int) -> List[Tuple[CarJob, CarJobResultT]]:
+    rnd = random.Random(sheets_count)
+    results: List[Tuple[CarJob, CarJobResultT]] = []
+    for i in range(sheets_count):
+        job = CarJob(f"Brand {i // 10}", f"Model {i % 10}", "", None)
+        rows = [
+            (
+                rnd.randint(1000, 30000),
+                rnd.randint(1990, 2022),
+                f"https://cars.av.by/brand/model/{100000000 + i * rows_count + j}",
+                rnd.randint(1, 300),
+                rnd.choice(["купе", "седан", "лифтбек"]),
+            )
+            for j in range(rows_count)
+        ]
+        results.append((job, rows))
+    return results
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--sheets", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--rows", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"rows per sheet: {args.rows}")
+    for sheets_count in args.sheets:
+        results = generate_results(sheets_count, args.rows)
+        backend = InMemorySheetsBackend()
+        for name, options in RUNS.items():
+            backend.calls.clear()
+            backend.sent_bytes.clear()
+            requests = SheetsRequests(backend, "benchmark")
+
+            start = perf_counter()
+            add_gsheet_operations(requests, results, lambda *_: None, **options)
+            build_time = perf_counter() - start
+            start = perf_counter()
+            requests.execute()
+            send_time = perf_counter() - start
+
+            print(
+                f"{sheets_count:5} sheets, {name:16}: build {build_time * 1000:8.1f} ms, "
+                f"send {send_time * 1000:8.1f} ms, {sum(backend.calls.values()):4} calls, "
+                f"{sum(backend.sent_bytes.values()) / 1024:9.0f} KiB "
+                f"({', '.join(f'{method}: {count}' for method, count in sorted(backend.calls.items()))})"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Size check of the Google Sheets batchUpdate body written for a car sheet.
+
+    python benchmarks/sheets_payload.py [--rows 5000] [--max-cell-overhead 64]
+
+Compares the body with the one that embedded the cell format into every cell.
+Exits with an error when the body adds more than `--max-cell-overhead` bytes per cell to the bare values as JSON,
+so a change that brings per cell formatting back fails `make benchmark`.
+"""
+import json
+import random
+import sys
+from argparse import ArgumentParser
+from time import perf_counter
+from typing import List, Dict, Any, Callable, Tuple
+
+from cars.cli.helpers import get_write_operations
+from cars.domain.data_collectors.collectors import CarsParser
+from cars.domain.google_sheets_integration.operations import WriteData, ChangeBorder, HEADER_FORMAT, REGULAR_FORMAT
+
+
+def generate_values(rows_count: int) -> List[List[Any]]:
+    rnd = random.Random(rows_count)
+    values: List[List[Any]] = [list(CarsParser.columns_order)]
+    for i in range(rows_count):
+        values.append(
+            [
+                rnd.randint(1000, 30000),
+                rnd.randint(1990, 2022),
+                f"https://cars.av.by/ford/probe/{100000000 + i}",
+                rnd.randint(1, 300),
+                rnd.choice(["купе", "седан", "лифтбек"]),
+            ]
+        )
+    return values
+
+
+def legacy_body(sheet_id: int, values: List[List[Any]]) -> Dict[str, Any]:
+    serialize = WriteData.serialize_value
+    rows = []
+    for i, row in enumerate(values):
+        cells = []
+        for value in row:
+            serialized_value = serialize(value)
+            cells.append(
+                {
+                    "userEnteredValue": {"formulaValue": serialized_value}
+                    if serialized_value.startswith("=")
+                    else {"stringValue": serialized_value},
+                    "userEnteredFormat": HEADER_FORMAT if i == 0 else REGULAR_FORMAT,
+                }
+            )
+        rows.append({"values": cells})
+    requests = [
+        {"updateCells": {"rows": rows, "fields": "*", "start": {"sheetId": sheet_id, "rowIndex": 0, "columnIndex": 0}}},
+        ChangeBorder(sheet_id, 0, len(values[0]), 0, len(values)).to_dict(),
+    ]
+    return {"requests": requests, "includeSpreadsheetInResponse": False}
+
+
+def current_body(sheet_id: int, values: List[List[Any]]) -> Dict[str, Any]:
+    requests = [operation.to_dict() for operation in get_write_operations(sheet_id, values)]
+    return {"requests": requests, "includeSpreadsheetInResponse": False}
+
+
+def measure(build: Callable[[int, List[List[Any]]], Dict[str, Any]], values: List[List[Any]]) -> Tuple[int, float]:
+    start = perf_counter()
+    size = len(json.dumps(build(1, values)).encode())
+    return size, perf_counter() - start
+
+
+def main() -> None:
+    parser = ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--max-cell-overhead", type=int, default=64)
+    args = parser.parse_args()
+
+    values = generate_values(args.rows)
+    values_size = len(json.dumps(values).encode())
+    legacy_size, legacy_time = measure(legacy_body, values)
+    current_size, current_time = measure(current_body, values)
+
+    print(f"rows: {args.rows}, bare values: {values_size / 1024:.0f} KiB")
+    print(f"per cell format: {legacy_size / 1024:.0f} KiB, built and serialized in {legacy_time * 1000:.1f} ms")
+    print(f"range format:    {current_size / 1024:.0f} KiB, built and serialized in {current_time * 1000:.1f} ms")
+    cells_count = sum(len(row) for row in values)
+    cell_overhead = (current_size - values_size) / cells_count
+    print(f"{cell_overhead:.0f} bytes per cell over bare values, {legacy_size / current_size:.1f}x smaller body")
+    if cell_overhead > args.max_cell_overhead:
+        sys.exit(f"body adds {cell_overhead:.0f} bytes per cell, expected at most {args.max_cell_overhead}")
+
+
+if __name__ == "__main__":
+    main()
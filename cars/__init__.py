@@ -1,6 +1,10 @@
-from pkg_resources import get_distribution, DistributionNotFound
+def __getattr__(name: str) -> str:
+    # resolved on access, distribution metadata is slow to load and most runs never need it
+    if name == "__version__":
+        from importlib.metadata import version, PackageNotFoundError
 
-try:
-    __version__ = get_distribution("cars").version
-except DistributionNotFound:
-    __version__ = "0.0"
+        try:
+            return version("cars")
+        except PackageNotFoundError:
+            return "0.0"
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
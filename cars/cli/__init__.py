@@ -1,12 +1,79 @@
+from typing import Optional, Any
+
 import click
 from cars.cli.collector import collecting_group
 from cars.cli.collector_google import collecting_group as google_collecting_group
+from cars.cli.metadata import metadata_group
 
 
 @click.group()
-def cli_root() -> None:
-    pass
+@click.option(
+    "--metrics-report",
+    "report_path",
+    type=click.Path(dir_okay=False),
+    envvar="CARS_METRICS_REPORT",
+    help="JSON file to write timings and counters of the run to.",
+)
+@click.option(
+    "--metrics-textfile",
+    "textfile_path",
+    type=click.Path(dir_okay=False),
+    envvar="CARS_METRICS_TEXTFILE",
+    help="File to write the same metrics to in the Prometheus text format, for the node exporter textfile collector.",
+)
+@click.option(
+    "--http-cache",
+    "http_cache_mode",
+    type=click.Choice(["live", "cache", "replay"]),
+    envvar="CARS_HTTP_CACHE",
+    help="Mode of the av.by response cache, `response_cache.mode` of config.yaml by default. "
+    "cache reuses fresh responses and stores new ones, replay uses stored ones only and works offline.",
+)
+@click.pass_context
+def cli_root(
+    ctx: click.Context, report_path: Optional[str], textfile_path: Optional[str], http_cache_mode: Optional[str]
+) -> None:
+    if http_cache_mode:
+        from cars.domain.data_collectors.response_cache import get_response_cache
+
+        get_response_cache().mode = http_cache_mode
+    if report_path or textfile_path:
+        from datetime import datetime
+        from time import perf_counter
+
+        started_at = datetime.now().replace(microsecond=0).isoformat()
+        start = perf_counter()
+        ctx.call_on_close(lambda: write_run_metrics(report_path, textfile_path, started_at, perf_counter() - start))
+
+
+@cli_root.result_callback()
+def mark_success(*args: Any, **kwargs: Any) -> None:
+    from cars.metrics import get_metrics
+
+    get_metrics().set("run_success", 1)
+
+
+def write_run_metrics(
+    report_path: Optional[str], textfile_path: Optional[str], started_at: str, duration: float
+) -> None:
+    """
+    Write metrics of the finished command, `run_success` is 0 if it failed.
+    """
+    from pathlib import Path
+    from time import time
+    from cars.metrics import get_metrics
+
+    metrics = get_metrics()
+    success = ("run_success", ()) in metrics.gauges
+    metrics.set("run_success", int(success))
+    metrics.set("run_duration_seconds", duration)
+    metrics.set("run_finished_timestamp_seconds", time())
+    if report_path:
+        metrics.write_report(Path(report_path), started_at=started_at, success=success)
+    if textfile_path:
+        metrics.write_prometheus(Path(textfile_path))
 
 
 cli_root.add_command(collecting_group)
 cli_root.add_command(google_collecting_group)
+cli_root.add_command(metadata_group)
@@ -1,10 +1,19 @@
 from datetime import datetime
-from typing import Optional, List
+from pathlib import Path
+from typing import Optional, Union, Iterator, Iterable, Tuple, TYPE_CHECKING
 
 import click
-from xlwt import Workbook, Worksheet, XFStyle, Font, Borders, Alignment, Formula  # type: ignore
 
-from cars.domain.data_collectors.collectors import CarsParser
+from cars.cli.sinks import DEFAULT_ROW_GROUP_SIZE, TEXT_COMPRESSIONS
+
+if TYPE_CHECKING:
+    from cars.cli.sinks import ExportSink
+    from cars.cli.xls_collector import DataCollector
+    from cars.cli.xlsx_collector import XlsxDataCollector
+    from cars.domain.data_collectors.batch import CarJob
+    from cars.domain.data_collectors.collectors import CarDataT
+
+SUMMARY_COLUMNS = ("Производитель", "Модель", "Поколение", "Год от", "Год до", "Мин цена", "Макс цена")
 
 
 @click.group("collecting")
@@ -16,7 +25,65 @@ def collecting_group() -> None:
 
 
 @collecting_group.command("collect")
-def collect() -> None:
+@click.option(
+    "--jobs",
+    "-j",
+    "jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of cars collected at once.",
+)
+@click.option(
+    "--history",
+    "history_path",
+    type=click.Path(dir_okay=False),
+    help="SQLite database to add collected adverts to.",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["xls", "xlsx", "csv", "jsonl", "parquet"]),
+    default="xls",
+    show_default=True,
+    help=(
+        "Output file format. All but xls are written as data comes, xlsx and parquet need extras of the same name. "
+        "The xlsx summary is saved to a .summary.xlsx file next to it."
+    ),
+)
+@click.option(
+    "--compression",
+    type=click.Choice(["none", "gzip", "snappy", "zstd"]),
+    help="Compression of csv and jsonl (gzip) or parquet (any, snappy by default) files.",
+)
+@click.option(
+    "--row-group-size",
+    type=click.IntRange(min=1),
+    default=DEFAULT_ROW_GROUP_SIZE,
+    show_default=True,
+    help="Rows per parquet row group.",
+)
+@click.option(
+    "--batch",
+    is_flag=True,
+    help="Collect cars with the same body types by shared queries, fewer requests for cars with few adverts.",
+)
+@click.option(
+    "--engine",
+    type=click.Choice(["threads", "async"]),
+    default="threads",
+    show_default=True,
+    help="Run jobs on threads or on one asyncio event loop, async needs the extra of the same name.",
+)
+def collect(
+    jobs: int,
+    history_path: Optional[str],
+    output_format: str,
+    compression: Optional[str],
+    row_group_size: int,
+    batch: bool,
+    engine: str,
+) -> None:
     """
     Collect data for cars from ads.
 
@@ -24,162 +91,137 @@ def collect() -> None:
 
         cars collecting collect
 
-        Will collect cars data and store it at `output/{current_date}.xls`.
+        Will collect cars data and store it at `dumps/{current_date}.xls`.
     """
-    from cars.config import cars_config
-    from cars.exceptions import ApiRequestError, ProjectError
-
-    data_collector = DataCollector()
-
-    for car in sorted(cars_config.cars, key=lambda x: (x.brand, x.model)):
-        generations = car.generations or [""]
-        for generation in sorted(generations):
-            click.echo(f"Collecting data for {car.brand} {car.model}", nl=False)
-            if generation:
-                click.echo(f" {generation}", nl=False)
+    from cars.config import get_cars_config
+    from cars.cli.sinks import get_export_sink
+    from cars.domain.data_collectors.batch import get_car_jobs, collect_cars_data, stream_cars_data
+    from cars.domain.history.store import HistoryStore
+    from cars.exceptions import ProjectError
+    from cars.metrics import get_metrics
+
+    if batch and engine == "async":
+        raise click.BadParameter("batched queries are collected by the threads engine only", param_hint="--engine")
+    # no compression is valid for every format
+    if compression is not None and compression != "none":
+        if output_format in ("xls", "xlsx"):
+            raise click.BadParameter(f"{output_format} files can't be compressed", param_hint="--compression")
+        if output_format != "parquet" and compression not in TEXT_COMPRESSIONS:
+            raise click.BadParameter(f"{output_format} files support gzip only", param_hint="--compression")
+
+    started_at = datetime.now().replace(microsecond=0)
+    filename = f"dumps/{started_at.strftime('%Y-%m-%d.%H-%M-%S')}.{output_format}"
+    if output_format != "parquet" and compression == "gzip":
+        filename += ".gz"
+    output_filenames = [filename]
+    data_collector: Union["DataCollector", "XlsxDataCollector", "ExportSink"]
+    if output_format == "xlsx":
+        from cars.cli.xlsx_collector import XlsxDataCollector
+
+        data_collector = XlsxDataCollector(filename)
+        output_filenames.append(data_collector.summary_filename)
+    elif output_format == "xls":
+        from cars.cli.xls_collector import DataCollector
+
+        data_collector = DataCollector(filename)
+    else:
+        data_collector = get_export_sink(output_format, filename, compression, row_group_size)
+    history = HistoryStore(Path(history_path)) if history_path else None
+    metrics = get_metrics()
+
+    car_jobs = get_car_jobs(get_cars_config().cars)
+    results: Iterator[Tuple["CarJob", Union[Iterable["CarDataT"], ProjectError]]]
+    if batch or engine == "async":
+        # cars of a batch share pages and the async engine returns whole cars
+        results = collect_cars_data(car_jobs, jobs, batch, engine)
+    else:
+        results = stream_cars_data(car_jobs, jobs)
+    try:
+        for job, car_data in results:
+            click.echo(f"Collecting data for {job.brand} {job.model}", nl=False)
+            if job.generation:
+                click.echo(f" {job.generation}", nl=False)
             click.echo(nl=True)
+            if isinstance(car_data, ProjectError):
+                click.echo(car_data)
+                continue
+            if history is not None:
+                car_data = history.track(job.brand, job.model, job.generation, car_data, started_at)
             try:
-                data_collector.add_car_data(car.brand, car.model, generation, car.body_types)
-            except ApiRequestError as ex:
-                click.echo(ex)
+                with metrics.timer("export_build_seconds", format=output_format, stage="add"):
+                    data_collector.add_car_data(job.brand, job.model, job.generation, car_data)
             except ProjectError as ex:
+                # a streamed car fails while it is read, rows written before stay in flat files
                 click.echo(ex)
+    finally:
+        if history is not None:
+            history.close()
+
+    for output_filename in output_filenames:
+        click.echo(output_filename)
+    with metrics.timer("export_build_seconds", format=output_format, stage="save"):
+        data_collector.save()
+
+
+@collecting_group.command("delta")
+@click.option(
+    "--state",
+    "state_path",
+    type=click.Path(dir_okay=False),
+    default="dumps/known_adverts.json",
+    show_default=True,
+    help="File with adverts seen by the previous run.",
+)
+@click.option("--full", "force_full", is_flag=True, help="Load every page even if the early stop is possible.")
+def delta(state_path: str, force_full: bool) -> None:
+    """
+    Report adverts added, removed or changed in price since the previous run.
 
-    current_time = datetime.now()
-    current_time = current_time.replace(microsecond=0)
-    filename = f"dumps/{current_time.strftime('%Y-%m-%d.%H-%M-%S')}.xls"
-    click.echo(filename)
-    data_collector.save(filename)
-
-
-class DataCollector:
-    def __init__(self):
-        self.wb = Workbook()
-        self.main_sheet: Worksheet = self.wb.add_sheet("Общее")
-        self.style = XFStyle()
-        self.header_style = XFStyle()
-        bold_font = Font()
-        bold_font.bold = True
-        regular_font = Font()
-        regular_font.bold = False
-        borders = Borders()
-        borders.top = Borders.THIN
-        borders.bottom = Borders.THIN
-        borders.left = Borders.THIN
-        borders.right = Borders.THIN
-        regular_alignment = Alignment()
-        regular_alignment.horz = Alignment.HORZ_LEFT
-        regular_alignment.vert = Alignment.VERT_CENTER
-        header_alignment = Alignment()
-        header_alignment.horz = Alignment.HORZ_CENTER
-        header_alignment.vert = Alignment.VERT_CENTER
-        self.style.borders = borders
-        self.style.alignment = regular_alignment
-        self.style.font = regular_font
-        self.header_style.borders = borders
-        self.header_style.alignment = header_alignment
-        self.header_style.font = bold_font
-
-        for column_id, name in enumerate(
-            ("Производитель", "Модель", "Поколение", "Год от", "Год до", "Мин цена", "Макс цена"),
-        ):
-            self.main_sheet.write(0, column_id, name, self.header_style)
-
-        self.first_brand_match = None
-        self.first_model_match = None
-        self.last_brand_value = None
-        self.last_model_value = None
-
-    def add_car_data(self, brand: str, model: str, generation: str, body_types: Optional[List[str]]) -> None:
-        parser = CarsParser(brand, model, generation, body_types)
-        car_data = parser.car_data
-        if not car_data:
-            return
-
-        sheet_name = f"{brand} {model}"
-        if generation:
-            sheet_name += f" {generation.replace('· ', '')}"
-        if len(sheet_name) > 31:
-            sheet_name = sheet_name.replace("Рестайлинг", "Рест")
-        sheet: Worksheet = self.wb.add_sheet(sheet_name)
-        for column_id, column_name in enumerate(CarsParser.columns_order):
-            sheet.write(0, column_id, column_name, self.header_style)
-        max_year = max(x[1] for x in car_data)
-        for data in sorted(car_data, key=lambda x: (max_year - x[1], x[4], x[3])):
-            row_id = sheet.last_used_row + 1
-            for column_id, val in enumerate(data):
-                if column_id == 2:
-                    assert isinstance(val, str)
-                    val = Formula(f'HYPERLINK("{val}";"{val.split("/")[-1]}")')
-                sheet.write(row_id, column_id, val, self.style)
-
-        min_price = min(data[0] for data in car_data)
-        max_price = max(data[0] for data in car_data)
-        min_year = min(data[1] for data in car_data)
-        max_year = max(data[1] for data in car_data)
-        main_sheet_row = self.main_sheet.last_used_row + 1
-        for column_id, val in enumerate(
-            (brand, model, generation, min_year, max_year, min_price, max_price),
-        ):
-            if val is None:
-                continue
-            if column_id == 0:
-                # is brand
-                if self.first_brand_match is None:
-                    self.first_brand_match = main_sheet_row
-                    self.last_brand_value = val
-                else:
-                    if self.last_brand_value == val:
-                        continue
-                    self.main_sheet.write_merge(
-                        self.first_brand_match,
-                        main_sheet_row - 1,
-                        column_id,
-                        column_id,
-                        self.last_brand_value,
-                        self.style,
-                    )
-                    self.first_brand_match = main_sheet_row
-                    self.last_brand_value = val
-            elif column_id == 1:
-                # is model
-                if self.first_model_match is None:
-                    self.first_model_match = main_sheet_row
-                    self.last_model_value = val
-                else:
-                    if self.last_model_value == val:
-                        continue
-                    self.main_sheet.write_merge(
-                        self.first_model_match,
-                        main_sheet_row - 1,
-                        column_id,
-                        column_id,
-                        self.last_model_value,
-                        self.style,
-                    )
-                    self.first_model_match = main_sheet_row
-                    self.last_model_value = val
-            else:
-                self.main_sheet.write(main_sheet_row, column_id, val, self.style)
-
-    def save(self, filename):
-        if self.first_brand_match is not None:
-            self.main_sheet.write_merge(
-                self.first_brand_match,
-                self.main_sheet.last_used_row,
-                0,
-                0,
-                self.last_brand_value,
-                self.style,
-            )
-
-        if self.first_model_match is not None:
-            self.main_sheet.write_merge(
-                self.first_model_match,
-                self.main_sheet.last_used_row,
-                1,
-                1,
-                self.last_model_value,
-                self.style,
-            )
-        self.wb.save(filename)
+    Example:
+
+        cars collecting delta
+
+        Will compare current ads with `dumps/known_adverts.json` and update it.
+    """
+    from cars.config import get_cars_config
+    from cars.domain.data_collectors.batch import get_car_jobs
+    from cars.domain.data_collectors.collectors import CarsParser
+    from cars.domain.data_collectors.delta import KnownAdvertsState, crawl_delta
+    from cars.exceptions import ProjectError
+
+    state = KnownAdvertsState(Path(state_path))
+    for job in get_car_jobs(get_cars_config().cars):
+        click.echo(f"Collecting data for {job.brand} {job.model}", nl=False)
+        if job.generation:
+            click.echo(f" {job.generation}", nl=False)
+        click.echo(nl=True)
+        try:
+            parser = CarsParser(job.brand, job.model, job.generation, job.body_types)
+            report = crawl_delta(parser, state.get(job.brand, job.model, job.generation), force_full)
+        except ProjectError as ex:
+            click.echo(ex)
+            continue
+
+        if report.warning:
+            click.echo(report.warning)
+        click.echo(
+            f"new: {len(report.new)}, price changed: {len(report.price_changed)}, removed: {len(report.removed)}"
+        )
+        for data in report.new:
+            click.echo(f"+ {CarsParser.render_car_data(data)}")
+        for url, old_price, new_price in report.price_changed:
+            click.echo(f"~ {old_price}\t{new_price}\t{url}")
+        for url in report.removed:
+            click.echo(f"- {url}")
+        state.set(job.brand, job.model, job.generation, report.known)
+
+    state.save()
+
+
+def get_sheet_name(brand: str, model: str, generation: str) -> str:
+    sheet_name = f"{brand} {model}"
+    if generation:
+        sheet_name += f" {generation.replace('· ', '')}"
+    if len(sheet_name) > 31:
+        sheet_name = sheet_name.replace("Рестайлинг", "Рест")
+    return sheet_name
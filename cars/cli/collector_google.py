@@ -1,7 +1,9 @@
-from typing import Optional
+from typing import Optional, Tuple
 
 import click
 
+DEFAULT_JOURNAL_PATH = "dumps/sheets_journal.json"
+
 
 @click.group("google_collecting")
 def collecting_group() -> None:
@@ -18,18 +20,120 @@ def collecting_group() -> None:
     "spreadsheet_id",
     type=str,
 )
-def collect(spreadsheet_id: Optional[str] = None):
-    from os import environ
+@click.option(
+    "--jobs",
+    "-j",
+    "jobs",
+    type=click.IntRange(min=1),
+    default=1,
+    show_default=True,
+    help="Number of cars collected at once.",
+)
+@click.option(
+    "--history",
+    "history_path",
+    type=click.Path(dir_okay=False),
+    help="SQLite database to add collected adverts to.",
+)
+@click.option(
+    "--journal",
+    "journal_path",
+    type=click.Path(dir_okay=False),
+    default=DEFAULT_JOURNAL_PATH,
+    show_default=True,
+    help="File to keep spreadsheet updates in until they are applied, used by `resume` after a failure.",
+)
+@click.option(
+    "--sync",
+    is_flag=True,
+    help="Read existing sheets and write only changed rows instead of clearing and writing them again.",
+)
+@click.option(
+    "--values-api",
+    "values_api_sheets",
+    multiple=True,
+    help="Sheet to write with the values api, numbers stay numeric. Can be repeated, `*` means every sheet.",
+)
+@click.option(
+    "--batch",
+    is_flag=True,
+    help="Collect cars with the same body types by shared queries, fewer requests for cars with few adverts.",
+)
+def collect(
+    spreadsheet_id: Optional[str] = None,
+    jobs: int = 1,
+    history_path: Optional[str] = None,
+    journal_path: str = DEFAULT_JOURNAL_PATH,
+    sync: bool = False,
+    values_api_sheets: Tuple[str, ...] = (),
+    batch: bool = False,
+):
+    from pathlib import Path
     from cars.cli.helpers import collect_to_gsheet
+    from cars.domain.history.store import HistoryStore
+
+    spreadsheet_id, credentials_json_path = get_spreadsheet_settings(spreadsheet_id)
+    if not spreadsheet_id or not credentials_json_path:
+        return
+    click.echo(credentials_json_path)
+    history = HistoryStore(Path(history_path)) if history_path else None
+    try:
+        collect_to_gsheet(
+            spreadsheet_id,
+            credentials_json_path,
+            click.echo,
+            jobs,
+            history,
+            Path(journal_path),
+            sync,
+            "*" in values_api_sheets or set(values_api_sheets),
+            batch=batch,
+        )
+    finally:
+        if history is not None:
+            history.close()
+
+
+@collecting_group.command("resume")
+@click.option(
+    "--spreadsheet-id",
+    "-s",
+    "spreadsheet_id",
+    type=str,
+)
+@click.option(
+    "--journal",
+    "journal_path",
+    type=click.Path(dir_okay=False),
+    default=DEFAULT_JOURNAL_PATH,
+    show_default=True,
+    help="Journal left by the failed `collect`.",
+)
+def resume(spreadsheet_id: Optional[str] = None, journal_path: str = DEFAULT_JOURNAL_PATH):
+    """
+    Apply spreadsheet updates that a failed `collect` did not send, without collecting data again.
+    """
+    from pathlib import Path
+    from cars.cli.helpers import get_sheets_backend
+    from cars.domain.google_sheets_integration.sheets import SheetsRequests
+
+    spreadsheet_id, credentials_json_path = get_spreadsheet_settings(spreadsheet_id)
+    if not spreadsheet_id or not credentials_json_path:
+        return
+    SheetsRequests(get_sheets_backend(credentials_json_path), spreadsheet_id, Path(journal_path)).resume()
+    click.echo("Done")
+
+
+def get_spreadsheet_settings(spreadsheet_id: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    from os import environ
 
     if not spreadsheet_id:
         spreadsheet_id = environ.get("SPREADSHEET_ID")
         if not spreadsheet_id:
             click.echo("One of spreadsheet_id option and SPREADSHEET_ID environment variable must be provided.")
-            return
+            return None, None
     credentials_json_path = environ.get("TOKEN_PATH")
     if not credentials_json_path:
         click.echo("Environment variable TOKEN_PATH must be set")
-        return
-    click.echo(credentials_json_path)
-    collect_to_gsheet(spreadsheet_id, credentials_json_path, click.echo)
+        return None, None
+    return spreadsheet_id, credentials_json_path
@@ -1,19 +1,118 @@
-from typing import List, Any, Optional, Callable
+from datetime import datetime
+from pathlib import Path
+from time import perf_counter
+from typing import List, Any, Optional, Callable, Union, Collection, Iterable, Tuple
 
-from cars.config import cars_config
+from cars.config import get_cars_config
+from cars.domain.data_collectors.batch import CarJob, CarJobResultT, get_car_jobs, collect_cars_data
 from cars.domain.data_collectors.collectors import CarsParser
+from cars.domain.data_collectors.summary import CarSummary
 from cars.domain.google_sheets_integration.operations import (
+    Operation,
     AddSheet,
     ClearSheet,
     WriteData,
+    WriteValues,
+    FormatCells,
+    ClearRows,
     ChangeBorder,
     ResizeColumns,
     DeleteSheet,
     MergeCells,
     UnmergeAllCells,
+    HEADER_FORMAT,
+    REGULAR_FORMAT,
 )
+from cars.domain.google_sheets_integration.backend import SheetsBackend
 from cars.domain.google_sheets_integration.sheets import SheetsRequests
-from cars.exceptions import ApiRequestError, ProjectError
+from cars.domain.history.store import HistoryStore
+from cars.exceptions import ProjectError
+from cars.metrics import get_metrics
+
+
+def get_format_operations(sheet_id: int, width: int, height: int) -> List[Operation]:
+    """
+    Header row and body formats with borders of a table.
+    """
+    operations: List[Operation] = [FormatCells(sheet_id, 0, width, 0, 1, HEADER_FORMAT)]
+    if height > 1:
+        operations.append(FormatCells(sheet_id, 0, width, 1, height - 1, REGULAR_FORMAT))
+    operations.append(ChangeBorder(sheet_id, 0, width, 0, height))
+    return operations
+
+
+def get_data_operation(
+    sheet_id: int, sheet_values: List[List[Any]], start_row: int = 0, title: Optional[str] = None
+) -> WriteData:
+    """
+    Sheets written with the values api are passed with their title, others are written with `updateCells`.
+    """
+    if title is not None:
+        return WriteValues(sheet_id, title, sheet_values, start_row)
+    return WriteData(sheet_id, sheet_values, start_row)
+
+
+def get_write_operations(sheet_id: int, sheet_values: List[List[Any]], title: Optional[str] = None) -> List[Operation]:
+    """
+    Values with a header row, formatted and bordered as a table.
+    """
+    operations: List[Operation] = [get_data_operation(sheet_id, sheet_values, 0, title)]
+    operations.extend(get_format_operations(sheet_id, len(sheet_values[0]), len(sheet_values)))
+    return operations
+
+
+def _get_row_key(row: List[Any]) -> List[str]:
+    key = [str(value) for value in row]
+    while key and key[-1] == "":
+        key.pop()
+    return key
+
+
+def get_sync_operations(
+    sheet_id: int, current_values: List[List[Any]], sheet_values: List[List[Any]], title: Optional[str] = None
+) -> List[Operation]:
+    """
+    Operations turning `current_values`, as read from the sheet, into `sheet_values`.
+    Only runs of changed rows are written, rows left after the end are cleared,
+    formats and borders are applied again only when the number of rows changes.
+    Nothing is returned for a sheet that did not change.
+    """
+    current_keys = [_get_row_key(row) for row in current_values]
+    while current_keys and not current_keys[-1]:
+        current_keys.pop()
+    new_keys = [_get_row_key([WriteData.serialize_value(value) for value in row]) for row in sheet_values]
+
+    operations: List[Operation] = []
+    changed_from: Optional[int] = None
+    for row_id in range(len(new_keys) + 1):
+        is_changed = row_id < len(new_keys) and (
+            row_id >= len(current_keys) or current_keys[row_id] != new_keys[row_id]
+        )
+        if is_changed and changed_from is None:
+            changed_from = row_id
+        elif not is_changed and changed_from is not None:
+            operations.append(get_data_operation(sheet_id, sheet_values[changed_from:row_id], changed_from, title))
+            changed_from = None
+
+    if len(current_keys) > len(new_keys):
+        operations.append(ClearRows(sheet_id, len(new_keys), len(current_keys)))
+    if len(current_keys) != len(new_keys):
+        operations.extend(get_format_operations(sheet_id, len(sheet_values[0]), len(sheet_values)))
+    return operations
+
+
+def blank_merged_values(sheet_values: List[List[Any]], column_ids: List[int]) -> List[List[Any]]:
+    """
+    Copy of values with cells that `get_merge_operations` merges into the one above left empty,
+    the way they are read back from a sheet.
+    """
+    result = [list(row) for row in sheet_values]
+    for column_id in column_ids:
+        for row_id in range(2, len(sheet_values)):
+            value = sheet_values[row_id][column_id]
+            if value and value == sheet_values[row_id - 1][column_id]:
+                result[row_id][column_id] = ""
+    return result
 
 
 def get_merge_operations(sheet_id: int, sheet_values: List[List[Any]], column_id) -> List[MergeCells]:
@@ -53,11 +152,68 @@ def get_merge_operations(sheet_id: int, sheet_values: List[List[Any]], column_id
     return operations
 
 
-def collect_to_gsheet(spreadsheet_id: str, credentials_json_path: str, print_func: Optional[Callable]) -> None:
+def get_sheets_backend(credentials_json_path: str) -> SheetsBackend:
+    """
+    Backend of the Google Sheets api authorized with the service account credentials.
+    """
+    # googleapiclient is slow to import and isn't needed with another backend
+    from cars.domain.google_sheets_integration.google_backend import GoogleSheetsBackend
+
+    return GoogleSheetsBackend(credentials_json_path)
+
+
+def collect_to_gsheet(
+    spreadsheet_id: str,
+    credentials_json_path: str,
+    print_func: Optional[Callable],
+    jobs: int = 1,
+    history: Optional[HistoryStore] = None,
+    journal_path: Optional[Path] = None,
+    sync: bool = False,
+    values_api_sheets: Union[bool, Collection[str]] = False,
+    backend: Optional[SheetsBackend] = None,
+    batch: bool = False,
+) -> None:
+    """
+    Collect data for configured cars and write it to the spreadsheet, see `add_gsheet_operations`.
+    The api is used through `backend`, by default with the credentials from `credentials_json_path`.
+    """
     print_func = print_func or print
-    requests = SheetsRequests(credentials_json_path, spreadsheet_id)
+    started_at = datetime.now()
+    requests = SheetsRequests(backend or get_sheets_backend(credentials_json_path), spreadsheet_id, journal_path)
+    results = collect_cars_data(get_car_jobs(get_cars_config().cars), jobs, batch)
+    add_gsheet_operations(requests, results, print_func, history, started_at, sync, values_api_sheets)
+    with get_metrics().timer("sheets_execute_seconds"):
+        requests.execute()
+
+    print_func("Done")
+
+
+def add_gsheet_operations(
+    requests: SheetsRequests,
+    results: Iterable[Tuple[CarJob, CarJobResultT]],
+    print_func: Callable = print,
+    history: Optional[HistoryStore] = None,
+    started_at: Optional[datetime] = None,
+    sync: bool = False,
+    values_api_sheets: Union[bool, Collection[str]] = False,
+) -> None:
+    """
+    Add operations writing collected data to a sheet per car and the Summary sheet.
+    By default existing sheets are cleared and written again, with `sync` they are read first
+    and only changed rows are written.
+    Values of sheets from `values_api_sheets`, or of every sheet if it is True, are written with the values api.
+    """
+
+    def get_values_api_title(name: str) -> Optional[str]:
+        if values_api_sheets is True or (not isinstance(values_api_sheets, bool) and name in values_api_sheets):
+            return name
+        return None
+
+    started_at = started_at or datetime.now()
     sheets_data = requests.get_sheets_data()
     main_sheet_name = "Summary"
+    current_values = requests.get_values(list(sheets_data)) if sync else {}
 
     next_sheet_id = max(data["id"] for data in sheets_data.values()) + 1
 
@@ -69,8 +225,9 @@ def collect_to_gsheet(spreadsheet_id: str, credentials_json_path: str, print_fun
         requests.add_operation(AddSheet(main_sheet_name, next_sheet_id))
         next_sheet_id += 1
     else:
-        requests.add_operation(UnmergeAllCells(sheets_data[main_sheet_name]["id"]))
-        requests.add_operation(ClearSheet(sheets_data[main_sheet_name]["id"]))
+        if not sync:
+            requests.add_operation(UnmergeAllCells(sheets_data[main_sheet_name]["id"]))
+            requests.add_operation(ClearSheet(sheets_data[main_sheet_name]["id"]))
         sheets_data[main_sheet_name]["used"] = True
 
     new_summary_values: List[List[Any]] = [
@@ -85,78 +242,96 @@ def collect_to_gsheet(spreadsheet_id: str, credentials_json_path: str, print_fun
         ]
     ]
 
-    for car in sorted(cars_config.cars, key=lambda x: (x.brand, x.model)):
-        generations = car.generations or [""]
-        for generation in sorted(generations):
-            sheet_name = f"{car.brand} {car.model}"
-            if generation:
-                sheet_name += f" {generation}"
-
-            print_func(sheet_name)
-
-            try:
-                parser = CarsParser(car.brand, car.model, generation, car.body_types)
-                columns_order = parser.columns_order
-                car_data = parser.car_data
-            except ApiRequestError as ex:
-                print_func(ex)
-                continue
-            except ProjectError as ex:
-                print_func(ex)
-                continue
-
-            if not car_data:
-                continue
-
-            if sheet_name not in sheets_data:
-                sheets_data[sheet_name] = {
-                    "id": next_sheet_id,
-                    "used": True,
-                }
-                requests.add_operation(AddSheet(sheet_name, next_sheet_id))
-            else:
+    metrics = get_metrics()
+    columns_order = CarsParser.columns_order
+    for job, car_data in results:
+        sheet_name = f"{job.brand} {job.model}"
+        if job.generation:
+            sheet_name += f" {job.generation}"
+
+        print_func(sheet_name)
+
+        if isinstance(car_data, ProjectError):
+            print_func(car_data)
+            continue
+
+        if not car_data:
+            continue
+
+        if history is not None:
+            history.add_observations(job.brand, job.model, job.generation, car_data, started_at)
+
+        build_started_at = perf_counter()
+        if sheet_name not in sheets_data:
+            sheets_data[sheet_name] = {
+                "id": next_sheet_id,
+                "used": True,
+            }
+            requests.add_operation(AddSheet(sheet_name, next_sheet_id))
+        else:
+            if not sync:
                 requests.add_operation(ClearSheet(sheets_data[sheet_name]["id"]))
-                sheets_data[sheet_name]["used"] = True
-            new_spreadsheet_data = [list(columns_order)]
-
-            max_year = max(x[1] for x in car_data)
-            for ad_data in sorted(car_data, key=lambda x: (max_year - x[1], x[4], x[3])):
-                new_spreadsheet_data.append(list(ad_data))
-
-            new_summary_values.append(
-                [
-                    car.brand,
-                    car.model,
-                    generation,
-                    min(data[1] for data in car_data),
-                    max(data[1] for data in car_data),
-                    min(data[0] for data in car_data),
-                    max(data[0] for data in car_data),
-                ]
-            )
+            sheets_data[sheet_name]["used"] = True
+        summary = CarSummary()
+        new_spreadsheet_data: List[List[Any]] = [list(columns_order)]
+        new_spreadsheet_data.extend(
+            list(ad_data) for ad_data in sorted(summary.track(car_data), key=CarsParser.sort_key)
+        )
 
-            requests.add_operation(WriteData(sheets_data[sheet_name]["id"], new_spreadsheet_data))
-            requests.add_operation(
-                ChangeBorder(sheets_data[sheet_name]["id"], 0, len(columns_order), 0, len(new_spreadsheet_data))
+        new_summary_values.append(
+            [
+                job.brand,
+                job.model,
+                job.generation,
+                summary.min_year,
+                summary.max_year,
+                summary.min_price,
+                summary.max_price,
+            ]
+        )
+
+        if sheet_name in current_values:
+            operations = get_sync_operations(
+                sheets_data[sheet_name]["id"],
+                current_values[sheet_name],
+                new_spreadsheet_data,
+                get_values_api_title(sheet_name),
             )
-            requests.add_operation(ResizeColumns(sheets_data[sheet_name]["id"]))
-            next_sheet_id += 1
-
-    requests.add_operation(WriteData(sheets_data[main_sheet_name]["id"], new_summary_values))
-    requests.add_operation(
-        ChangeBorder(sheets_data[main_sheet_name]["id"], 0, len(new_summary_values[0]), 0, len(new_summary_values))
-    )
-    requests.add_operation(ResizeColumns(sheets_data[main_sheet_name]["id"]))
-    for operation in get_merge_operations(sheets_data[main_sheet_name]["id"], new_summary_values, 0):
-        requests.add_operation(operation)
-    for operation in get_merge_operations(sheets_data[main_sheet_name]["id"], new_summary_values, 1):
+        else:
+            operations = get_write_operations(
+                sheets_data[sheet_name]["id"], new_spreadsheet_data, get_values_api_title(sheet_name)
+            )
+        if operations:
+            operations.append(ResizeColumns(sheets_data[sheet_name]["id"]))
+        for operation in operations:
+            requests.add_operation(operation)
+        next_sheet_id += 1
+        metrics.observe("sheets_build_seconds", perf_counter() - build_started_at, sheet="car")
+
+    build_started_at = perf_counter()
+    main_sheet_id = sheets_data[main_sheet_name]["id"]
+    merge_operations = get_merge_operations(main_sheet_id, new_summary_values, 0)
+    merge_operations.extend(get_merge_operations(main_sheet_id, new_summary_values, 1))
+    if main_sheet_name in current_values:
+        # merged cells read back empty, only the top one keeps the value
+        operations = get_sync_operations(
+            main_sheet_id,
+            current_values[main_sheet_name],
+            blank_merged_values(new_summary_values, [0, 1]),
+            get_values_api_title(main_sheet_name),
+        )
+        if operations:
+            operations.insert(0, UnmergeAllCells(main_sheet_id))
+    else:
+        operations = get_write_operations(main_sheet_id, new_summary_values, get_values_api_title(main_sheet_name))
+    if operations:
+        operations.append(ResizeColumns(main_sheet_id))
+        operations.extend(merge_operations)
+    for operation in operations:
         requests.add_operation(operation)
+    metrics.observe("sheets_build_seconds", perf_counter() - build_started_at, sheet="summary")
 
     for data in sheets_data.values():
         if data["used"]:
             continue
         requests.add_operation(DeleteSheet(data["id"]))
-
-    requests.execute()
-
-    print_func("Done")
@@ -0,0 +1,42 @@
+import click
+
+
+@click.group("metadata")
+def metadata_group() -> None:
+    """
+    Tasks for av.by metadata (brands, models, generations and body types).
+    """
+    pass
+
+
+@metadata_group.command("refresh")
+def refresh() -> None:
+    """
+    Drop the metadata cache and fetch metadata for cars from config again.
+
+    Example:
+
+        cars metadata refresh
+    """
+    from cars.config import get_cars_config
+    from cars.domain.data_collectors.collectors import VendorsMetadata, init_basic_metadata
+    from cars.domain.data_collectors.metadata_cache import get_metadata_cache
+    from cars.exceptions import ProjectError
+
+    cache = get_metadata_cache()
+    cache.invalidate()
+    init_basic_metadata(use_cache=False)
+    for name, ids in sorted(VendorsMetadata.ambiguous_ids.items()):
+        click.echo(f"Ambiguous id: {name} - {ids}")
+
+    for car in sorted(get_cars_config().cars, key=lambda x: (x.brand, x.model)):
+        click.echo(f"{car.brand} {car.model}")
+        try:
+            if car.generations:
+                VendorsMetadata.get_generations(car.brand, car.model, use_cache=False)
+            else:
+                VendorsMetadata.get_models(car.brand, use_cache=False)
+        except ProjectError as ex:
+            click.echo(ex)
+
+    click.echo(cache.path)
@@ -0,0 +1,142 @@
+import csv
+import gzip
+import json
+from itertools import islice
+from typing import Iterable, List, Optional, TextIO, Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from cars.domain.data_collectors.collectors import CarDataT
+
+EXPORT_COLUMNS = ("brand", "model", "generation", "price", "year", "url", "days", "body_type")
+TEXT_COMPRESSIONS = ("none", "gzip")
+DEFAULT_ROW_GROUP_SIZE = 64 * 1024
+
+
+def open_text(filename: str, compression: str) -> TextIO:
+    if compression == "gzip":
+        return gzip.open(filename, "wt", encoding="utf-8", newline="")
+    return open(filename, "w", encoding="utf-8", newline="")
+
+
+class ExportSink:
+    """
+    Flat file with one row per advert, written row by row as data comes, adverts of a car in the order of pages.
+    Every row has the car brand, model and generation next to the advert data.
+    """
+
+    def add_car_data(self, brand: str, model: str, generation: str, car_data: Iterable["CarDataT"]) -> None:
+        raise NotImplementedError()
+
+    def save(self) -> None:
+        raise NotImplementedError()
+
+
+class CsvSink(ExportSink):
+    def __init__(self, filename: str, compression: str = "none") -> None:
+        self.file = open_text(filename, compression)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_COLUMNS)
+
+    def add_car_data(self, brand: str, model: str, generation: str, car_data: Iterable["CarDataT"]) -> None:
+        self.writer.writerows((brand, model, generation, *row) for row in car_data)
+
+    def save(self) -> None:
+        self.file.close()
+
+
+class JsonLinesSink(ExportSink):
+    def __init__(self, filename: str, compression: str = "none") -> None:
+        self.file = open_text(filename, compression)
+
+    def add_car_data(self, brand: str, model: str, generation: str, car_data: Iterable["CarDataT"]) -> None:
+        for row in car_data:
+            data = dict(zip(EXPORT_COLUMNS, (brand, model, generation, *row)))
+            self.file.write(json.dumps(data, ensure_ascii=False))
+            self.file.write("\n")
+
+    def save(self) -> None:
+        self.file.close()
+
+
+class ParquetSink(ExportSink):
+    """
+    Adverts are read in chunks and buffered until a full row group is collected,
+    so row groups do not depend on how many adverts each car has.
+    Needs the `parquet` extra.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        compression: str = "snappy",
+        row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    ) -> None:
+        import pyarrow as pa  # type: ignore
+        import pyarrow.parquet as pq  # type: ignore
+
+        self.row_group_size = row_group_size
+        self.schema = pa.schema(
+            [
+                ("brand", pa.string()),
+                ("model", pa.string()),
+                ("generation", pa.string()),
+                ("price", pa.int32()),
+                ("year", pa.int32()),
+                ("url", pa.string()),
+                ("days", pa.int32()),
+                ("body_type", pa.dictionary(pa.uint16(), pa.string())),
+            ]
+        )
+        self.writer = pq.ParquetWriter(filename, self.schema, compression=compression)
+        self._pending: List[Any] = []
+        self._pending_rows = 0
+
+    def add_car_data(self, brand: str, model: str, generation: str, car_data: Iterable["CarDataT"]) -> None:
+        import pyarrow as pa
+
+        from cars.domain.data_collectors.columnar import CarDataColumns
+
+        rows = iter(car_data)
+        while True:
+            columns = CarDataColumns.from_rows(islice(rows, self.row_group_size))
+            if not len(columns):
+                return
+            table = columns.to_arrow()
+            for position, value in enumerate((brand, model, generation)):
+                table = table.add_column(position, EXPORT_COLUMNS[position], pa.repeat(value, len(columns)))
+            self._pending.append(table)
+            self._pending_rows += len(columns)
+            if self._pending_rows >= self.row_group_size:
+                self._flush(keep_remainder=True)
+
+    def save(self) -> None:
+        self._flush(keep_remainder=False)
+        self.writer.close()
+
+    def _flush(self, keep_remainder: bool) -> None:
+        import pyarrow as pa
+
+        if not self._pending:
+            return
+        table = pa.concat_tables(self._pending)
+        size = len(table) // self.row_group_size * self.row_group_size if keep_remainder else len(table)
+        if size:
+            self.writer.write_table(table.slice(0, size), row_group_size=self.row_group_size)
+        remainder = table.slice(size)
+        self._pending = [remainder] if len(remainder) else []
+        self._pending_rows = len(remainder)
+
+
+def get_export_sink(
+    output_format: str,
+    filename: str,
+    compression: Optional[str],
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+) -> ExportSink:
+    if output_format == "parquet":
+        return ParquetSink(filename, compression or "snappy", row_group_size)
+    if output_format == "csv":
+        return CsvSink(filename, compression or "none")
+    if output_format == "jsonl":
+        return JsonLinesSink(filename, compression or "none")
+    raise ValueError(f"Unknown export format {output_format}")
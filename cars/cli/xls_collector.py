@@ -0,0 +1,129 @@
+from typing import Iterable
+
+from xlwt import Workbook, Worksheet, XFStyle, Font, Borders, Alignment, Formula  # type: ignore
+
+from cars.cli.collector import SUMMARY_COLUMNS, get_sheet_name
+from cars.domain.data_collectors.collectors import CarsParser, CarDataT
+from cars.domain.data_collectors.summary import CarSummary
+
+
+class DataCollector:
+    def __init__(self, filename):
+        self.filename = filename
+        self.wb = Workbook()
+        self.main_sheet: Worksheet = self.wb.add_sheet("Общее")
+        self.style = XFStyle()
+        self.header_style = XFStyle()
+        bold_font = Font()
+        bold_font.bold = True
+        regular_font = Font()
+        regular_font.bold = False
+        borders = Borders()
+        borders.top = Borders.THIN
+        borders.bottom = Borders.THIN
+        borders.left = Borders.THIN
+        borders.right = Borders.THIN
+        regular_alignment = Alignment()
+        regular_alignment.horz = Alignment.HORZ_LEFT
+        regular_alignment.vert = Alignment.VERT_CENTER
+        header_alignment = Alignment()
+        header_alignment.horz = Alignment.HORZ_CENTER
+        header_alignment.vert = Alignment.VERT_CENTER
+        self.style.borders = borders
+        self.style.alignment = regular_alignment
+        self.style.font = regular_font
+        self.header_style.borders = borders
+        self.header_style.alignment = header_alignment
+        self.header_style.font = bold_font
+
+        for column_id, name in enumerate(SUMMARY_COLUMNS):
+            self.main_sheet.write(0, column_id, name, self.header_style)
+
+        self.first_brand_match = None
+        self.first_model_match = None
+        self.last_brand_value = None
+        self.last_model_value = None
+
+    def add_car_data(self, brand: str, model: str, generation: str, car_data: Iterable[CarDataT]) -> None:
+        summary = CarSummary()
+        rows = sorted(summary.track(car_data), key=CarsParser.sort_key)
+        if not rows:
+            return
+
+        sheet: Worksheet = self.wb.add_sheet(get_sheet_name(brand, model, generation))
+        for column_id, column_name in enumerate(CarsParser.columns_order):
+            sheet.write(0, column_id, column_name, self.header_style)
+        for data in rows:
+            row_id = sheet.last_used_row + 1
+            for column_id, val in enumerate(data):
+                if column_id == 2:
+                    assert isinstance(val, str)
+                    val = Formula(f'HYPERLINK("{val}";"{val.split("/")[-1]}")')
+                sheet.write(row_id, column_id, val, self.style)
+
+        main_sheet_row = self.main_sheet.last_used_row + 1
+        for column_id, val in enumerate(
+            (brand, model, generation, summary.min_year, summary.max_year, summary.min_price, summary.max_price),
+        ):
+            if val is None:
+                continue
+            if column_id == 0:
+                # is brand
+                if self.first_brand_match is None:
+                    self.first_brand_match = main_sheet_row
+                    self.last_brand_value = val
+                else:
+                    if self.last_brand_value == val:
+                        continue
+                    self.main_sheet.write_merge(
+                        self.first_brand_match,
+                        main_sheet_row - 1,
+                        column_id,
+                        column_id,
+                        self.last_brand_value,
+                        self.style,
+                    )
+                    self.first_brand_match = main_sheet_row
+                    self.last_brand_value = val
+            elif column_id == 1:
+                # is model
+                if self.first_model_match is None:
+                    self.first_model_match = main_sheet_row
+                    self.last_model_value = val
+                else:
+                    if self.last_model_value == val:
+                        continue
+                    self.main_sheet.write_merge(
+                        self.first_model_match,
+                        main_sheet_row - 1,
+                        column_id,
+                        column_id,
+                        self.last_model_value,
+                        self.style,
+                    )
+                    self.first_model_match = main_sheet_row
+                    self.last_model_value = val
+            else:
+                self.main_sheet.write(main_sheet_row, column_id, val, self.style)
+
+    def save(self):
+        if self.first_brand_match is not None:
+            self.main_sheet.write_merge(
+                self.first_brand_match,
+                self.main_sheet.last_used_row,
+                0,
+                0,
+                self.last_brand_value,
+                self.style,
+            )
+
+        if self.first_model_match is not None:
+            self.main_sheet.write_merge(
+                self.first_model_match,
+                self.main_sheet.last_used_row,
+                1,
+                1,
+                self.last_model_value,
+                self.style,
+            )
+        self.wb.save(self.filename)
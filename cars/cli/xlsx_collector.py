@@ -0,0 +1,90 @@
+from typing import Iterable, List, Tuple, Dict, Optional, Any
+
+import xlsxwriter  # type: ignore
+
+from cars.cli.collector import SUMMARY_COLUMNS, get_sheet_name
+from cars.domain.data_collectors.collectors import CarsParser, CarDataT
+from cars.domain.data_collectors.summary import CarSummary
+
+SummaryRowT = Tuple[str, str, str, Optional[int], Optional[int], Optional[int], Optional[int]]
+
+
+def get_summary_filename(filename: str) -> str:
+    stem = filename[: -len(".xlsx")] if filename.endswith(".xlsx") else filename
+    return f"{stem}.summary.xlsx"
+
+
+class XlsxDataCollector:
+    """
+    Writes collected cars data to .xlsx.
+    Car sheets are written to disk row by row as they come, so memory use does not grow with the number of adverts.
+    Only the summary, one row per car, is kept until `save`. It is written to a workbook of its own next to the car
+    sheets: constant memory mode writes rows strictly in order, so it can't have cells merged across rows.
+    """
+
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.summary_filename = get_summary_filename(filename)
+        self.wb = xlsxwriter.Workbook(filename, {"constant_memory": True})
+        self.style, self.header_style = self._add_formats(self.wb)
+        self.summary_rows: List[SummaryRowT] = []
+
+    @staticmethod
+    def _add_formats(wb: Any) -> Tuple[Any, Any]:
+        cell_format: Dict[str, Any] = {"border": 1, "valign": "vcenter"}
+        return wb.add_format({**cell_format, "align": "left"}), wb.add_format(
+            {**cell_format, "align": "center", "bold": True}
+        )
+
+    def add_car_data(self, brand: str, model: str, generation: str, car_data: Iterable[CarDataT]) -> None:
+        summary = CarSummary()
+        rows = sorted(summary.track(car_data), key=CarsParser.sort_key)
+        if not rows:
+            return
+
+        sheet = self.wb.add_worksheet(get_sheet_name(brand, model, generation))
+        sheet.write_row(0, 0, CarsParser.columns_order, self.header_style)
+        for row_id, (price, year, url, days, body_type) in enumerate(rows, start=1):
+            advert_id = url.split("/")[-1]
+            sheet.write_number(row_id, 0, price, self.style)
+            sheet.write_number(row_id, 1, year, self.style)
+            # a formula is a plain string here, and unlike hyperlinks it has no per sheet limit
+            sheet.write_formula(row_id, 2, f'=HYPERLINK("{url}","{advert_id}")', self.style, advert_id)
+            sheet.write_number(row_id, 3, days, self.style)
+            sheet.write_string(row_id, 4, body_type, self.style)
+
+        self.summary_rows.append(
+            (brand, model, generation, summary.min_year, summary.max_year, summary.min_price, summary.max_price)
+        )
+
+    def save(self) -> None:
+        self.wb.close()
+
+        summary_wb = xlsxwriter.Workbook(self.summary_filename)
+        style, header_style = self._add_formats(summary_wb)
+        sheet = summary_wb.add_worksheet("Общее")
+        sheet.write_row(0, 0, SUMMARY_COLUMNS, header_style)
+        for row_id, row in enumerate(self.summary_rows, start=1):
+            for column_id, val in enumerate(row):
+                if val is None:
+                    sheet.write_blank(row_id, column_id, None, style)
+                else:
+                    sheet.write(row_id, column_id, val, style)
+        for column_id in (0, 1):
+            for first_row, last_row in self._get_merged_rows(column_id):
+                sheet.merge_range(
+                    first_row, column_id, last_row, column_id, self.summary_rows[first_row - 1][column_id], style
+                )
+        summary_wb.close()
+
+    def _get_merged_rows(self, column_id: int) -> Iterable[Tuple[int, int]]:
+        first_row = 1
+        for row_id in range(2, len(self.summary_rows) + 2):
+            if (
+                row_id <= len(self.summary_rows)
+                and self.summary_rows[row_id - 1][: column_id + 1] == self.summary_rows[first_row - 1][: column_id + 1]
+            ):
+                continue
+            if row_id - 1 > first_row:
+                yield first_row, row_id - 1
+            first_row = row_id
@@ -1,17 +1,50 @@
 from os import environ
 from pathlib import Path
-import yaml
+from threading import Lock
+from typing import Optional, Any, TYPE_CHECKING
 
-from cars.config.app import AppConfig
-from cars.config.cars import CarsConfig
+if TYPE_CHECKING:
+    from cars.config.app import AppConfig
+    from cars.config.cars import CarsConfig
 
 config_root = environ.get("CONFIG_PATH", "config/")
 
-_config_path = Path(f"{config_root}config.yaml").expanduser()
-_cars_path = Path(f"{config_root}cars.yaml").expanduser()
+# configs are read on first use, so `--help` and commands that don't need them start without pydantic and yaml
+_APP_CONFIG: Optional["AppConfig"] = None
+_CARS_CONFIG: Optional["CarsConfig"] = None
+_CONFIG_LOCK = Lock()
 
-_config_mapping = yaml.full_load(_config_path.read_text(encoding="utf-8"))
-_cars_config_mapping = yaml.full_load(_cars_path.read_text(encoding="utf-8"))
 
-app_config = AppConfig(**_config_mapping)
-cars_config = CarsConfig(**_cars_config_mapping)
+def _read_yaml(name: str) -> Any:
+    import yaml
+
+    return yaml.full_load(Path(f"{config_root}{name}").expanduser().read_text(encoding="utf-8"))
+
+
+def get_app_config() -> "AppConfig":
+    global _APP_CONFIG
+    with _CONFIG_LOCK:
+        if _APP_CONFIG is None:
+            from cars.config.app import AppConfig
+
+            _APP_CONFIG = AppConfig(**_read_yaml("config.yaml"))
+    return _APP_CONFIG
+
+
+def get_cars_config() -> "CarsConfig":
+    global _CARS_CONFIG
+    with _CONFIG_LOCK:
+        if _CARS_CONFIG is None:
+            from cars.config.cars import CarsConfig
+
+            _CARS_CONFIG = CarsConfig(**_read_yaml("cars.yaml"))
+    return _CARS_CONFIG
+
+
+def __getattr__(name: str) -> Any:
+    # `from cars.config import app_config` of scripts written before the configs became lazy
+    if name == "app_config":
+        return get_app_config()
+    if name == "cars_config":
+        return get_cars_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,9 +1,75 @@
-from pydantic import AnyHttpUrl
+from typing import Literal, Optional
+
+from pydantic import AnyHttpUrl, PositiveInt, PositiveFloat, conint, confloat
 
 from cars.config.base import ImmutableBaseModel
 
 
+class HttpConfig(ImmutableBaseModel):
+    connect_timeout: PositiveFloat = 10
+    read_timeout: PositiveFloat = 30
+    # connections kept per host, by default enough for every request in flight: jobs times max_page_requests
+    pool_size: Optional[PositiveInt] = None
+    retries: conint(ge=0) = 3  # type: ignore
+    backoff_base: PositiveFloat = 0.5
+    backoff_max: PositiveFloat = 30
+
+
+class RateLimitConfig(ImmutableBaseModel):
+    """
+    Limits of av.by requests shared by all cars collected at once, see `AdaptiveLimit`.
+    """
+
+    enabled: bool = True
+    requests_per_second: PositiveFloat = 10
+    burst: PositiveInt = 10
+    # requests in flight, adjusted between min and max depending on how the server responds
+    initial_concurrency: PositiveInt = 4
+    min_concurrency: PositiveInt = 1
+    max_concurrency: PositiveInt = 16
+    # seconds, slower responses lower concurrency as errors do
+    latency_target: PositiveFloat = 5
+    decrease_factor: confloat(gt=0, lt=1) = 0.5  # type: ignore
+
+
+class MetadataCacheConfig(ImmutableBaseModel):
+    enabled: bool = True
+    path: str = "~/.cache/cars/metadata.json"
+    # seconds
+    homepage_ttl: PositiveInt = 7 * 24 * 60 * 60
+    models_ttl: PositiveInt = 7 * 24 * 60 * 60
+    generations_ttl: PositiveInt = 7 * 24 * 60 * 60
+
+
+class ResponseCacheConfig(ImmutableBaseModel):
+    # live: always request av.by, cache: reuse responses younger than ttl and store new ones,
+    # replay: only stored responses of any age, no requests at all
+    mode: Literal["live", "cache", "replay"] = "live"
+    path: str = "~/.cache/cars/responses"
+    # seconds
+    ttl: PositiveInt = 6 * 60 * 60
+
+
+class SheetsConfig(ImmutableBaseModel):
+    # serialized size of one batchUpdate body, the api rejects too large requests
+    max_chunk_bytes: PositiveInt = 2 * 1024 * 1024
+    # sheets updated at once
+    workers: PositiveInt = 4
+
+
 class AppConfig(ImmutableBaseModel):
     host: AnyHttpUrl
+    # page with brands and body types
+    homepage_url: AnyHttpUrl = "https://cars.av.by/"  # type: ignore
     filter_request: str
     models_request: str
+    max_page_requests: PositiveInt = 1
+    # cars collected by one filter query in the batched mode
+    max_batch_cars: PositiveInt = 10
+    # value of the filter "sorting" field that lists the most recently published adverts first
+    newest_first_sorting: int = 4
+    http: HttpConfig = HttpConfig()
+    rate_limit: RateLimitConfig = RateLimitConfig()
+    metadata_cache: MetadataCacheConfig = MetadataCacheConfig()
+    response_cache: ResponseCacheConfig = ResponseCacheConfig()
+    sheets: SheetsConfig = SheetsConfig()
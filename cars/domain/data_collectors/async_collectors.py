@@ -0,0 +1,322 @@
+import asyncio
+from collections import deque
+from itertools import islice
+from time import perf_counter
+from typing import Optional, Iterable, List, Tuple, Any, Dict, Iterator, Deque
+
+import aiohttp
+
+from cars.config import get_app_config
+from cars.domain.data_collectors.batch import CarJob, CarJobResultT
+from cars.domain.data_collectors.collectors import (
+    BodyMetadata,
+    CarDataT,
+    CarsParser,
+    GenerationsMetadata,
+    ModelsMetadata,
+    VendorsMetadata,
+    load_cached_basic_metadata,
+    set_basic_metadata,
+)
+from cars.domain.data_collectors.decoding import loads
+from cars.domain.data_collectors.metadata_cache import get_metadata_cache
+from cars.domain.data_collectors.response_cache import get_response_cache
+from cars.domain.data_collectors.scheduler import AsyncRequestScheduler
+from cars.domain.data_collectors.transport import RetryPolicy, RETRY_STATUSES, record_request, record_retry
+from cars.exceptions import ApiRequestError, ProjectError, InvalidModel, InvalidGeneration
+from cars.metrics import get_metrics
+
+
+class AsyncApiClient:
+    """
+    Wrapper around `aiohttp.ClientSession` that limits the number of requests in flight.
+    All parsers sharing a client share one `AsyncRequestScheduler`, so any number of cars can be collected
+    on one event loop. Concurrency adapts to responses up to `max_requests`.
+    """
+
+    def __init__(self, session: aiohttp.ClientSession, max_requests: Optional[int] = None) -> None:
+        self.session = session
+        self.metadata_lock = asyncio.Lock()
+        app_config = get_app_config()
+        self.retry_policy = RetryPolicy(app_config.http)
+        self.scheduler = AsyncRequestScheduler(app_config.rate_limit, max_requests or app_config.max_page_requests)
+
+    @staticmethod
+    def create_session(max_requests: Optional[int] = None) -> aiohttp.ClientSession:
+        app_config = get_app_config()
+        http_config = app_config.http
+        return aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(sock_connect=http_config.connect_timeout, sock_read=http_config.read_timeout),
+            connector=aiohttp.TCPConnector(limit=http_config.pool_size or max_requests or app_config.max_page_requests),
+        )
+
+    async def request(self, method: str, url: str, payload: Optional[Dict[str, Any]] = None) -> bytes:
+        attempt = 0
+        while True:
+            retry_after = None
+            # waiting for the scheduler is not a part of the request latency
+            started_at = await self.scheduler.acquire()
+            start = perf_counter()
+            try:
+                async with self.session.request(method, url, json=payload) as response:
+                    data = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError) as ex:
+                await self.scheduler.release(started_at, overloaded=True)
+                record_request(url, "error", perf_counter() - start)
+                if not self.retry_policy.can_retry(attempt):
+                    raise ApiRequestError(f"Request error: {ex!r}") from ex
+            else:
+                retry_after = response.headers.get("Retry-After")
+                await self.scheduler.release(
+                    started_at, response.status in RETRY_STATUSES, self.retry_policy.get_retry_after(retry_after)
+                )
+                record_request(url, response.status, perf_counter() - start, len(data))
+                if response.status == 200:
+                    return data
+                if response.status not in RETRY_STATUSES or not self.retry_policy.can_retry(attempt):
+                    raise ApiRequestError(f"Request error: {response.status}, {response.reason}")
+
+            delay = self.retry_policy.get_delay(attempt, retry_after)
+            record_retry(url, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def fetch(self, method: str, url: str, payload: Optional[Dict[str, Any]] = None) -> bytes:
+        response_cache = get_response_cache()
+        data = response_cache.get(method, url, payload)
+        if data is None:
+            data = await self.request(method, url, payload)
+            response_cache.set(method, url, payload, data)
+        return data
+
+    async def get_text(self, url: str) -> str:
+        return (await self.fetch("GET", url)).decode()
+
+    async def post_json(self, url: str, payload: Dict[str, Any]) -> Any:
+        return loads(await self.fetch("POST", url, payload))
+
+
+async def async_init_basic_metadata(client: AsyncApiClient, use_cache: bool = True) -> None:
+    if use_cache and load_cached_basic_metadata():
+        return
+    set_basic_metadata(await client.get_text(get_app_config().homepage_url))
+
+
+class AsyncGenerationsMetadata(GenerationsMetadata):
+    @classmethod
+    async def fetch(
+        cls, client: AsyncApiClient, vendor_id: int, model_id: int, use_cache: bool = True
+    ) -> "AsyncGenerationsMetadata":
+        app_config = get_app_config()
+        cache = get_metadata_cache()
+        cache_key = cls.get_cache_key(vendor_id, model_id)
+        cached = cache.get(cache_key, app_config.metadata_cache.generations_ttl) if use_cache else None
+        if cached is not None:
+            metadata = cls(vendor_id, model_id, cached)
+            metadata.from_cache = True
+            return metadata
+
+        url = app_config.host + app_config.models_request
+        generations_data = cls.parse_response(await client.post_json(url, cls.get_payload(vendor_id, model_id)))
+        cache.set(cache_key, generations_data)
+        return cls(vendor_id, model_id, generations_data)
+
+
+class AsyncModelsMetadata(ModelsMetadata):
+    @classmethod
+    async def fetch(cls, client: AsyncApiClient, vendor_id: int, use_cache: bool = True) -> "AsyncModelsMetadata":
+        app_config = get_app_config()
+        cache = get_metadata_cache()
+        cache_key = cls.get_cache_key(vendor_id)
+        cached = cache.get(cache_key, app_config.metadata_cache.models_ttl) if use_cache else None
+        if cached is not None:
+            metadata = cls(vendor_id, cached)
+            metadata.from_cache = True
+            return metadata
+
+        url = app_config.host + app_config.models_request
+        models_data = cls.parse_response(await client.post_json(url, cls.get_payload(vendor_id)))
+        cache.set(cache_key, models_data)
+        return cls(vendor_id, models_data)
+
+
+class AsyncVendorsMetadata:
+    """
+    Async access to the metadata mappings. Fetched data is stored in `VendorsMetadata`,
+    so it is shared with the sync parsers.
+    """
+
+    @staticmethod
+    async def init(client: AsyncApiClient) -> None:
+        async with client.metadata_lock:
+            if VendorsMetadata._ID_MAPPING is None or BodyMetadata._ID_MAPPING is None:
+                await async_init_basic_metadata(client)
+
+    @staticmethod
+    async def refresh_cached(client: AsyncApiClient) -> None:
+        async with client.metadata_lock:
+            if VendorsMetadata._FROM_CACHE:
+                await async_init_basic_metadata(client, use_cache=False)
+
+    @classmethod
+    async def get_id(cls, client: AsyncApiClient, vendor: str) -> int:
+        await cls.init(client)
+        if vendor not in VendorsMetadata.id_mapping:
+            await cls.refresh_cached(client)
+        return VendorsMetadata.get_id(vendor)
+
+    @classmethod
+    async def get_body_type_id(cls, client: AsyncApiClient, body_type: str) -> int:
+        await cls.init(client)
+        if body_type not in BodyMetadata.id_mapping:
+            await cls.refresh_cached(client)
+        return BodyMetadata.get_id(body_type)
+
+    @classmethod
+    async def get_models(cls, client: AsyncApiClient, vendor: str, use_cache: bool = True) -> ModelsMetadata:
+        vendor_id = await cls.get_id(client, vendor)
+        async with client.metadata_lock:
+            if vendor_id not in VendorsMetadata._MODELS_MAPPING or not use_cache:
+                VendorsMetadata._MODELS_MAPPING[vendor_id] = await AsyncModelsMetadata.fetch(
+                    client, vendor_id, use_cache
+                )
+        return VendorsMetadata._MODELS_MAPPING[vendor_id]
+
+    @classmethod
+    async def get_model_id(cls, client: AsyncApiClient, vendor: str, model: str) -> int:
+        models_metadata = await cls.get_models(client, vendor)
+        try:
+            return models_metadata.get_model_id(model)
+        except InvalidModel:
+            if not models_metadata.from_cache:
+                raise
+        return (await cls.get_models(client, vendor, use_cache=False)).get_model_id(model)
+
+    @classmethod
+    async def get_generations(
+        cls, client: AsyncApiClient, vendor: str, model: str, use_cache: bool = True
+    ) -> GenerationsMetadata:
+        vendor_id = await cls.get_id(client, vendor)
+        model_id = await cls.get_model_id(client, vendor, model)
+        async with client.metadata_lock:
+            if (vendor_id, model_id) not in VendorsMetadata._GENERATIONS_MAPPING or not use_cache:
+                VendorsMetadata._GENERATIONS_MAPPING[(vendor_id, model_id)] = await AsyncGenerationsMetadata.fetch(
+                    client, vendor_id, model_id, use_cache
+                )
+        return VendorsMetadata._GENERATIONS_MAPPING[(vendor_id, model_id)]
+
+    @classmethod
+    async def get_generation_id(cls, client: AsyncApiClient, vendor: str, model: str, generation: str) -> int:
+        generations_metadata = await cls.get_generations(client, vendor, model)
+        try:
+            return generations_metadata.get_generation_id(generation)
+        except InvalidGeneration:
+            if not generations_metadata.from_cache:
+                raise
+        return (await cls.get_generations(client, vendor, model, use_cache=False)).get_generation_id(generation)
+
+
+class AsyncCarsParser:
+    def __init__(
+        self,
+        client: AsyncApiClient,
+        brand_id: int,
+        model_id: int,
+        generation_id: Optional[int],
+        body_type_ids: List[int],
+    ) -> None:
+        self.client = client
+        self.brand_id = brand_id
+        self.model_id = model_id
+        self.generation_id = generation_id
+        self.body_type_ids = body_type_ids
+
+    @classmethod
+    async def create(
+        cls,
+        client: AsyncApiClient,
+        vendor: str,
+        model: str,
+        revision: Optional[str],
+        body_types: Optional[Iterable[str]],
+    ) -> "AsyncCarsParser":
+        brand_id = await AsyncVendorsMetadata.get_id(client, vendor)
+        model_id = await AsyncVendorsMetadata.get_model_id(client, vendor, model)
+        generation_id = (
+            await AsyncVendorsMetadata.get_generation_id(client, vendor, model, revision) if revision else None
+        )
+        body_type_ids = (
+            [await AsyncVendorsMetadata.get_body_type_id(client, body_type) for body_type in body_types]
+            if body_types
+            else []
+        )
+        return cls(client, brand_id, model_id, generation_id, body_type_ids)
+
+    async def get_car_data(self) -> List[CarDataT]:
+        result, page_count = await self._get_page_data(1)
+        # gather keeps results in page order, the client limits how many of them are in flight
+        pages = await asyncio.gather(*(self._get_page_data(page_id) for page_id in range(2, page_count + 1)))
+        for page_data, _ in pages:
+            result.extend(page_data)
+        return result
+
+    async def _get_page_data(self, page_id: int) -> Tuple[List[CarDataT], int]:
+        app_config = get_app_config()
+        url = app_config.host + app_config.filter_request
+        payload = CarsParser.get_page_payload(
+            page_id, self.brand_id, self.model_id, self.generation_id, self.body_type_ids
+        )
+        return CarsParser.parse_page(await self.client.post_json(url, payload))
+
+
+async def _collect_job(client: AsyncApiClient, job: CarJob) -> CarJobResultT:
+    result: CarJobResultT
+    with get_metrics().timer("car_collect_seconds"):
+        try:
+            parser = await AsyncCarsParser.create(client, job.brand, job.model, job.generation, job.body_types)
+            result = await parser.get_car_data()
+        except ProjectError as ex:
+            result = ex
+    job.record(result)
+    return result
+
+
+async def _create_client(max_requests: Optional[int]) -> AsyncApiClient:
+    # the session, locks and the scheduler belong to the loop they are created on
+    return AsyncApiClient(AsyncApiClient.create_session(max_requests), max_requests)
+
+
+async def _close_client(client: AsyncApiClient) -> None:
+    # requests left when the consumer stopped early, page requests of cancelled cars included
+    tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await client.session.close()
+
+
+def iter_cars_data_async(jobs: List[CarJob], max_cars: int = 1) -> Iterator[Tuple[CarJob, CarJobResultT]]:
+    """
+    Collect data for jobs on one event loop, up to `max_cars` cars at once and up to `max_page_requests`
+    requests per car in flight. Results are yielded in the order of `jobs`, the loop runs while the next
+    result is awaited, so a slow consumer holds up requests instead of piling up results.
+    """
+    loop = asyncio.new_event_loop()
+    try:
+        client = loop.run_until_complete(_create_client(max_cars * get_app_config().max_page_requests))
+        pending: Deque[Tuple[CarJob, "asyncio.Task[CarJobResultT]"]] = deque()
+        try:
+            pending_jobs = iter(jobs)
+            for job in islice(pending_jobs, max_cars):
+                pending.append((job, loop.create_task(_collect_job(client, job))))
+            while pending:
+                job, task = pending.popleft()
+                result = loop.run_until_complete(task)
+                next_job = next(pending_jobs, None)
+                if next_job is not None:
+                    pending.append((next_job, loop.create_task(_collect_job(client, next_job))))
+                yield job, result
+        finally:
+            loop.run_until_complete(_close_client(client))
+    finally:
+        loop.close()
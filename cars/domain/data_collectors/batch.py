@@ -0,0 +1,265 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from itertools import islice
+from queue import Queue, Full
+from threading import Event
+from typing import Optional, List, Iterable, Iterator, Tuple, Union, Dict, Any, Deque
+
+from cars.config import get_app_config
+from cars.config.cars import CarConfig
+from cars.domain.data_collectors.collectors import CarsParser, CarDataT
+from cars.domain.data_collectors.multi import MultiCarsParser
+from cars.domain.data_collectors.transport import get_transport
+from cars.exceptions import ProjectError, LogicError
+from cars.metrics import get_metrics
+
+CarJobResultT = Union[List[CarDataT], ProjectError]
+
+
+class CarJob:
+    def __init__(self, brand: str, model: str, generation: str, body_types: Optional[List[str]]) -> None:
+        self.brand = brand
+        self.model = model
+        self.generation = generation
+        self.body_types = body_types
+
+    def collect(self) -> CarJobResultT:
+        try:
+            return [data for page_data in self.iter_pages() for data in page_data]
+        except ProjectError as ex:
+            return ex
+
+    def iter_pages(self) -> Iterator[List[CarDataT]]:
+        """
+        Adverts of the car page by page, see `CarsParser.iter_pages`.
+        The result is added to the run metrics once the last page is read or the car fails.
+        """
+        rows = 0
+        with get_metrics().timer("car_collect_seconds"):
+            try:
+                for page_data in CarsParser(self.brand, self.model, self.generation, self.body_types).iter_pages():
+                    rows += len(page_data)
+                    yield page_data
+            except ProjectError as ex:
+                self.record(ex)
+                raise
+        self._record_rows(rows)
+
+    def iter_adverts(self) -> Iterator[CarDataT]:
+        for page_data in self.iter_pages():
+            yield from page_data
+
+    def record(self, result: CarJobResultT) -> None:
+        """
+        Add the result to the run metrics: rows collected for the car or the error.
+        """
+        if isinstance(result, ProjectError):
+            get_metrics().inc("car_errors_total", error=type(result).__name__)
+            return
+        self._record_rows(len(result))
+
+    def _record_rows(self, rows: int) -> None:
+        metrics = get_metrics()
+        car = f"{self.brand} {self.model}"
+        if self.generation:
+            car += f" {self.generation}"
+        metrics.set("car_rows", rows, car=car)
+        metrics.observe("rows_per_car", rows)
+
+
+def get_car_jobs(cars: Iterable[CarConfig]) -> List[CarJob]:
+    jobs = []
+    for car in sorted(cars, key=lambda x: (x.brand, x.model)):
+        generations = car.generations or [""]
+        for generation in sorted(generations):
+            jobs.append(CarJob(car.brand, car.model, generation, car.body_types))
+    return jobs
+
+
+def get_job_batches(jobs: List[CarJob], max_cars: int) -> List[List[CarJob]]:
+    """
+    Group jobs filtering the same body types into batches of at most `max_cars`, keeping the order of jobs.
+    """
+    open_batches: Dict[Tuple[str, ...], List[CarJob]] = {}
+    batches = []
+    for job in jobs:
+        key = tuple(sorted(job.body_types or []))
+        batch = open_batches.get(key)
+        if batch is None or len(batch) >= max_cars:
+            batch = open_batches[key] = []
+            batches.append(batch)
+        batch.append(job)
+    return batches
+
+
+def collect_batch(jobs: List[CarJob]) -> List[CarJobResultT]:
+    """
+    Collect data for jobs by one filter query. Cars that can't be found fail alone,
+    a failed query fails every car of the batch.
+    """
+    results: Dict[int, CarJobResultT] = {}
+    parsers = []
+    positions = []
+    with get_metrics().timer("batch_collect_seconds"):
+        for position, job in enumerate(jobs):
+            try:
+                parser = CarsParser(job.brand, job.model, job.generation, job.body_types)
+                parser.get_generation_id()
+            except ProjectError as ex:
+                results[position] = ex
+                continue
+            parsers.append(parser)
+            positions.append(position)
+
+        if parsers:
+            try:
+                for position, car_data in zip(positions, MultiCarsParser(parsers).get_car_data()):
+                    results[position] = car_data
+            except ProjectError as ex:
+                for position in positions:
+                    results[position] = ex
+
+    for position, job in enumerate(jobs):
+        job.record(results[position])
+    return [results[position] for position in range(len(jobs))]
+
+
+def collect_cars_data(
+    jobs: List[CarJob], workers: int = 1, batch: bool = False, engine: str = "threads"
+) -> Iterator[Tuple[CarJob, CarJobResultT]]:
+    """
+    Collect data for every job, running up to `workers` jobs at once.
+    With `batch`, jobs are collected by shared queries of up to `max_batch_cars` cars, see `get_job_batches`.
+    The `async` engine runs jobs on one event loop instead of threads, see `iter_cars_data_async`.
+    Results are yielded in the order of `jobs` no matter which job finishes first.
+    """
+    if engine == "async":
+        if batch:
+            raise LogicError("Batched queries are collected by the threads engine only")
+        # aiohttp comes with the `async` extra
+        from cars.domain.data_collectors.async_collectors import iter_cars_data_async
+
+        yield from iter_cars_data_async(jobs, workers)
+        return
+
+    # a connection for every page request of every job in flight
+    get_transport().reserve_connections(workers * get_app_config().max_page_requests)
+    if batch:
+        yield from _collect_batched(jobs, workers)
+        return
+
+    if workers <= 1:
+        for job in jobs:
+            yield job, job.collect()
+        return
+
+    # results wait for the consumer, so jobs start only as results are taken
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending_jobs = iter(jobs)
+        pending = deque((job, executor.submit(job.collect)) for job in islice(pending_jobs, workers))
+        while pending:
+            job, future = pending.popleft()
+            next_job = next(pending_jobs, None)
+            if next_job is not None:
+                pending.append((next_job, executor.submit(next_job.collect)))
+            yield job, future.result()
+
+
+def _collect_batched(jobs: List[CarJob], workers: int) -> Iterator[Tuple[CarJob, CarJobResultT]]:
+    batches = get_job_batches(jobs, get_app_config().max_batch_cars)
+    positions = {
+        id(job): (batch_id, position) for batch_id, batch in enumerate(batches) for position, job in enumerate(batch)
+    }
+    futures: Dict[int, "Future[List[CarJobResultT]]"] = {}
+    submitted = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for job in jobs:
+            batch_id, position = positions[id(job)]
+            # batches start in order, up to `workers` of them from the one of the next job
+            while submitted < min(batch_id + workers, len(batches)):
+                futures[submitted] = executor.submit(collect_batch, batches[submitted])
+                submitted += 1
+            yield job, futures[batch_id].result()[position]
+            if position == len(batches[batch_id]) - 1:
+                # the last job of the batch
+                del futures[batch_id]
+
+
+class _PagesFeed:
+    """
+    Pages of a job collected by a worker thread and handed to the consumer through a queue of one page.
+    """
+
+    _DONE = object()
+
+    def __init__(self, job: CarJob) -> None:
+        self.job = job
+        self._queue: "Queue[Any]" = Queue(maxsize=1)
+        self._cancelled = Event()
+
+    def run(self) -> None:
+        try:
+            for page_data in self.job.iter_pages():
+                if not self._put(page_data):
+                    return
+            self._put(self._DONE)
+        except Exception as ex:
+            # raised again to the consumer
+            self._put(ex)
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def iter_adverts(self) -> Iterator[CarDataT]:
+        while True:
+            item = self._queue.get()
+            if item is self._DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield from item
+
+    def _put(self, item: Any) -> bool:
+        # a cancelled feed isn't read anymore
+        while not self._cancelled.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                pass
+        return False
+
+
+def stream_cars_data(jobs: List[CarJob], workers: int = 1) -> Iterator[Tuple[CarJob, Iterator[CarDataT]]]:
+    """
+    Adverts of every job as they are parsed, running up to `workers` jobs at once.
+    Jobs are yielded in order with an iterator of their adverts that raises `ProjectError` if the job fails,
+    it must be read before the next job is taken. A running job waits while a parsed page is not read,
+    so memory is bounded by pages in flight rather than by adverts of a car.
+    """
+    # a connection for every page request of every job in flight
+    get_transport().reserve_connections(workers * get_app_config().max_page_requests)
+    if workers <= 1:
+        for job in jobs:
+            yield job, job.iter_adverts()
+        return
+
+    pending: Deque[_PagesFeed] = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        try:
+            pending_jobs = iter(jobs)
+            for job in islice(pending_jobs, workers):
+                pending.append(_PagesFeed(job))
+                executor.submit(pending[-1].run)
+            while pending:
+                feed = pending[0]
+                yield feed.job, feed.iter_adverts()
+                # the consumer may leave pages unread
+                pending.popleft().cancel()
+                next_job = next(pending_jobs, None)
+                if next_job is not None:
+                    pending.append(_PagesFeed(next_job))
+                    executor.submit(pending[-1].run)
+        finally:
+            for feed in pending:
+                feed.cancel()
@@ -1,28 +1,96 @@
-import re
-from typing import Tuple, Optional, Dict, List, Iterable
-
-from requests import get, post
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from threading import Lock, RLock
+from time import perf_counter
+from typing import Tuple, Optional, Dict, List, Iterable, Any, Iterator, Callable, TypeVar, Hashable
 
 from cars.common import classproperty
-from cars.config import app_config
-from cars.exceptions import ApiRequestError, InvalidVendor, InvalidModel, InvalidGeneration
+from cars.config import get_app_config
+from cars.domain.data_collectors.homepage import extract_homepage_metadata
+from cars.domain.data_collectors.metadata_cache import get_metadata_cache
+from cars.domain.data_collectors.transport import get_transport
+from cars.exceptions import InvalidVendor, InvalidModel, InvalidGeneration
+from cars.metrics import get_metrics
 
 CarDataT = Tuple[int, int, str, int, str]
+PageT = TypeVar("PageT")
+
+HOMEPAGE_CACHE_KEY = "homepage"
+
+# guard lazy metadata initialization when several cars are collected at once, a lock per metadata entry,
+# so a car waits only for requests of the metadata it needs
+_METADATA_LOCKS: Dict[Hashable, RLock] = {}
+_METADATA_LOCKS_LOCK = Lock()
+
+
+def _get_metadata_lock(key: Hashable) -> RLock:
+    with _METADATA_LOCKS_LOCK:
+        return _METADATA_LOCKS.setdefault(key, RLock())
+
+
+def init_basic_metadata(use_cache: bool = True) -> None:
+    if use_cache and load_cached_basic_metadata():
+        return
+    set_basic_metadata(get_transport().get_text(get_app_config().homepage_url))
+
+
+def load_cached_basic_metadata() -> bool:
+    cached = get_metadata_cache().get(HOMEPAGE_CACHE_KEY, get_app_config().metadata_cache.homepage_ttl)
+    if cached is None:
+        return False
+    VendorsMetadata._ID_MAPPING = cached["vendors"]
+    VendorsMetadata.ambiguous_ids = cached.get("ambiguous_vendors", {})
+    BodyMetadata._ID_MAPPING = cached["body_types"]
+    VendorsMetadata._FROM_CACHE = True
+    return True
 
 
-def init_basic_metadata() -> None:
-    response = get("https://cars.av.by/")
-    if response.status_code != 200:
-        raise ApiRequestError(f"Models Request Fail: {response.status_code}, {response.reason}")
-    data = response.content.decode()
-    VendorsMetadata.init_mapping(data)
-    BodyMetadata.init_mapping(data)
+def set_basic_metadata(data: str) -> None:
+    metadata = extract_homepage_metadata(data)
+    VendorsMetadata._ID_MAPPING = metadata.vendors
+    VendorsMetadata.ambiguous_ids = metadata.ambiguous_vendors
+    BodyMetadata._ID_MAPPING = metadata.body_types
+    VendorsMetadata._FROM_CACHE = False
+    get_metadata_cache().set(
+        HOMEPAGE_CACHE_KEY,
+        {
+            "vendors": metadata.vendors,
+            "body_types": metadata.body_types,
+            "ambiguous_vendors": metadata.ambiguous_vendors,
+        },
+    )
 
 
 class GenerationsMetadata:
-    def __init__(self, vendor_id: int, model_id: int) -> None:
-        url = app_config.host + app_config.models_request
-        payload = {
+    def __init__(
+        self,
+        vendor_id: int,
+        model_id: int,
+        generations_data: Optional[Dict[str, int]] = None,
+        use_cache: bool = True,
+    ) -> None:
+        app_config = get_app_config()
+        cache = get_metadata_cache()
+        cache_key = self.get_cache_key(vendor_id, model_id)
+        self.from_cache = False
+        if generations_data is None and use_cache:
+            generations_data = cache.get(cache_key, app_config.metadata_cache.generations_ttl)
+            self.from_cache = generations_data is not None
+        if generations_data is None:
+            url = app_config.host + app_config.models_request
+            response_data = get_transport().post_json(url, self.get_payload(vendor_id, model_id))
+            generations_data = self.parse_response(response_data)
+            cache.set(cache_key, generations_data)
+        self._generations_data = generations_data
+
+    @staticmethod
+    def get_cache_key(vendor_id: int, model_id: int) -> str:
+        return f"generations:{vendor_id}:{model_id}"
+
+    @staticmethod
+    def get_payload(vendor_id: int, model_id: int) -> Dict[str, Any]:
+        return {
             "properties": [
                 {
                     "modified": True,
@@ -49,18 +117,10 @@ class GenerationsMetadata:
                 },
             ],
         }
-        response = post(
-            url,
-            json=payload,
-        )
-
-        if response.status_code != 200:
-            raise ApiRequestError(f"Request error: {response.status_code}, {response.reason}")
 
-        response_data = response.json()
-        self._generations_data = {
-            model["label"]: model["intValue"] for model in response_data["properties"][0]["value"][0][3]["options"]
-        }
+    @staticmethod
+    def parse_response(response_data: Dict[str, Any]) -> Dict[str, int]:
+        return {model["label"]: model["intValue"] for model in response_data["properties"][0]["value"][0][3]["options"]}
 
     def get_generation_id(self, generation: str) -> int:
         if generation not in self._generations_data:
@@ -72,9 +132,28 @@ class GenerationsMetadata:
 
 
 class ModelsMetadata:
-    def __init__(self, vendor_id: int) -> None:
-        url = app_config.host + app_config.models_request
-        payload = {
+    def __init__(self, vendor_id: int, models_data: Optional[Dict[str, int]] = None, use_cache: bool = True) -> None:
+        app_config = get_app_config()
+        cache = get_metadata_cache()
+        cache_key = self.get_cache_key(vendor_id)
+        self.from_cache = False
+        if models_data is None and use_cache:
+            models_data = cache.get(cache_key, app_config.metadata_cache.models_ttl)
+            self.from_cache = models_data is not None
+        if models_data is None:
+            url = app_config.host + app_config.models_request
+            response_data = get_transport().post_json(url, self.get_payload(vendor_id))
+            models_data = self.parse_response(response_data)
+            cache.set(cache_key, models_data)
+        self._models_data = models_data
+
+    @staticmethod
+    def get_cache_key(vendor_id: int) -> str:
+        return f"models:{vendor_id}"
+
+    @staticmethod
+    def get_payload(vendor_id: int) -> Dict[str, Any]:
+        return {
             "properties": [
                 {
                     "modified": True,
@@ -85,18 +164,10 @@ class ModelsMetadata:
                 {"name": "price_currency", "value": 2},
             ]
         }
-        response = post(
-            url,
-            json=payload,
-        )
 
-        if response.status_code != 200:
-            raise ApiRequestError(f"Request error: {response.status_code}, {response.reason}")
-
-        response_data = response.json()
-        self._models_data = {
-            model["label"]: model["intValue"] for model in response_data["properties"][0]["value"][0][2]["options"]
-        }
+    @staticmethod
+    def parse_response(response_data: Dict[str, Any]) -> Dict[str, int]:
+        return {model["label"]: model["intValue"] for model in response_data["properties"][0]["value"][0][2]["options"]}
 
     def get_model_id(self, model: str) -> int:
         if model not in self._models_data:
@@ -108,69 +179,75 @@ class ModelsMetadata:
 
 class VendorsMetadata:
     _ID_MAPPING: Optional[Dict[str, int]] = None
+    # brands and body types were read from the metadata cache and may be outdated
+    _FROM_CACHE: bool = False
+    # brands found on the homepage without a single id, name -> ids
+    ambiguous_ids: Dict[str, List[int]] = {}
     _MODELS_MAPPING: Dict[int, ModelsMetadata] = {}
     _GENERATIONS_MAPPING: Dict[Tuple[int, int], GenerationsMetadata] = {}
 
-    @classmethod
-    def init_mapping(cls, data: str) -> None:
-        names_matches = re.findall(
-            pattern=r'(data-property-name="brand">)(.*?)(</button>)',
-            string=data,
-        )
-
-        names = set(name[1] for name in names_matches)
-
-        VendorsMetadata._ID_MAPPING = {}
-        for name in names:
-            name_fixed = name.replace("(", "\(")
-            name_fixed = name_fixed.replace(")", "\)")
-            id_matches = re.findall(
-                pattern=f'("id":)([0-9]*?)(,"label":"{name_fixed}")',
-                string=data,
-            )
-            ids = set(_id[1] for _id in id_matches)
-            if len(ids) != 1:
-                print(f"Ambiguous id: {name} - {ids}")
-                continue
-            VendorsMetadata._ID_MAPPING[name] = int(ids.pop())
-
-        assert VendorsMetadata._ID_MAPPING is not None
-
     @classproperty
     def id_mapping(cls) -> Dict[str, int]:
-        if VendorsMetadata._ID_MAPPING is None:
-            init_basic_metadata()
+        with _get_metadata_lock(HOMEPAGE_CACHE_KEY):
+            if VendorsMetadata._ID_MAPPING is None:
+                init_basic_metadata()
         assert VendorsMetadata._ID_MAPPING is not None
         return VendorsMetadata._ID_MAPPING
 
     @classmethod
-    def get_models(cls, vendor: str) -> ModelsMetadata:
+    def get_models(cls, vendor: str, use_cache: bool = True) -> ModelsMetadata:
         vendor_id = cls.get_id(vendor)
-        if vendor_id not in cls._MODELS_MAPPING:
-            models_data = ModelsMetadata(vendor_id)
-            cls._MODELS_MAPPING[vendor_id] = models_data
+        with _get_metadata_lock(ModelsMetadata.get_cache_key(vendor_id)):
+            if vendor_id not in cls._MODELS_MAPPING or not use_cache:
+                models_data = ModelsMetadata(vendor_id, use_cache=use_cache)
+                cls._MODELS_MAPPING[vendor_id] = models_data
         return cls._MODELS_MAPPING[vendor_id]
 
     @classmethod
     def get_model_id(cls, vendor: str, model: str) -> int:
         models_metadata = cls.get_models(vendor)
-        return models_metadata.get_model_id(model)
+        try:
+            return models_metadata.get_model_id(model)
+        except InvalidModel:
+            if not models_metadata.from_cache:
+                raise
+        # the model may have appeared after the cache was written
+        return cls.get_models(vendor, use_cache=False).get_model_id(model)
 
     @classmethod
-    def get_generations(cls, vendor, model) -> GenerationsMetadata:
+    def get_generations(cls, vendor, model, use_cache: bool = True) -> GenerationsMetadata:
         vendor_id = cls.get_id(vendor)
         model_id = cls.get_model_id(vendor, model)
-        if (vendor_id, model_id) not in cls._GENERATIONS_MAPPING:
-            cls._GENERATIONS_MAPPING[(vendor_id, model_id)] = GenerationsMetadata(vendor_id, model_id)
+        with _get_metadata_lock(GenerationsMetadata.get_cache_key(vendor_id, model_id)):
+            if (vendor_id, model_id) not in cls._GENERATIONS_MAPPING or not use_cache:
+                cls._GENERATIONS_MAPPING[(vendor_id, model_id)] = GenerationsMetadata(
+                    vendor_id, model_id, use_cache=use_cache
+                )
         return cls._GENERATIONS_MAPPING[(vendor_id, model_id)]
 
     @classmethod
     def get_generation_id(cls, vendor, model, generation) -> int:
         generations_metadata = cls.get_generations(vendor, model)
-        return generations_metadata.get_generation_id(generation)
+        try:
+            return generations_metadata.get_generation_id(generation)
+        except InvalidGeneration:
+            if not generations_metadata.from_cache:
+                raise
+        return cls.get_generations(vendor, model, use_cache=False).get_generation_id(generation)
+
+    @classmethod
+    def refresh_cached(cls) -> None:
+        """
+        Refetch brands and body types if they were read from the metadata cache.
+        """
+        with _get_metadata_lock(HOMEPAGE_CACHE_KEY):
+            if cls._FROM_CACHE:
+                init_basic_metadata(use_cache=False)
 
     @classmethod
     def get_id(cls, vendor: str) -> int:
+        if vendor not in cls.id_mapping:
+            cls.refresh_cached()
         if vendor not in cls.id_mapping:
             raise InvalidVendor(
                 f"Brand {vendor} not found. " f"Must be one of {[key for key in cls.id_mapping.keys()]}."
@@ -181,37 +258,18 @@ class VendorsMetadata:
 class BodyMetadata:
     _ID_MAPPING: Optional[Dict[str, int]] = None
 
-    @classmethod
-    def init_mapping(cls, data: str) -> None:
-        body_type_matches = re.findall(
-            pattern=r'("body_type":\{.*?"options":\[)(.*?)(\].*?\})',
-            string=data,
-        )
-        body_types_str = body_type_matches[0][1]
-        BodyMetadata._ID_MAPPING = {}
-        for match in re.findall(
-            pattern=r"\{.*?\}",
-            string=body_types_str,
-        ):
-            int_value = int(
-                re.findall(pattern='("intValue":)([0-9]*)', string=match,)[
-                    0
-                ][1]
-            )
-            name = re.findall(pattern='("label":")(.*?)(")', string=match,)[
-                0
-            ][1]
-            BodyMetadata._ID_MAPPING[name] = int_value
-
     @classproperty
     def id_mapping(cls) -> Dict[str, int]:
-        if BodyMetadata._ID_MAPPING is None:
-            init_basic_metadata()
+        with _get_metadata_lock(HOMEPAGE_CACHE_KEY):
+            if BodyMetadata._ID_MAPPING is None:
+                init_basic_metadata()
         assert BodyMetadata._ID_MAPPING is not None
         return BodyMetadata._ID_MAPPING
 
     @classmethod
     def get_id(cls, body_type: str) -> int:
+        if body_type not in cls.id_mapping:
+            VendorsMetadata.refresh_cached()
         if body_type not in cls.id_mapping:
             raise InvalidVendor(
                 f"Body type {body_type} not found. " f"Must be one of {[key for key in cls.id_mapping.keys()]}."
@@ -219,25 +277,74 @@ class BodyMetadata:
         return cls.id_mapping[body_type]
 
 
+def iter_pages(get_page_data: Callable[[int], Tuple[PageT, int]], max_page_requests: int) -> Iterator[PageT]:
+    """
+    Yield data of pages returned by `get_page_data(page_id) -> (data, page count)` in page order,
+    requesting at most `max_page_requests` pages ahead of the consumer.
+    """
+    # the first page is always requested alone: it warms up metadata caches and tells how many pages there are
+    first_page, page_count = get_page_data(1)
+    yield first_page
+
+    page_ids = iter(range(2, page_count + 1))
+    if max_page_requests <= 1:
+        for page_id in page_ids:
+            yield get_page_data(page_id)[0]
+        return
+
+    with ThreadPoolExecutor(max_workers=max_page_requests) as executor:
+        pending = deque(executor.submit(get_page_data, page_id) for page_id in islice(page_ids, max_page_requests))
+        while pending:
+            page_data, _ = pending.popleft().result()
+            next_page_id = next(page_ids, None)
+            if next_page_id is not None:
+                pending.append(executor.submit(get_page_data, next_page_id))
+            yield page_data
+
+
 class CarsParser:
-    def __init__(self, vendor: str, model: str, revision: Optional[str], body_types: Optional[Iterable[str]]) -> None:
+    def __init__(
+        self,
+        vendor: str,
+        model: str,
+        revision: Optional[str],
+        body_types: Optional[Iterable[str]],
+        max_page_requests: Optional[int] = None,
+    ) -> None:
         self.brand: str = vendor
         self.brand_id: int = VendorsMetadata.get_id(self.brand)
         self.model: str = model
-        self.model_id: int = VendorsMetadata.get_models(self.brand).get_model_id(self.model)
+        self.model_id: int = VendorsMetadata.get_model_id(self.brand, self.model)
         self.body_type_ids: List[int] = (
             [BodyMetadata.get_id(body_type) for body_type in body_types] if body_types else []
         )
         self.generation: Optional[str] = revision if revision else None
+        self.max_page_requests: int = max_page_requests or get_app_config().max_page_requests
         self._car_data: Optional[List[CarDataT]] = None
 
     @property
     def car_data(self) -> List[CarDataT]:
         if self._car_data is None:
-            self._car_data = self._get_car_data()
+            self._car_data = list(self.iter_adverts())
         assert self._car_data is not None
         return self._car_data
 
+    def iter_pages(self) -> Iterator[List[CarDataT]]:
+        """
+        Yield adverts page by page in page order.
+        At most `max_page_requests` pages are requested ahead of the consumer.
+        """
+        return iter_pages(self._get_page_data, self.max_page_requests)
+
+    def iter_adverts(self) -> Iterator[CarDataT]:
+        for page_data in self.iter_pages():
+            yield from page_data
+
+    @staticmethod
+    def sort_key(data: CarDataT) -> Tuple[int, str, int]:
+        # newest cars first, then by body type and days on sale
+        return -data[1], data[4], data[3]
+
     @classproperty
     def columns_order(self) -> Tuple[str, ...]:
         return "цена", "год выпуска", "ссылка", "дней в продаже", "тип кузова"
@@ -246,28 +353,58 @@ class CarsParser:
     def render_car_data(cls, data: CarDataT) -> str:
         return "\t".join((str(data[0]), str(data[1]), data[2]))
 
-    def _get_page_data(self, page_id) -> Tuple[List[CarDataT], Optional[int]]:
-        print(page_id, end="")
-        url = app_config.host + app_config.filter_request
-        payload = {
+    @staticmethod
+    def get_page_payload(
+        page_id: int,
+        brand_id: int,
+        model_id: int,
+        generation_id: Optional[int],
+        body_type_ids: List[int],
+        sorting: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        return CarsParser.get_groups_page_payload(
+            page_id, [CarsParser.get_brands_group(brand_id, model_id, generation_id)], body_type_ids, sorting
+        )
+
+    @staticmethod
+    def get_brands_group(brand_id: int, model_id: int, generation_id: Optional[int]) -> List[Dict[str, Any]]:
+        group: List[Dict[str, Any]] = [
+            {
+                "name": "brand",
+                "value": brand_id,
+            },
+            {
+                "name": "model",
+                "value": model_id,
+            },
+        ]
+        if generation_id is not None:
+            group.append(
+                {
+                    "name": "generation",
+                    "value": generation_id,
+                }
+            )
+        return group
+
+    @staticmethod
+    def get_groups_page_payload(
+        page_id: int,
+        brands_groups: List[List[Dict[str, Any]]],
+        body_type_ids: List[int],
+        sorting: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Filter for adverts of any of the brand, model and generation groups.
+        """
+        payload: Dict[str, Any] = {
             "page": page_id,
             "properties": [
                 {
                     "modified": True,
                     "name": "brands",
                     "property": 1440,
-                    "value": [
-                        [
-                            {
-                                "name": "brand",
-                                "value": self.brand_id,
-                            },
-                            {
-                                "name": "model",
-                                "value": self.model_id,
-                            },
-                        ],
-                    ],
+                    "value": brands_groups,
                 },
                 {
                     "name": "price_currency",
@@ -280,36 +417,24 @@ class CarsParser:
             ],
         }
 
-        if self.generation is not None:
-            payload["properties"][0]["value"][0].append(  # type: ignore
-                {
-                    "name": "generation",
-                    "value": VendorsMetadata.get_generation_id(self.brand, self.model, self.generation),
-                }
-            )
-
-        if self.body_type_ids:
+        if body_type_ids:
             payload["properties"].append(
-                {  # type: ignore
+                {
                     "name": "body_type",
-                    "value": self.body_type_ids,
+                    "value": body_type_ids,
                 }
             )
 
-        response = post(
-            url,
-            json=payload,
-        )
+        if sorting is not None:
+            payload["sorting"] = sorting
 
-        if response.status_code != 200:
-            raise ApiRequestError(f"Request error: {response.status_code}, {response.reason}")
+        return payload
 
-        response_data = response.json()
+    @staticmethod
+    def parse_page(response_data: Dict[str, Any]) -> Tuple[List[CarDataT], int]:
         result = []
-
-        page_count = response_data["pageCount"]
-        next_page_id = None if page_id >= page_count else (page_id + 1)
-        print(f"/{page_count}")
+        metrics = get_metrics()
+        start = perf_counter()
 
         for ad in response_data["adverts"]:
             body_type = "-"
@@ -321,14 +446,23 @@ class CarsParser:
                 (ad["price"]["usd"]["amount"], ad["year"], ad["publicUrl"], ad["originalDaysOnSale"], body_type),
             )
 
-        return result, next_page_id
+        metrics.observe("page_parse_seconds", perf_counter() - start)
+        metrics.inc("pages_parsed_total")
+        metrics.inc("adverts_parsed_total", len(result))
+        return result, response_data["pageCount"]
 
-    def _get_car_data(self) -> List[CarDataT]:
-        result = []
+    def get_generation_id(self) -> Optional[int]:
+        if self.generation is None:
+            return None
+        return VendorsMetadata.get_generation_id(self.brand, self.model, self.generation)
 
-        next_page_id: Optional[int] = 1
-        while next_page_id is not None:
-            new_data, next_page_id = self._get_page_data(next_page_id)
-            result.extend(new_data)
+    def get_page_response(self, page_id: int, sorting: Optional[int] = None) -> Dict[str, Any]:
+        app_config = get_app_config()
+        url = app_config.host + app_config.filter_request
+        payload = self.get_page_payload(
+            page_id, self.brand_id, self.model_id, self.get_generation_id(), self.body_type_ids, sorting
+        )
+        return get_transport().post_json(url, payload)
 
-        return result
+    def _get_page_data(self, page_id: int) -> Tuple[List[CarDataT], int]:
+        return self.parse_page(self.get_page_response(page_id))
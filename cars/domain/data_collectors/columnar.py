@@ -0,0 +1,74 @@
+from array import array
+from typing import Iterable, List, Dict, Any
+
+import numpy as np
+
+from cars.domain.data_collectors.collectors import CarDataT
+
+
+class CarDataColumns:
+    """
+    Parsed adverts stored by column: numpy arrays for numbers,
+    body types as integer codes into a list of distinct names, converted to arrow tables by `ParquetSink`.
+    """
+
+    def __init__(
+        self,
+        price: np.ndarray,
+        year: np.ndarray,
+        days: np.ndarray,
+        urls: List[str],
+        body_codes: np.ndarray,
+        body_types: List[str],
+    ) -> None:
+        self.price = price
+        self.year = year
+        self.days = days
+        self.urls = urls
+        self.body_codes = body_codes
+        self.body_types = body_types
+
+    @classmethod
+    def from_rows(cls, car_data: Iterable[CarDataT]) -> "CarDataColumns":
+        # array.array grows without keeping a python object per value, numpy then wraps its buffer without a copy
+        price = array("i")
+        year = array("i")
+        days = array("i")
+        body_codes = array("H")
+        urls: List[str] = []
+        body_index: Dict[str, int] = {}
+        for row_price, row_year, url, row_days, body_type in car_data:
+            price.append(row_price)
+            year.append(row_year)
+            days.append(row_days)
+            urls.append(url)
+            code = body_index.get(body_type)
+            if code is None:
+                code = body_index[body_type] = len(body_index)
+            body_codes.append(code)
+
+        return cls(
+            np.frombuffer(price, dtype=np.intc),
+            np.frombuffer(year, dtype=np.intc),
+            np.frombuffer(days, dtype=np.intc),
+            urls,
+            np.frombuffer(body_codes, dtype=np.uint16),
+            list(body_index),
+        )
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+    def to_arrow(self) -> Any:
+        import pyarrow as pa  # type: ignore
+
+        return pa.table(
+            {
+                # numeric numpy arrays without nulls are wrapped without a copy
+                "price": pa.array(self.price),
+                "year": pa.array(self.year),
+                "url": pa.array(self.urls, type=pa.string()),
+                "days": pa.array(self.days),
+                "body_type": pa.DictionaryArray.from_arrays(pa.array(self.body_codes), self.body_types),
+            }
+        )
@@ -0,0 +1,12 @@
+import json
+from typing import Any, Callable, Union
+
+# orjson decodes av.by pages several times faster than the standard library,
+# it is used when the `fastjson` extra is installed
+loads: Callable[[Union[bytes, str]], Any]
+try:
+    import orjson  # type: ignore
+
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
@@ -0,0 +1,124 @@
+import json
+from os import replace
+from pathlib import Path
+from typing import Dict, List, Tuple, Optional
+
+from cars.config import get_app_config
+from cars.domain.data_collectors.collectors import CarsParser, CarDataT
+
+# advert url -> last seen price
+KnownAdvertsT = Dict[str, int]
+
+# without the total count the early stop is trusted if at least this share of the first page is known
+MIN_KNOWN_SHARE = 0.5
+
+
+class KnownAdvertsState:
+    """
+    Adverts seen by the previous run, stored per car in a JSON file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self._cars: Dict[str, KnownAdvertsT] = json.loads(path.read_text(encoding="utf-8")) if path.exists() else {}
+
+    @staticmethod
+    def get_key(brand: str, model: str, generation: str) -> str:
+        return f"{brand}|{model}|{generation}"
+
+    def get(self, brand: str, model: str, generation: str) -> KnownAdvertsT:
+        return self._cars.get(self.get_key(brand, model, generation), {})
+
+    def set(self, brand: str, model: str, generation: str, known: KnownAdvertsT) -> None:
+        self._cars[self.get_key(brand, model, generation)] = known
+
+    def save(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self._cars, ensure_ascii=False), encoding="utf-8")
+        replace(tmp_path, self.path)
+
+
+class DeltaReport:
+    def __init__(
+        self,
+        new: List[CarDataT],
+        removed: List[str],
+        price_changed: List[Tuple[str, int, int]],
+        known: KnownAdvertsT,
+        is_full: bool,
+        warning: Optional[str] = None,
+    ) -> None:
+        self.new = new
+        self.removed = removed
+        # url, previous price, current price
+        self.price_changed = price_changed
+        # state to keep for the next run
+        self.known = known
+        # every page was loaded, otherwise only the newest pages were compared
+        self.is_full = is_full
+        # why the comparison may be incomplete
+        self.warning = warning
+
+
+def crawl_delta(parser: CarsParser, known: KnownAdvertsT, force_full: bool = False) -> DeltaReport:
+    """
+    Compare current adverts with the ones from the previous run.
+
+    Pages are requested newest first and pagination stops at the first page made only of known adverts.
+    Adverts on pages that were not loaded are older than any loaded one, so if the total count reported by
+    the api equals known + new adverts, nothing was removed and the early stop is safe.
+    Otherwise, or without a previous state, every page is loaded to find out which adverts are gone.
+    If the api leaves the count out, the early stop is kept when at least `MIN_KNOWN_SHARE` of the first page
+    is known, removed adverts are then reported by the next full run.
+    Price changes are reported for loaded adverts only.
+    """
+    seen: Dict[str, CarDataT] = {}
+    is_full = False
+    warning: Optional[str] = None
+
+    if known and not force_full:
+        total_count: Optional[int] = None
+        known_share = 0.0
+        page_id = 1
+        while True:
+            response_data = parser.get_page_response(page_id, get_app_config().newest_first_sorting)
+            rows, page_count = parser.parse_page(response_data)
+            if page_id == 1:
+                total_count = response_data.get("count")
+                known_share = sum(row[2] in known for row in rows) / len(rows) if rows else 0.0
+            for row in rows:
+                seen[row[2]] = row
+            if page_id >= page_count:
+                is_full = True
+                break
+            if all(row[2] in known for row in rows):
+                break
+            page_id += 1
+
+        if is_full:
+            pass
+        elif total_count is None:
+            force_full = known_share < MIN_KNOWN_SHARE
+            warning = f"No advert count, {known_share:.0%} of the first page is known: " + (
+                "loading every page" if force_full else "removed adverts are reported by the next full run"
+            )
+        else:
+            new_count = sum(1 for url in seen if url not in known)
+            force_full = total_count != len(known) + new_count
+
+    if not known or force_full:
+        seen = {row[2]: row for row in parser.car_data}
+        is_full = True
+
+    new = [row for url, row in seen.items() if url not in known]
+    price_changed = [(url, known[url], row[0]) for url, row in seen.items() if url in known and known[url] != row[0]]
+    if is_full:
+        removed = [url for url in known if url not in seen]
+        next_known = {url: row[0] for url, row in seen.items()}
+    else:
+        removed = []
+        next_known = dict(known)
+        next_known.update((url, row[0]) for url, row in seen.items())
+
+    return DeltaReport(new, removed, price_changed, next_known, is_full, warning)
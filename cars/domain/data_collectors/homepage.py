@@ -0,0 +1,82 @@
+import json
+import re
+from html import unescape
+from typing import Dict, List, Set, Any, Optional
+
+from cars.exceptions import ApiRequestError
+
+# one scan over the page finds both the embedded page state and brand buttons
+_HOMEPAGE_PATTERN = re.compile(
+    r'<script[^>]*type="application/json"[^>]*>(?P<state>.*?)</script>'
+    r'|data-property-name="brand">(?P<brand>.*?)</button>',
+    re.DOTALL,
+)
+
+
+class HomepageMetadata:
+    def __init__(
+        self,
+        vendors: Dict[str, int],
+        body_types: Dict[str, int],
+        ambiguous_vendors: Dict[str, List[int]],
+    ) -> None:
+        self.vendors = vendors
+        self.body_types = body_types
+        # brands from the page that have no id or several different ids in the page state
+        self.ambiguous_vendors = ambiguous_vendors
+
+
+def extract_homepage_metadata(data: str) -> HomepageMetadata:
+    """
+    Build brand and body type mappings from the cars.av.by homepage.
+    The page is scanned once, the embedded JSON state is parsed and walked once.
+    """
+    brand_names: Set[str] = set()
+    states: List[Any] = []
+    for match in _HOMEPAGE_PATTERN.finditer(data):
+        if match.group("brand") is not None:
+            brand_names.add(unescape(match.group("brand")))
+            continue
+        try:
+            states.append(json.loads(match.group("state")))
+        except ValueError:
+            continue
+
+    if not states:
+        raise ApiRequestError("Homepage data not found")
+
+    label_ids: Dict[str, Set[int]] = {}
+    body_types: Optional[Dict[str, int]] = None
+    stack = states
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+            continue
+        if not isinstance(node, dict):
+            continue
+
+        label = node.get("label")
+        _id = node.get("id")
+        if isinstance(label, str) and isinstance(_id, int):
+            label_ids.setdefault(label, set()).add(_id)
+
+        body_type = node.get("body_type")
+        if body_types is None and isinstance(body_type, dict) and isinstance(body_type.get("options"), list):
+            body_types = {option["label"]: option["intValue"] for option in body_type["options"]}
+
+        stack.extend(value for value in node.values() if isinstance(value, (dict, list)))
+
+    if body_types is None:
+        raise ApiRequestError("Body types not found on homepage")
+
+    vendors: Dict[str, int] = {}
+    ambiguous_vendors: Dict[str, List[int]] = {}
+    for name in brand_names:
+        ids = label_ids.get(name, set())
+        if len(ids) != 1:
+            ambiguous_vendors[name] = sorted(ids)
+            continue
+        vendors[name] = ids.pop()
+
+    return HomepageMetadata(vendors, body_types, ambiguous_vendors)
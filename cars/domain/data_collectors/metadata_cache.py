@@ -0,0 +1,86 @@
+import json
+from os import replace
+from pathlib import Path
+from threading import RLock
+from time import time
+from typing import Optional, Dict, Any
+
+from cars.config import get_app_config
+from cars.metrics import get_metrics
+
+
+class MetadataCache:
+    """
+    JSON file with av.by metadata (brands, body types, models and generations).
+    Every entry keeps the time it was fetched at, so each kind of data can have its own TTL.
+    """
+
+    def __init__(self, path: Path, enabled: bool = True) -> None:
+        self.path = path
+        self.enabled = enabled
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = RLock()
+
+    @property
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            return self._entries
+
+    def get(self, key: str, ttl: float) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        entry = self.entries.get(key)
+        # kind of data, like "models" for "models:1216"
+        kind = key.split(":", 1)[0]
+        if entry is None or time() - entry["fetched_at"] > ttl:
+            get_metrics().inc("metadata_cache_requests_total", kind=kind, result="miss")
+            return None
+        get_metrics().inc("metadata_cache_requests_total", kind=kind, result="hit")
+        return entry["data"]
+
+    def set(self, key: str, data: Any) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.entries[key] = {"fetched_at": time(), "data": data}
+            self._save()
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self.entries.clear()
+            else:
+                self.entries.pop(key, None)
+            self._save()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.enabled or not self.path.exists():
+            return {}
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except ValueError:
+            # broken cache is not worth failing the run, it will be rewritten
+            return {}
+
+    def _save(self) -> None:
+        if not self.enabled:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.entries, ensure_ascii=False), encoding="utf-8")
+        replace(tmp_path, self.path)
+
+
+_METADATA_CACHE: Optional[MetadataCache] = None
+_METADATA_CACHE_LOCK = RLock()
+
+
+def get_metadata_cache() -> MetadataCache:
+    global _METADATA_CACHE
+    with _METADATA_CACHE_LOCK:
+        if _METADATA_CACHE is None:
+            cache_config = get_app_config().metadata_cache
+            _METADATA_CACHE = MetadataCache(Path(cache_config.path).expanduser(), cache_config.enabled)
+    return _METADATA_CACHE
@@ -0,0 +1,92 @@
+from time import perf_counter
+from typing import List, Dict, Tuple, Optional, Any
+
+from cars.config import get_app_config
+from cars.domain.data_collectors.collectors import CarsParser, CarDataT, iter_pages
+from cars.domain.data_collectors.transport import get_transport
+from cars.exceptions import LogicError
+from cars.metrics import get_metrics
+
+# index of the parser the advert belongs to, advert data
+GroupedCarDataT = Tuple[int, CarDataT]
+
+
+class MultiCarsParser:
+    """
+    Adverts of several cars collected by a single filter query with a brand group per car.
+    Adverts are split back by their brand, model and generation,
+    a car without a generation gets every advert of its model.
+    All cars must filter the same body types, the filter applies them to every group.
+    """
+
+    def __init__(self, parsers: List[CarsParser], max_page_requests: Optional[int] = None) -> None:
+        if not parsers:
+            raise LogicError("At least one car is required")
+        self.body_type_ids = parsers[0].body_type_ids
+        if any(sorted(parser.body_type_ids) != sorted(self.body_type_ids) for parser in parsers):
+            raise LogicError("Cars collected by one query must filter the same body types")
+        self.parsers = parsers
+        self.max_page_requests: int = max_page_requests or get_app_config().max_page_requests
+        # (brand, model) -> indexes of parsers and generations they are limited to
+        self._routes: Dict[Tuple[str, str], List[Tuple[int, Optional[str]]]] = {}
+        for parser_id, parser in enumerate(parsers):
+            self._routes.setdefault((parser.brand, parser.model), []).append((parser_id, parser.generation))
+        self._brands_groups: Optional[List[List[Dict[str, Any]]]] = None
+
+    def get_car_data(self) -> List[List[CarDataT]]:
+        """
+        Adverts of every car, in the order of `parsers`.
+        """
+        car_data: List[List[CarDataT]] = [[] for _ in self.parsers]
+        for page_data in iter_pages(self._get_page_data, self.max_page_requests):
+            for parser_id, data in page_data:
+                car_data[parser_id].append(data)
+        return car_data
+
+    @property
+    def brands_groups(self) -> List[List[Dict[str, Any]]]:
+        if self._brands_groups is None:
+            self._brands_groups = [
+                CarsParser.get_brands_group(parser.brand_id, parser.model_id, parser.get_generation_id())
+                for parser in self.parsers
+            ]
+        return self._brands_groups
+
+    def get_page_response(self, page_id: int) -> Dict[str, Any]:
+        app_config = get_app_config()
+        url = app_config.host + app_config.filter_request
+        payload = CarsParser.get_groups_page_payload(page_id, self.brands_groups, self.body_type_ids)
+        return get_transport().post_json(url, payload)
+
+    def parse_page(self, response_data: Dict[str, Any]) -> Tuple[List[GroupedCarDataT], int]:
+        result = []
+        metrics = get_metrics()
+        start = perf_counter()
+        unmatched = 0
+
+        for ad in response_data["adverts"]:
+            properties = {_property["name"]: _property["value"] for _property in ad["properties"]}
+            data = (
+                ad["price"]["usd"]["amount"],
+                ad["year"],
+                ad["publicUrl"],
+                ad["originalDaysOnSale"],
+                properties.get("body_type", "-"),
+            )
+            routes = self._routes.get((properties.get("brand", ""), properties.get("model", "")), [])
+            matched = False
+            for parser_id, generation in routes:
+                if generation is None or generation == properties.get("generation"):
+                    result.append((parser_id, data))
+                    matched = True
+            unmatched += not matched
+
+        metrics.observe("page_parse_seconds", perf_counter() - start)
+        metrics.inc("pages_parsed_total")
+        metrics.inc("adverts_parsed_total", len(response_data["adverts"]))
+        if unmatched:
+            metrics.inc("adverts_unmatched_total", unmatched)
+        return result, response_data["pageCount"]
+
+    def _get_page_data(self, page_id: int) -> Tuple[List[GroupedCarDataT], int]:
+        return self.parse_page(self.get_page_response(page_id))
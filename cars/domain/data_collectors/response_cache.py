@@ -0,0 +1,83 @@
+import gzip
+import json
+from hashlib import sha256
+from os import replace
+from pathlib import Path
+from threading import Lock, get_ident
+from time import time
+from typing import Optional, Dict, Any
+
+from cars.config import get_app_config
+from cars.exceptions import ApiRequestError
+from cars.metrics import get_metrics
+
+
+class ResponseCache:
+    """
+    av.by response bodies on disk, a gzip file per request named by the hash of its method, url and payload.
+    In the `live` mode it is not used, in `cache` responses younger than `ttl` are reused and new ones stored,
+    in `replay` only stored responses of any age are used and nothing is requested.
+    """
+
+    def __init__(self, path: Path, mode: str = "live", ttl: float = 0) -> None:
+        self.path = path
+        self.mode = mode
+        self.ttl = ttl
+
+    @staticmethod
+    def get_key(method: str, url: str, payload: Optional[Dict[str, Any]]) -> str:
+        # payloads equal as json share an entry no matter the order of their keys
+        request = json.dumps(
+            {"method": method, "url": url, "payload": payload},
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+        )
+        return sha256(request.encode()).hexdigest()
+
+    def get_path(self, key: str) -> Path:
+        return self.path / key[:2] / f"{key}.gz"
+
+    def get(self, method: str, url: str, payload: Optional[Dict[str, Any]] = None) -> Optional[bytes]:
+        """
+        Stored body of the request if the mode allows to use it.
+        Raises `ApiRequestError` in the `replay` mode if nothing is stored.
+        """
+        if self.mode == "live":
+            return None
+        path = self.get_path(self.get_key(method, url, payload))
+        try:
+            if self.mode == "replay" or time() - path.stat().st_mtime <= self.ttl:
+                data = gzip.decompress(path.read_bytes())
+                get_metrics().inc("response_cache_requests_total", result="hit")
+                return data
+        except (OSError, EOFError):
+            # missing or broken entry, a broken one is rewritten by the next response
+            pass
+        get_metrics().inc("response_cache_requests_total", result="miss")
+        if self.mode == "replay":
+            raise ApiRequestError(f"No recorded response for {method} {url}")
+        return None
+
+    def set(self, method: str, url: str, payload: Optional[Dict[str, Any]], data: bytes) -> None:
+        if self.mode != "cache":
+            return
+        path = self.get_path(self.get_key(method, url, payload))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # threads may store the same request at once
+        tmp_path = path.with_name(f"{path.name}.{get_ident()}.tmp")
+        tmp_path.write_bytes(gzip.compress(data, compresslevel=6))
+        replace(tmp_path, path)
+
+
+_RESPONSE_CACHE: Optional[ResponseCache] = None
+_RESPONSE_CACHE_LOCK = Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    global _RESPONSE_CACHE
+    with _RESPONSE_CACHE_LOCK:
+        if _RESPONSE_CACHE is None:
+            cache_config = get_app_config().response_cache
+            _RESPONSE_CACHE = ResponseCache(Path(cache_config.path).expanduser(), cache_config.mode, cache_config.ttl)
+    return _RESPONSE_CACHE
@@ -0,0 +1,143 @@
+import asyncio
+from threading import Condition
+from time import monotonic
+from typing import Optional, Callable
+
+from cars.config.app import RateLimitConfig
+from cars.metrics import get_metrics
+
+
+class AdaptiveLimit:
+    """
+    Token bucket of `requests_per_second` with room for `burst` requests, combined with a concurrency limit
+    adjusted by AIMD: every request finished in time adds `1 / limit` to the limit, so it grows by one
+    per limit of successful requests, while 429 and 5xx responses, errors and responses slower than
+    `latency_target` multiply it by `decrease_factor`. One decrease per round of requests is enough,
+    failures of requests started before the last decrease are not counted again.
+    A Retry-After pauses all requests. With the rate limit disabled only `max_concurrency` is kept, if given.
+    Not thread safe, schedulers call it under their locks.
+    """
+
+    def __init__(
+        self, config: RateLimitConfig, max_concurrency: Optional[int] = None, clock: Callable[[], float] = monotonic
+    ) -> None:
+        self.enabled = config.enabled
+        self.rate = config.requests_per_second
+        self.burst = config.burst
+        self.latency_target = config.latency_target
+        self.decrease_factor = config.decrease_factor
+        self.clock = clock
+        if config.enabled:
+            self.max_concurrency: Optional[int] = min(max_concurrency or config.max_concurrency, config.max_concurrency)
+            self.min_concurrency = min(config.min_concurrency, self.max_concurrency)
+            self.limit = float(min(max(config.initial_concurrency, self.min_concurrency), self.max_concurrency))
+        else:
+            self.max_concurrency = max_concurrency
+            self.min_concurrency = max_concurrency or 1
+            self.limit = float(max_concurrency or 0)
+        self.in_flight = 0
+        self.tokens = float(config.burst)
+        self.refilled_at = clock()
+        self.decreased_at = float("-inf")
+        self.paused_until = float("-inf")
+
+    def try_start(self) -> Optional[float]:
+        """
+        Start a request if it is allowed now and return 0.
+        Otherwise return seconds to wait for a token or None if a running request has to finish first.
+        """
+        if self.max_concurrency is not None and self.in_flight >= int(self.limit):
+            return None
+        if self.enabled:
+            now = self.clock()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self.tokens = min(self.burst, self.tokens + (now - self.refilled_at) * self.rate)
+            self.refilled_at = now
+            if self.tokens < 1:
+                return (1 - self.tokens) / self.rate
+            self.tokens -= 1
+        self.in_flight += 1
+        return 0
+
+    def finish(self, started_at: float, overloaded: bool, retry_after: Optional[float] = None) -> None:
+        self.in_flight -= 1
+        if not self.enabled:
+            return
+        now = self.clock()
+        if overloaded or now - started_at > self.latency_target:
+            if started_at >= self.decreased_at:
+                self.limit = max(float(self.min_concurrency), self.limit * self.decrease_factor)
+                self.decreased_at = now
+                # no burst right after the server asked to slow down
+                self.tokens = min(self.tokens, 0.0)
+                get_metrics().inc("rate_limit_decreases_total")
+            if retry_after is not None:
+                self.paused_until = max(self.paused_until, now + retry_after)
+        else:
+            self.limit = min(float(self.max_concurrency or 0), self.limit + 1 / self.limit)
+        get_metrics().set("rate_limit_concurrency", self.limit)
+
+
+class RequestScheduler:
+    """
+    `AdaptiveLimit` shared by threads. Every request is started with `acquire` and reported with `release`.
+    """
+
+    def __init__(
+        self, config: RateLimitConfig, max_concurrency: Optional[int] = None, clock: Callable[[], float] = monotonic
+    ) -> None:
+        self.limit = AdaptiveLimit(config, max_concurrency, clock)
+        self._condition = Condition()
+
+    def acquire(self) -> float:
+        """
+        Wait until a request may be sent, return the time it was started at.
+        """
+        waiting_since = self.limit.clock()
+        with self._condition:
+            while True:
+                delay = self.limit.try_start()
+                if delay == 0:
+                    break
+                self._condition.wait(delay)
+        started_at = self.limit.clock()
+        get_metrics().inc("rate_limit_wait_seconds_total", started_at - waiting_since)
+        return started_at
+
+    def release(self, started_at: float, overloaded: bool, retry_after: Optional[float] = None) -> None:
+        with self._condition:
+            self.limit.finish(started_at, overloaded, retry_after)
+            self._condition.notify_all()
+
+
+class AsyncRequestScheduler:
+    """
+    `AdaptiveLimit` shared by coroutines of one event loop, see `RequestScheduler`.
+    """
+
+    def __init__(
+        self, config: RateLimitConfig, max_concurrency: Optional[int] = None, clock: Callable[[], float] = monotonic
+    ) -> None:
+        self.limit = AdaptiveLimit(config, max_concurrency, clock)
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> float:
+        waiting_since = self.limit.clock()
+        async with self._condition:
+            while True:
+                delay = self.limit.try_start()
+                if delay == 0:
+                    break
+                try:
+                    await asyncio.wait_for(self._condition.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+        started_at = self.limit.clock()
+        get_metrics().inc("rate_limit_wait_seconds_total", started_at - waiting_since)
+        return started_at
+
+    async def release(self, started_at: float, overloaded: bool, retry_after: Optional[float] = None) -> None:
+        async with self._condition:
+            self.limit.finish(started_at, overloaded, retry_after)
+            self._condition.notify_all()
@@ -0,0 +1,35 @@
+from typing import Optional, Iterable, Iterator
+
+from cars.domain.data_collectors.collectors import CarDataT
+
+
+class CarSummary:
+    """
+    Price and year range of a car, updated as adverts pass through `track`.
+    """
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.min_price: Optional[int] = None
+        self.max_price: Optional[int] = None
+        self.min_year: Optional[int] = None
+        self.max_year: Optional[int] = None
+
+    def add(self, data: CarDataT) -> None:
+        price, year = data[0], data[1]
+        if self.count == 0:
+            self.min_price = self.max_price = price
+            self.min_year = self.max_year = year
+        else:
+            assert self.min_price is not None and self.max_price is not None
+            assert self.min_year is not None and self.max_year is not None
+            self.min_price = min(self.min_price, price)
+            self.max_price = max(self.max_price, price)
+            self.min_year = min(self.min_year, year)
+            self.max_year = max(self.max_year, year)
+        self.count += 1
+
+    def track(self, car_data: Iterable[CarDataT]) -> Iterator[CarDataT]:
+        for data in car_data:
+            self.add(data)
+            yield data
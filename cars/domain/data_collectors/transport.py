@@ -0,0 +1,162 @@
+from random import uniform
+from threading import Lock
+from time import sleep, perf_counter
+from typing import Optional, Dict, Any, Union
+from urllib.parse import urlsplit
+
+from requests import Session, Response, RequestException
+from requests.adapters import HTTPAdapter
+
+from cars.config import get_app_config
+from cars.config.app import HttpConfig, RateLimitConfig
+from cars.domain.data_collectors.decoding import loads
+from cars.domain.data_collectors.response_cache import get_response_cache
+from cars.domain.data_collectors.scheduler import RequestScheduler
+from cars.exceptions import ApiRequestError
+from cars.metrics import get_metrics
+
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+# connections per host of a transport before `reserve_connections`, the requests default
+DEFAULT_POOL_SIZE = 10
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff shared by the sync and async transports.
+    """
+
+    def __init__(self, config: HttpConfig) -> None:
+        self.retries = config.retries
+        self.backoff_base = config.backoff_base
+        self.backoff_max = config.backoff_max
+
+    def can_retry(self, attempt: int) -> bool:
+        return attempt < self.retries
+
+    def get_retry_after(self, retry_after: Optional[str]) -> Optional[float]:
+        """
+        Seconds from a Retry-After header, at most `backoff_max`.
+        """
+        if retry_after is not None and retry_after.isdigit():
+            return min(float(retry_after), self.backoff_max)
+        return None
+
+    def get_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        delay = self.get_retry_after(retry_after)
+        if delay is not None:
+            return delay
+        # "full jitter": spreads retries of parallel requests instead of sending them in waves
+        return uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+
+def record_request(url: str, status: Union[int, str], seconds: float, size: int = 0) -> None:
+    """
+    Count a request attempt in the run metrics, `status` is "error" when no response was received.
+    """
+    metrics = get_metrics()
+    endpoint = urlsplit(url).path or "/"
+    metrics.inc("http_requests_total", endpoint=endpoint, status=status)
+    metrics.observe("http_request_seconds", seconds, endpoint=endpoint)
+    if size:
+        metrics.inc("http_response_bytes_total", size, endpoint=endpoint)
+
+
+def record_retry(url: str, delay: float) -> None:
+    metrics = get_metrics()
+    endpoint = urlsplit(url).path or "/"
+    metrics.inc("http_retries_total", endpoint=endpoint)
+    metrics.inc("http_retry_wait_seconds_total", delay, endpoint=endpoint)
+
+
+class ApiTransport:
+    """
+    Pooled keep-alive session used for every av.by request.
+    Requests of all threads are paced by one `RequestScheduler`.
+    Connection errors, timeouts, 429 and 5xx responses are retried, anything else raises `ApiRequestError`.
+    """
+
+    def __init__(self, config: HttpConfig, rate_limit: RateLimitConfig) -> None:
+        self.timeout = (config.connect_timeout, config.read_timeout)
+        self.retry_policy = RetryPolicy(config)
+        self.scheduler = RequestScheduler(rate_limit)
+        self.fixed_pool_size = config.pool_size
+        self.pool_size = 0
+        self.session = Session()
+        self._mount_adapter(config.pool_size or DEFAULT_POOL_SIZE)
+        self.session.headers.update({"Accept-Encoding": "gzip, deflate"})
+
+    def _mount_adapter(self, pool_size: int) -> None:
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.pool_size = pool_size
+
+    def reserve_connections(self, count: int) -> None:
+        """
+        Grow the pool to keep a connection for each of `count` requests in flight,
+        unless `pool_size` is set in the config. Requests beyond the rate limiter concurrency are not counted.
+        Meant to be called before requests are sent: idle connections of the previous pool are dropped.
+        """
+        if self.scheduler.limit.max_concurrency is not None:
+            count = min(count, self.scheduler.limit.max_concurrency)
+        if self.fixed_pool_size is None and count > self.pool_size:
+            self._mount_adapter(count)
+
+    def request(self, method: str, url: str, payload: Optional[Dict[str, Any]] = None) -> Response:
+        attempt = 0
+        while True:
+            retry_after = None
+            started_at = self.scheduler.acquire()
+            start = perf_counter()
+            try:
+                response = self.session.request(method, url, json=payload, timeout=self.timeout)
+            except RequestException as ex:
+                self.scheduler.release(started_at, overloaded=True)
+                record_request(url, "error", perf_counter() - start)
+                if not self.retry_policy.can_retry(attempt):
+                    raise ApiRequestError(f"Request error: {ex}") from ex
+            else:
+                retry_after = response.headers.get("Retry-After")
+                self.scheduler.release(
+                    started_at, response.status_code in RETRY_STATUSES, self.retry_policy.get_retry_after(retry_after)
+                )
+                record_request(url, response.status_code, perf_counter() - start, len(response.content))
+                if response.status_code == 200:
+                    return response
+                if response.status_code not in RETRY_STATUSES or not self.retry_policy.can_retry(attempt):
+                    raise ApiRequestError(f"Request error: {response.status_code}, {response.reason}")
+
+            delay = self.retry_policy.get_delay(attempt, retry_after)
+            record_retry(url, delay)
+            sleep(delay)
+            attempt += 1
+
+    def fetch(self, method: str, url: str, payload: Optional[Dict[str, Any]] = None) -> bytes:
+        """
+        Response body, taken from the response cache if its mode allows.
+        """
+        response_cache = get_response_cache()
+        data = response_cache.get(method, url, payload)
+        if data is None:
+            data = self.request(method, url, payload).content
+            response_cache.set(method, url, payload, data)
+        return data
+
+    def get_text(self, url: str) -> str:
+        return self.fetch("GET", url).decode()
+
+    def post_json(self, url: str, payload: Dict[str, Any]) -> Any:
+        return loads(self.fetch("POST", url, payload))
+
+
+_TRANSPORT: Optional[ApiTransport] = None
+_TRANSPORT_LOCK = Lock()
+
+
+def get_transport() -> ApiTransport:
+    global _TRANSPORT
+    with _TRANSPORT_LOCK:
+        if _TRANSPORT is None:
+            app_config = get_app_config()
+            _TRANSPORT = ApiTransport(app_config.http, app_config.rate_limit)
+    return _TRANSPORT
@@ -0,0 +1,36 @@
+from typing import Dict, Any, List, Optional
+
+from cars.exceptions import SheetsRequestError
+
+
+class SheetsApiError(SheetsRequestError):
+    """
+    Failed api call. `status` is None when no response was received.
+    """
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[str] = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class SheetsBackend:
+    """
+    Google Sheets api calls made by `SheetsRequests`, bodies and responses are the ones of the REST api.
+    `fields` of reads is a partial response mask, all fields are returned if it is None.
+    Calls may be made from several threads at once.
+    """
+
+    def get_spreadsheet(self, spreadsheet_id: str, fields: Optional[str] = None) -> Dict[str, Any]:
+        raise NotImplementedError()
+
+    def batch_update(self, spreadsheet_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError()
+
+    def values_batch_update(self, spreadsheet_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        raise NotImplementedError()
+
+    def values_batch_get(
+        self, spreadsheet_id: str, ranges: List[str], value_render_option: str, fields: Optional[str] = None
+    ) -> Dict[str, Any]:
+        raise NotImplementedError()
@@ -0,0 +1,284 @@
+import json
+import re
+from collections import deque
+from random import Random
+from threading import Lock
+from time import monotonic
+from typing import Dict, Any, List, Optional, Tuple, Deque, Callable
+
+from cars.domain.google_sheets_integration.backend import SheetsBackend, SheetsApiError
+
+# first row, first column, end row, end column, end indexes are exclusive
+RangeT = Tuple[int, int, int, int]
+
+_A1_PATTERN = re.compile(r"^'(?P<title>(?:[^']|'')*)'(?:!(?P<column>[A-Z]+)(?P<row>\d+))?$")
+_NUMBER_PATTERN = re.compile(r"^-?\d+(\.\d+)?$")
+_UNBOUNDED = 10 ** 9
+
+
+class FakeSheet:
+    def __init__(self, sheet_id: int, title: str) -> None:
+        self.id = sheet_id
+        self.title = title
+        self.cells: Dict[Tuple[int, int], Any] = {}
+        self.merges: List[RangeT] = []
+        # applied formats and borders, in order
+        self.formats: List[Tuple[RangeT, Dict[str, Any]]] = []
+
+    def get_values(self) -> List[List[Any]]:
+        """
+        Values the way the values api returns them: trailing empty cells and rows are left out.
+        """
+        if not self.cells:
+            return []
+        rows: List[List[Any]] = [[] for _ in range(max(row for row, _ in self.cells) + 1)]
+        for (row, column), value in sorted(self.cells.items()):
+            rows[row].extend([""] * (column - len(rows[row])))
+            rows[row].append(value)
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def clear(self, cells_range: RangeT) -> None:
+        self.cells = {key: value for key, value in self.cells.items() if not _contains(cells_range, key)}
+        self.formats = [
+            (applied, cell_format) for applied, cell_format in self.formats if not _overlaps(applied, cells_range)
+        ]
+
+
+def _contains(cells_range: RangeT, cell: Tuple[int, int]) -> bool:
+    return cells_range[0] <= cell[0] < cells_range[2] and cells_range[1] <= cell[1] < cells_range[3]
+
+
+def _overlaps(first: RangeT, second: RangeT) -> bool:
+    return first[0] < second[2] and second[0] < first[2] and first[1] < second[3] and second[1] < first[3]
+
+
+def _get_range(grid_range: Dict[str, Any]) -> RangeT:
+    return (
+        grid_range.get("startRowIndex", 0),
+        grid_range.get("startColumnIndex", 0),
+        grid_range.get("endRowIndex", _UNBOUNDED),
+        grid_range.get("endColumnIndex", _UNBOUNDED),
+    )
+
+
+def _get_user_entered_value(value: Any) -> Any:
+    if isinstance(value, str) and _NUMBER_PATTERN.match(value):
+        return float(value) if "." in value else int(value)
+    return value
+
+
+def _get_column_index(column: str) -> int:
+    index = 0
+    for letter in column:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index - 1
+
+
+class InMemorySheetsBackend(SheetsBackend):
+    """
+    Spreadsheet kept in memory, for tests and benchmarks without the api.
+    Applies the requests built by `operations` and the values api calls of `SheetsRequests`,
+    sheets referenced by a batchUpdate are checked before any of its requests is applied,
+    and like the api it refuses to delete the last sheet.
+    Bodies over `max_body_bytes` are rejected, calls over `quota_per_minute` and a `quota_error_rate` share of calls
+    are answered with 429.
+    """
+
+    def __init__(
+        self,
+        sheets: Optional[Dict[str, int]] = None,
+        max_body_bytes: int = 10 * 1024 * 1024,
+        quota_per_minute: Optional[int] = None,
+        quota_error_rate: float = 0.0,
+        seed: int = 0,
+        clock: Callable[[], float] = monotonic,
+    ) -> None:
+        self.sheets: Dict[int, FakeSheet] = {
+            sheet_id: FakeSheet(sheet_id, title) for title, sheet_id in (sheets or {"Sheet1": 0}).items()
+        }
+        self.max_body_bytes = max_body_bytes
+        self.quota_per_minute = quota_per_minute
+        self.quota_error_rate = quota_error_rate
+        self.clock = clock
+        self._random = Random(seed)
+        self._calls_times: Deque[float] = deque()
+        self._lock = Lock()
+        # api method -> number of calls and bytes sent, rejected calls included
+        self.calls: Dict[str, int] = {}
+        self.sent_bytes: Dict[str, int] = {}
+
+    def get_sheet(self, title: str) -> FakeSheet:
+        for sheet in self.sheets.values():
+            if sheet.title == title:
+                return sheet
+        raise SheetsApiError(f"Unable to parse range: {title}", 400)
+
+    def _register_call(self, method: str, body: Any) -> None:
+        size = len(json.dumps(body))
+        self.calls[method] = self.calls.get(method, 0) + 1
+        self.sent_bytes[method] = self.sent_bytes.get(method, 0) + size
+        if size > self.max_body_bytes:
+            raise SheetsApiError(f"Request payload size exceeds the limit: {self.max_body_bytes} bytes", 400)
+
+        now = self.clock()
+        while self._calls_times and now - self._calls_times[0] >= 60:
+            self._calls_times.popleft()
+        if self.quota_per_minute is not None and len(self._calls_times) >= self.quota_per_minute:
+            retry_after = 60 - (now - self._calls_times[0])
+            raise SheetsApiError("Quota exceeded", 429, str(int(retry_after) + 1))
+        self._calls_times.append(now)
+        if self._random.random() < self.quota_error_rate:
+            raise SheetsApiError("Quota exceeded", 429)
+
+    def get_spreadsheet(self, spreadsheet_id: str, fields: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            self._register_call("get", {})
+            return {
+                "spreadsheetId": spreadsheet_id,
+                "sheets": [
+                    {"properties": {"sheetId": sheet.id, "title": sheet.title}} for sheet in self.sheets.values()
+                ],
+            }
+
+    def batch_update(self, spreadsheet_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._register_call("batchUpdate", body)
+            self._validate(body["requests"])
+            for request in body["requests"]:
+                self._apply(request)
+            return {"spreadsheetId": spreadsheet_id, "replies": [{} for _ in body["requests"]]}
+
+    def values_batch_update(self, spreadsheet_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._register_call("values.batchUpdate", body)
+            targets = [(self._parse_a1(value_range["range"]), value_range["values"]) for value_range in body["data"]]
+            for (sheet, start_row, start_column), values in targets:
+                for row_id, row in enumerate(values):
+                    for column_id, value in enumerate(row):
+                        cell = (start_row + row_id, start_column + column_id)
+                        if value is None:
+                            continue
+                        if value == "":
+                            sheet.cells.pop(cell, None)
+                        elif body.get("valueInputOption") == "USER_ENTERED":
+                            sheet.cells[cell] = _get_user_entered_value(value)
+                        else:
+                            sheet.cells[cell] = value
+            return {"spreadsheetId": spreadsheet_id, "totalUpdatedRows": sum(len(values) for _, values in targets)}
+
+    def values_batch_get(
+        self, spreadsheet_id: str, ranges: List[str], value_render_option: str, fields: Optional[str] = None
+    ) -> Dict[str, Any]:
+        with self._lock:
+            self._register_call("values.batchGet", ranges)
+            value_ranges = []
+            for a1_range in ranges:
+                sheet, _, _ = self._parse_a1(a1_range)
+                value_range: Dict[str, Any] = {"range": a1_range, "majorDimension": "ROWS"}
+                values = sheet.get_values()
+                if values:
+                    value_range["values"] = values
+                value_ranges.append(value_range)
+            return {"spreadsheetId": spreadsheet_id, "valueRanges": value_ranges}
+
+    def _parse_a1(self, a1_range: str) -> Tuple[FakeSheet, int, int]:
+        match = _A1_PATTERN.match(a1_range)
+        if match is None:
+            raise SheetsApiError(f"Unable to parse range: {a1_range}", 400)
+        sheet = self.get_sheet(match.group("title").replace("''", "'"))
+        if match.group("row") is None:
+            return sheet, 0, 0
+        return sheet, int(match.group("row")) - 1, _get_column_index(match.group("column"))
+
+    def _validate(self, requests: List[Dict[str, Any]]) -> None:
+        ids = {sheet.id for sheet in self.sheets.values()}
+        titles = {sheet.title for sheet in self.sheets.values()}
+        for request_id, request in enumerate(requests):
+            ((kind, data),) = request.items()
+            if kind == "addSheet":
+                properties = data["properties"]
+                if properties.get("sheetId") in ids or properties.get("title") in titles:
+                    raise SheetsApiError(f"Invalid requests[{request_id}].addSheet: sheet already exists", 400)
+                ids.add(properties.get("sheetId"))
+                titles.add(properties.get("title"))
+                continue
+            if kind not in self._APPLY:
+                raise SheetsApiError(f"Invalid requests[{request_id}]: unsupported request {kind}", 400)
+            sheet_id = self._get_sheet_id(kind, data)
+            if sheet_id not in ids:
+                raise SheetsApiError(f"Invalid requests[{request_id}].{kind}: no grid with id: {sheet_id}", 400)
+            if kind == "deleteSheet":
+                ids.remove(sheet_id)
+                if not ids:
+                    raise SheetsApiError(
+                        f"Invalid requests[{request_id}].deleteSheet: You can't remove all the sheets in a document.",
+                        400,
+                    )
+
+    @staticmethod
+    def _get_sheet_id(kind: str, data: Dict[str, Any]) -> int:
+        if kind == "deleteSheet":
+            return data["sheetId"]
+        if kind == "autoResizeDimensions":
+            return data["dimensions"]["sheetId"]
+        if "start" in data:
+            return data["start"]["sheetId"]
+        return data["range"]["sheetId"]
+
+    def _apply(self, request: Dict[str, Any]) -> None:
+        ((kind, data),) = request.items()
+        if kind == "addSheet":
+            properties = data["properties"]
+            sheet_id = properties.get("sheetId", max(self.sheets, default=-1) + 1)
+            self.sheets[sheet_id] = FakeSheet(sheet_id, properties.get("title", f"Sheet{sheet_id}"))
+            return
+        self._APPLY[kind](self, self.sheets[self._get_sheet_id(kind, data)], data)
+
+    def _delete_sheet(self, sheet: FakeSheet, data: Dict[str, Any]) -> None:
+        del self.sheets[sheet.id]
+
+    def _update_cells(self, sheet: FakeSheet, data: Dict[str, Any]) -> None:
+        if "range" in data:
+            # only clearing is sent with a range
+            sheet.clear(_get_range(data["range"]))
+            return
+        start_row, start_column = data["start"].get("rowIndex", 0), data["start"].get("columnIndex", 0)
+        for row_id, row in enumerate(data["rows"]):
+            for column_id, cell in enumerate(row.get("values", [])):
+                ((_, value),) = cell["userEnteredValue"].items()
+                if value == "":
+                    sheet.cells.pop((start_row + row_id, start_column + column_id), None)
+                else:
+                    sheet.cells[(start_row + row_id, start_column + column_id)] = value
+
+    def _format_cells(self, sheet: FakeSheet, data: Dict[str, Any]) -> None:
+        sheet.formats.append((_get_range(data["range"]), data.get("cell", data)))
+
+    def _merge_cells(self, sheet: FakeSheet, data: Dict[str, Any]) -> None:
+        merge = _get_range(data["range"])
+        if any(_overlaps(merge, existing) for existing in sheet.merges):
+            raise SheetsApiError("You can't merge cells that are already merged", 400)
+        sheet.merges.append(merge)
+        # only the top left value is kept
+        sheet.cells = {
+            key: value for key, value in sheet.cells.items() if not _contains(merge, key) or key == merge[:2]
+        }
+
+    def _unmerge_cells(self, sheet: FakeSheet, data: Dict[str, Any]) -> None:
+        cells_range = _get_range(data["range"])
+        sheet.merges = [merge for merge in sheet.merges if not _overlaps(merge, cells_range)]
+
+    def _resize(self, sheet: FakeSheet, data: Dict[str, Any]) -> None:
+        pass
+
+    _APPLY: Dict[str, Callable[["InMemorySheetsBackend", FakeSheet, Dict[str, Any]], None]] = {
+        "deleteSheet": _delete_sheet,
+        "updateCells": _update_cells,
+        "repeatCell": _format_cells,
+        "updateBorders": _format_cells,
+        "mergeCells": _merge_cells,
+        "unmergeCells": _unmerge_cells,
+        "autoResizeDimensions": _resize,
+    }
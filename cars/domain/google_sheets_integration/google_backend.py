@@ -0,0 +1,57 @@
+from threading import local
+from typing import Dict, Any, List, Optional
+
+from googleapiclient.discovery import build, Resource  # type: ignore
+from googleapiclient.errors import HttpError  # type: ignore
+from httplib2 import Http, HttpLib2Error  # type: ignore
+from oauth2client.service_account import ServiceAccountCredentials  # type: ignore
+
+from cars.domain.google_sheets_integration.backend import SheetsBackend, SheetsApiError
+
+
+class GoogleSheetsBackend(SheetsBackend):
+    """
+    Google Sheets api authorized with service account credentials.
+    """
+
+    def __init__(self, credentials_path: str) -> None:
+        scopes = ["https://www.googleapis.com/auth/spreadsheets"]
+        self.credentials = ServiceAccountCredentials.from_json_keyfile_name(credentials_path, scopes)
+        # the discovery document bundled with the client, nothing is downloaded or cached on disk
+        service = build(
+            "sheets", "v4", http=self.credentials.authorize(Http()), static_discovery=True, cache_discovery=False
+        )
+        self.spreadsheets: Resource = service.spreadsheets()
+        # httplib2 connections can't be shared between threads
+        self._local = local()
+
+    def _get_http(self) -> Http:
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = self.credentials.authorize(Http())
+        return http
+
+    def _execute(self, request: Any) -> Dict[str, Any]:
+        try:
+            return request.execute(http=self._get_http())
+        except HttpError as ex:
+            raise SheetsApiError(str(ex), ex.resp.status, ex.resp.get("retry-after")) from ex
+        except (HttpLib2Error, OSError) as ex:
+            raise SheetsApiError(str(ex)) from ex
+
+    def get_spreadsheet(self, spreadsheet_id: str, fields: Optional[str] = None) -> Dict[str, Any]:
+        return self._execute(self.spreadsheets.get(spreadsheetId=spreadsheet_id, fields=fields))
+
+    def batch_update(self, spreadsheet_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        return self._execute(self.spreadsheets.batchUpdate(spreadsheetId=spreadsheet_id, body=body))
+
+    def values_batch_update(self, spreadsheet_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        return self._execute(self.spreadsheets.values().batchUpdate(spreadsheetId=spreadsheet_id, body=body))
+
+    def values_batch_get(
+        self, spreadsheet_id: str, ranges: List[str], value_render_option: str, fields: Optional[str] = None
+    ) -> Dict[str, Any]:
+        request = self.spreadsheets.values().batchGet(
+            spreadsheetId=spreadsheet_id, ranges=ranges, valueRenderOption=value_render_option, fields=fields
+        )
+        return self._execute(request)
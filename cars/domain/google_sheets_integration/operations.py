@@ -1,8 +1,28 @@
-from copy import deepcopy
 from typing import Dict, Any, List
 
+HEADER_FORMAT = {
+    "horizontalAlignment": "CENTER",
+    "verticalAlignment": "MIDDLE",
+    "textFormat": {
+        "bold": True,
+    },
+}
+REGULAR_FORMAT = {
+    "horizontalAlignment": "LEFT",
+    "verticalAlignment": "MIDDLE",
+    "textFormat": {
+        "bold": False,
+    },
+}
+FORMAT_FIELDS = "userEnteredFormat(horizontalAlignment,verticalAlignment,textFormat.bold)"
+
 
 class Operation:
+    # id of the sheet changed by the operation
+    id: int
+    # api method the operation is sent with, `batchUpdate` or `values.batchUpdate`
+    method = "batchUpdate"
+
     def to_dict(self) -> Dict[str, Any]:
         raise NotImplementedError()
 
@@ -77,43 +97,62 @@ class ChangeBorder(Operation):
         }
 
 
+class FormatCells(Operation):
+    def __init__(self, id_: int, x0: int, w: int, y0: int, h: int, cell_format: Dict[str, Any]):
+        self.id = id_
+        self.x0 = x0
+        self.w = w
+        self.y0 = y0
+        self.h = h
+        self.cell_format = cell_format
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "repeatCell": {
+                "range": {
+                    "sheetId": self.id,
+                    "startRowIndex": self.y0,
+                    "endRowIndex": self.y0 + self.h,
+                    "startColumnIndex": self.x0,
+                    "endColumnIndex": self.x0 + self.w,
+                },
+                "cell": {"userEnteredFormat": self.cell_format},
+                "fields": FORMAT_FIELDS,
+            }
+        }
+
+
 class WriteData(Operation):
-    def __init__(self, id_: int, values: List[List[Any]]) -> None:
+    """
+    Writes values only, formatting is applied to whole ranges with `FormatCells`.
+    """
+
+    def __init__(self, id_: int, values: List[List[Any]], start_row: int = 0) -> None:
         self.id = id_
         self.values = values
+        self.start_row = start_row
 
-    def _values_to_rows(self, values: List[List[Any]]) -> List[Dict[str, Any]]:
-        return [{"values": self._row_to_cells(row, i == 0)} for i, row in enumerate(values)]
-
-    def _row_to_cells(self, row: List[Any], is_header: bool) -> List[Dict[str, Any]]:
-        return [self._value_to_cell(value, is_header) for value in row]
+    def split(self) -> List["WriteData"]:
+        middle = len(self.values) // 2
+        return [
+            WriteData(self.id, self.values[:middle], self.start_row),
+            WriteData(self.id, self.values[middle:], self.start_row + middle),
+        ]
 
-    def _value_to_cell(self, value: Any, is_header: bool) -> Dict[str, Any]:
-        header_style = {
-            "horizontalAlignment": "CENTER",
-            "verticalAlignment": "MIDDLE",
-            "textFormat": {
-                "bold": True,
-            },
-        }
-        regular_style = {
-            "horizontalAlignment": "LEFT",
-            "verticalAlignment": "MIDDLE",
-            "textFormat": {
-                "bold": False,
-            },
-        }
+    def _values_to_rows(self, values: List[List[Any]]) -> List[Dict[str, Any]]:
+        return [{"values": [self._value_to_cell(value) for value in row]} for row in values]
 
-        current_style = deepcopy(header_style if is_header else regular_style)
-        serialized_value = self._serialize_value(value)
-        return {
-            "userEnteredValue": {"formulaValue": serialized_value}
-            if serialized_value.startswith("=")
-            else {"stringValue": serialized_value},
-            "userEnteredFormat": current_style,
-        }
+    def _value_to_cell(self, value: Any) -> Dict[str, Any]:
+        serialized_value = self.serialize_value(value)
+        if serialized_value.startswith("="):
+            return {"userEnteredValue": {"formulaValue": serialized_value}}
+        return {"userEnteredValue": {"stringValue": serialized_value}}
 
-    def _serialize_value(self, value: Any) -> str:
+    @staticmethod
+    def serialize_value(value: Any) -> str:
+        """
+        Value as it is entered into the cell, and read back with the FORMULA value render option.
+        """
         if not isinstance(value, str):
             return str(value)
         if value.startswith("https://"):
@@ -124,16 +163,71 @@ class WriteData(Operation):
         return {
             "updateCells": {
                 "rows": self._values_to_rows(self.values),
-                "fields": "*",
+                "fields": "userEnteredValue",
                 "start": {
                     "sheetId": self.id,
-                    "rowIndex": 0,
+                    "rowIndex": self.start_row,
                     "columnIndex": 0,
                 },
             }
         }
 
 
+class WriteValues(WriteData):
+    """
+    Writes values with the values api as a plain 2D array parsed as if typed by a user,
+    so numbers stay numbers and URLs become links.
+    """
+
+    method = "values.batchUpdate"
+
+    def __init__(self, id_: int, title: str, values: List[List[Any]], start_row: int = 0) -> None:
+        super().__init__(id_, values, start_row)
+        self.title = title
+
+    def split(self) -> List["WriteData"]:
+        middle = len(self.values) // 2
+        return [
+            WriteValues(self.id, self.title, self.values[:middle], self.start_row),
+            WriteValues(self.id, self.title, self.values[middle:], self.start_row + middle),
+        ]
+
+    @staticmethod
+    def to_user_entered(value: Any) -> Any:
+        if value is None:
+            return ""
+        if isinstance(value, str):
+            return WriteData.serialize_value(value)
+        return value
+
+    def to_dict(self) -> Dict[str, Any]:
+        title = self.title.replace("'", "''")
+        return {
+            "range": f"'{title}'!A{self.start_row + 1}",
+            "values": [[self.to_user_entered(value) for value in row] for row in self.values],
+        }
+
+
+class ClearRows(Operation):
+    def __init__(self, id_: int, start_row: int, end_row: int) -> None:
+        self.id = id_
+        self.start_row = start_row
+        self.end_row = end_row
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "updateCells": {
+                "rows": [],
+                "fields": "*",
+                "range": {
+                    "sheetId": self.id,
+                    "startRowIndex": self.start_row,
+                    "endRowIndex": self.end_row,
+                },
+            }
+        }
+
+
 class MergeCells(Operation):
     def __init__(self, id_: int, row_id: int, height: int, column_id: int):
         self.id = id_
@@ -1,33 +1,292 @@
-from typing import Dict, Union, List
+import json
+from concurrent.futures import ThreadPoolExecutor
+from os import replace
+from pathlib import Path
+from threading import Lock
+from time import sleep
+from typing import Dict, Union, List, Any, Iterator, Optional, Set, Tuple, Callable
 
-from googleapiclient.discovery import build, Resource  # type: ignore
-from httplib2 import Http  # type: ignore
-from oauth2client.service_account import ServiceAccountCredentials  # type: ignore
+from cars.config import get_app_config
+from cars.domain.data_collectors.transport import RetryPolicy, RETRY_STATUSES
+from cars.domain.google_sheets_integration.backend import SheetsBackend, SheetsApiError
+from cars.domain.google_sheets_integration.operations import Operation, WriteData, DeleteSheet
+from cars.exceptions import SheetsRequestError
+from cars.metrics import get_metrics
 
-from cars.domain.google_sheets_integration.operations import Operation
+# body of a single api call: {"method": "batchUpdate" or "values.batchUpdate", "requests": [...]}
+ChunkT = Dict[str, Any]
+# bodies sent one by one
+ChainT = List[ChunkT]
+# chains of a phase are sent concurrently, phases one after another
+PhaseT = List[ChainT]
+# phase, chain and body positions of an applied body
+ChunkIdT = Tuple[int, int, int]
+# api method, request and its size
+_RequestT = Tuple[str, Dict[str, Any], int]
+
+# partial response masks of reads, a full spreadsheet resource has properties and formats of every sheet
+SPREADSHEET_FIELDS = "sheets.properties(sheetId,title)"
+VALUES_FIELDS = "valueRanges.values"
+
+
+def _get_requests(operation: Operation, max_chunk_bytes: int) -> Iterator[Tuple[Dict[str, Any], int]]:
+    request = operation.to_dict()
+    size = len(json.dumps(request))
+    if size > max_chunk_bytes and isinstance(operation, WriteData) and len(operation.values) > 1:
+        for part in operation.split():
+            yield from _get_requests(part, max_chunk_bytes)
+        return
+    yield request, size
+
+
+def _get_chain(requests: List[_RequestT], max_chunk_bytes: int) -> ChainT:
+    """
+    Bodies of consecutive requests, a body has requests of a single api method.
+    """
+    chain: ChainT = []
+    chunk_size = 0
+    for method, request, size in requests:
+        if not chain or chain[-1]["method"] != method or chunk_size + size > max_chunk_bytes:
+            chain.append({"method": method, "requests": []})
+            chunk_size = 0
+        chain[-1]["requests"].append(request)
+        chunk_size += size
+    return chain
+
+
+def _plan_phase(sheets_requests: List[List[_RequestT]], max_chunk_bytes: int) -> PhaseT:
+    """
+    Requests of sheets that fit into a body and use a single api method are packed into bodies shared with other sheets,
+    every other sheet gets a chain of its own.
+    Chains of a phase never change the same sheet.
+    """
+    chains: PhaseT = []
+    # the body still open for requests of every method and its size
+    shared: Dict[str, Tuple[ChunkT, int]] = {}
+    for requests in sheets_requests:
+        methods = {method for method, _, _ in requests}
+        size = sum(request_size for _, _, request_size in requests)
+        if len(methods) > 1 or size > max_chunk_bytes:
+            chains.append(_get_chain(requests, max_chunk_bytes))
+            continue
+        (method,) = methods
+        chunk, chunk_size = shared.get(method, ({}, 0))
+        if not chunk or chunk_size + size > max_chunk_bytes:
+            chunk, chunk_size = {"method": method, "requests": []}, 0
+            chains.append([chunk])
+        chunk["requests"].extend(request for _, request, _ in requests)
+        shared[method] = chunk, chunk_size + size
+    return chains
+
+
+def plan_chunks(operations: List[Operation], max_chunk_bytes: int) -> List[PhaseT]:
+    """
+    Split operations into api call bodies of at most `max_chunk_bytes`, grouped into phases of concurrent chains.
+    Requests of a sheet keep the order operations were added in, small sheets share bodies,
+    data too large for a single body is written by several bodies of consecutive rows.
+    Values written with the values api are sent by a phase of their own, so every sheet shares the same bodies:
+    structural requests of a sheet added before its values are sent before it, the ones added after, like formats
+    and merges of written cells, after it.
+    Deleted sheets are removed by the last phase, once every other sheet is added,
+    as a spreadsheet can't be left without sheets.
+    """
+    before_values: Dict[int, List[_RequestT]] = {}
+    values: List[_RequestT] = []
+    after_values: Dict[int, List[_RequestT]] = {}
+    deleted: Dict[int, List[_RequestT]] = {}
+    for operation in operations:
+        if isinstance(operation, DeleteSheet):
+            sheet_requests = deleted.setdefault(operation.id, [])
+        elif operation.method == "values.batchUpdate":
+            sheet_requests = values
+            after_values.setdefault(operation.id, [])
+        elif operation.id in after_values:
+            sheet_requests = after_values[operation.id]
+        else:
+            sheet_requests = before_values.setdefault(operation.id, [])
+        for request, size in _get_requests(operation, max_chunk_bytes):
+            sheet_requests.append((operation.method, request, size))
+
+    phases = [
+        _plan_phase(list(before_values.values()), max_chunk_bytes),
+        # value ranges never overlap, so bodies are split only by size and sent concurrently
+        [[chunk] for chunk in _get_chain(values, max_chunk_bytes)],
+        _plan_phase([requests for requests in after_values.values() if requests], max_chunk_bytes),
+        _plan_phase(list(deleted.values()), max_chunk_bytes),
+    ]
+    return [phase for phase in phases if phase]
+
+
+class BatchUpdateJournal:
+    """
+    Planned api call bodies of a run and the ones already applied, so a failed run can be resumed.
+    Bodies are written once, every applied one is appended to a separate progress file.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.progress_path = path.with_name(f"{path.name}.progress")
+        self._lock = Lock()
+
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def start(self, spreadsheet_id: str, phases: List[PhaseT]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.progress_path.write_text("", encoding="utf-8")
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"spreadsheet_id": spreadsheet_id, "phases": phases}), encoding="utf-8")
+        replace(tmp_path, self.path)
+
+    def load(self) -> Tuple[str, List[PhaseT], Set[ChunkIdT]]:
+        data = json.loads(self.path.read_text(encoding="utf-8"))
+        committed: Set[ChunkIdT] = set()
+        if self.progress_path.exists():
+            for line in self.progress_path.read_text(encoding="utf-8").splitlines():
+                phase_id, chain_id, chunk_id = line.split()
+                committed.add((int(phase_id), int(chain_id), int(chunk_id)))
+        return data["spreadsheet_id"], data["phases"], committed
+
+    def commit(self, chunk_id: ChunkIdT) -> None:
+        with self._lock, self.progress_path.open("a", encoding="utf-8") as progress_file:
+            progress_file.write("{} {} {}\n".format(*chunk_id))
+
+    def clear(self) -> None:
+        for path in (self.path, self.progress_path):
+            if path.exists():
+                path.unlink()
 
 
 class SheetsRequests:
-    def __init__(self, credentials_path: str, spreadsheet_id: str):
-        scopes = ["https://www.googleapis.com/auth/spreadsheets"]
-        creds_service = ServiceAccountCredentials.from_json_keyfile_name(credentials_path, scopes).authorize(Http())
-        service = build("sheets", "v4", http=creds_service)
-        self.spreadsheets: Resource = service.spreadsheets()
+    def __init__(self, backend: SheetsBackend, spreadsheet_id: str, journal_path: Optional[Path] = None):
+        self.backend = backend
         self.operations: List[Operation] = []
         self.spreadsheet_id = spreadsheet_id
+        self.journal = BatchUpdateJournal(journal_path) if journal_path is not None else None
+        app_config = get_app_config()
+        self.config = app_config.sheets
+        self.retry_policy = RetryPolicy(app_config.http)
 
     def add_operation(self, operation: Operation) -> None:
         self.operations.append(operation)
 
-    def execute(self):
-        data = {
-            "requests": [operation.to_dict() for operation in self.operations],
-            "includeSpreadsheetInResponse": False,
-        }
-        self.spreadsheets.batchUpdate(spreadsheetId=self.spreadsheet_id, body=data).execute()
+    def execute(self) -> None:
+        """
+        Send added operations in size bounded chunks, see `plan_chunks`.
+        If some chunks fail, the rest of their chains and later phases are not sent and `SheetsRequestError` is raised,
+        with a journal the run can be continued by `resume`.
+        """
+        phases = plan_chunks(self.operations, self.config.max_chunk_bytes)
+        if self.journal is not None:
+            self.journal.start(self.spreadsheet_id, phases)
+        self.operations = []
+        self._run(phases, set())
+
+    def resume(self) -> None:
+        """
+        Send chunks of a failed `execute` left in the journal.
+        """
+        if self.journal is None or not self.journal.exists():
+            raise SheetsRequestError("Nothing to resume")
+        spreadsheet_id, phases, committed = self.journal.load()
+        if spreadsheet_id != self.spreadsheet_id:
+            raise SheetsRequestError(f"Journal was written for spreadsheet {spreadsheet_id}")
+        self._run(phases, committed)
+
+    def _run(self, phases: List[PhaseT], committed: Set[ChunkIdT]) -> None:
+        for phase_id, chains in enumerate(phases):
+            with ThreadPoolExecutor(self.config.workers) as executor:
+                results = list(
+                    executor.map(
+                        self._run_chain, [phase_id] * len(chains), range(len(chains)), chains, [committed] * len(chains)
+                    )
+                )
+            errors = [error for error in results if error is not None]
+            if errors:
+                message = f"{len(errors)} of {len(chains)} update chains failed: {errors[0]}"
+                if self.journal is not None:
+                    message += f". Progress is saved to {self.journal.path}"
+                raise SheetsRequestError(message)
+        if self.journal is not None:
+            self.journal.clear()
+
+    def _run_chain(
+        self, phase_id: int, chain_id: int, chain: ChainT, committed: Set[ChunkIdT]
+    ) -> Optional[SheetsRequestError]:
+        for chunk_id, chunk in enumerate(chain):
+            if (phase_id, chain_id, chunk_id) in committed:
+                continue
+            try:
+                self._send(chunk)
+            except SheetsRequestError as ex:
+                return ex
+            if self.journal is not None:
+                self.journal.commit((phase_id, chain_id, chunk_id))
+        return None
+
+    def _call_backend(self, method: str, call: Callable[..., Dict[str, Any]], *args: Any) -> Dict[str, Any]:
+        """
+        Make a backend call counted in the run metrics.
+        """
+        metrics = get_metrics()
+        status = "ok"
+        try:
+            with metrics.timer("sheets_request_seconds", method=method):
+                return call(self.spreadsheet_id, *args)
+        except SheetsApiError as ex:
+            status = str(ex.status or "error")
+            raise
+        finally:
+            metrics.inc("sheets_requests_total", method=method, status=status)
+
+    def _call(self, chunk: ChunkT) -> None:
+        data: Dict[str, Any]
+        if chunk["method"] == "values.batchUpdate":
+            data = {
+                "valueInputOption": "USER_ENTERED",
+                "data": chunk["requests"],
+            }
+            call = self.backend.values_batch_update
+        else:
+            data = {
+                "requests": chunk["requests"],
+                "includeSpreadsheetInResponse": False,
+            }
+            call = self.backend.batch_update
+        get_metrics().inc("sheets_payload_bytes_total", len(json.dumps(data)), method=chunk["method"])
+        self._call_backend(chunk["method"], call, data)
+
+    def _send(self, chunk: ChunkT) -> None:
+        attempt = 0
+        while True:
+            try:
+                self._call(chunk)
+                return
+            except SheetsApiError as ex:
+                # no status means no response, worth retrying as well
+                is_retryable = ex.status is None or ex.status in RETRY_STATUSES
+                if not is_retryable or not self.retry_policy.can_retry(attempt):
+                    raise SheetsRequestError(f"{chunk['method']} error: {ex}") from ex
+                retry_after = ex.retry_after
+
+            delay = self.retry_policy.get_delay(attempt, retry_after)
+            get_metrics().inc("sheets_retries_total", method=chunk["method"])
+            get_metrics().inc("sheets_retry_wait_seconds_total", delay, method=chunk["method"])
+            sleep(delay)
+            attempt += 1
+
+    def get_values(self, titles: List[str]) -> Dict[str, List[List[Any]]]:
+        """
+        Current values of whole sheets, formulas as they were entered, read by a single request.
+        """
+        if not titles:
+            return {}
+        ranges = ["'{}'".format(title.replace("'", "''")) for title in titles]
+        resp = self._call_backend("values.batchGet", self.backend.values_batch_get, ranges, "FORMULA", VALUES_FIELDS)
+        return {title: value_range.get("values", []) for title, value_range in zip(titles, resp["valueRanges"])}
 
     def get_sheets_data(self) -> Dict[str, Dict[str, Union[int, bool]]]:
-        resp = self.spreadsheets.get(spreadsheetId=self.spreadsheet_id).execute()
+        resp = self._call_backend("get", self.backend.get_spreadsheet, SPREADSHEET_FIELDS)
         return {
             sheet["properties"]["title"]: {
                 "id": sheet["properties"]["sheetId"],
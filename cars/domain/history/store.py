@@ -0,0 +1,103 @@
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, Tuple
+
+from cars.domain.data_collectors.collectors import CarDataT
+
+# an advert found for several cars of a run, like a generation and the whole model, is stored for each of them
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS observations (
+    url TEXT NOT NULL,
+    observed_at TEXT NOT NULL,
+    brand TEXT NOT NULL,
+    model TEXT NOT NULL,
+    generation TEXT NOT NULL,
+    price INTEGER NOT NULL,
+    year INTEGER NOT NULL,
+    days_on_sale INTEGER NOT NULL,
+    body_type TEXT NOT NULL,
+    PRIMARY KEY (url, observed_at, brand, model, generation)
+);
+CREATE INDEX IF NOT EXISTS observations_car ON observations (brand, model, generation, observed_at);
+PRAGMA user_version = 1;
+"""
+# version 0 was keyed by url and time only
+_MIGRATE_FROM_V0 = """
+ALTER TABLE observations RENAME TO observations_v0;
+DROP INDEX observations_car;
+"""
+_COPY_FROM_V0 = """
+INSERT INTO observations SELECT * FROM observations_v0;
+DROP TABLE observations_v0;
+"""
+_INSERT = (
+    "INSERT OR REPLACE INTO observations "
+    "(url, observed_at, brand, model, generation, price, year, days_on_sale, body_type) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+# rows of a car inserted at once by `track`
+TRACK_BATCH_SIZE = 500
+
+ObservationT = Tuple[str, str, str, str, str, int, int, int, str]
+
+
+class HistoryStore:
+    """
+    SQLite database with every advert observed by collect runs.
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(path)
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        is_v0 = (
+            version == 0
+            and self.connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'observations'"
+            ).fetchone()
+        )
+        if is_v0:
+            self.connection.executescript(f"BEGIN;{_MIGRATE_FROM_V0}{_SCHEMA}{_COPY_FROM_V0}COMMIT;")
+        else:
+            self.connection.executescript(_SCHEMA)
+
+    def add_observations(
+        self, brand: str, model: str, generation: str, car_data: Iterable[CarDataT], observed_at: datetime
+    ) -> None:
+        observed_at_str = _format_time(observed_at)
+        # one transaction per car
+        with self.connection:
+            self.connection.executemany(
+                _INSERT,
+                (
+                    (url, observed_at_str, brand, model, generation, price, year, days_on_sale, body_type)
+                    for price, year, url, days_on_sale, body_type in car_data
+                ),
+            )
+
+    def track(
+        self, brand: str, model: str, generation: str, car_data: Iterable[CarDataT], observed_at: datetime
+    ) -> Iterator[CarDataT]:
+        """
+        Pass adverts through, storing them by batches of `TRACK_BATCH_SIZE`, so the car is stored as it is read
+        by another consumer. The car is committed once every advert is read, nothing is stored if reading fails.
+        """
+        observed_at_str = _format_time(observed_at)
+        batch: List[ObservationT] = []
+        with self.connection:
+            for row in car_data:
+                price, year, url, days_on_sale, body_type = row
+                batch.append((url, observed_at_str, brand, model, generation, price, year, days_on_sale, body_type))
+                if len(batch) >= TRACK_BATCH_SIZE:
+                    self.connection.executemany(_INSERT, batch)
+                    batch.clear()
+                yield row
+            self.connection.executemany(_INSERT, batch)
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+def _format_time(observed_at: datetime) -> str:
+    return observed_at.replace(microsecond=0).isoformat(sep=" ")
@@ -26,5 +26,9 @@ class ApiRequestError(NetworkError):
     pass
 
 
+class SheetsRequestError(NetworkError):
+    pass
+
+
 class InvalidConstantValue(ProjectError):
     pass
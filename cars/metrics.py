@@ -0,0 +1,159 @@
+import json
+from contextlib import contextmanager
+from os import replace
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+from typing import Dict, Any, List, Tuple, Iterator, Optional
+
+# sorted (label, value) pairs
+LabelsT = Tuple[Tuple[str, str], ...]
+MetricKeyT = Tuple[str, LabelsT]
+
+PROMETHEUS_PREFIX = "cars_"
+QUANTILES = (0.5, 0.9, 0.99)
+
+
+def _get_key(name: str, labels: Dict[str, Any]) -> MetricKeyT:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _get_quantile(sorted_values: List[float], quantile: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(quantile * len(sorted_values)))]
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_sample(name: str, labels: LabelsT, value: float) -> str:
+    if labels:
+        rendered = ",".join(f'{label}="{_escape_label_value(label_value)}"' for label, label_value in labels)
+        return f"{PROMETHEUS_PREFIX}{name}{{{rendered}}} {value!r}"
+    return f"{PROMETHEUS_PREFIX}{name} {value!r}"
+
+
+class Metrics:
+    """
+    Counters, gauges and timings of a run, safe to update from several threads.
+    Every metric is identified by its name and labels, timings keep all observed values
+    so the report can tell quantiles.
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.counters: Dict[MetricKeyT, float] = {}
+        self.gauges: Dict[MetricKeyT, float] = {}
+        self.observations: Dict[MetricKeyT, List[float]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        key = _get_key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels: Any) -> None:
+        key = _get_key(name, labels)
+        with self._lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels: Any) -> None:
+        key = _get_key(name, labels)
+        with self._lock:
+            self.observations.setdefault(key, []).append(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """
+        Observe seconds spent in the block, failed blocks included.
+        """
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start, **labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters = {}
+            self.gauges = {}
+            self.observations = {}
+
+    def get_report(self) -> Dict[str, Any]:
+        """
+        Metrics grouped by name: counter and gauge values and summaries of timings.
+        """
+        report: Dict[str, Dict[str, List[Dict[str, Any]]]] = {"counters": {}, "gauges": {}, "summaries": {}}
+        with self._lock:
+            for kind, values in (("counters", self.counters), ("gauges", self.gauges)):
+                for (name, labels), value in sorted(values.items()):
+                    report[kind].setdefault(name, []).append({"labels": dict(labels), "value": value})
+            for (name, labels), observed in sorted(self.observations.items()):
+                sorted_values = sorted(observed)
+                summary: Dict[str, Any] = {
+                    "labels": dict(labels),
+                    "count": len(sorted_values),
+                    "sum": sum(sorted_values),
+                    "min": sorted_values[0],
+                    "max": sorted_values[-1],
+                }
+                summary.update((f"p{int(q * 100)}", _get_quantile(sorted_values, q)) for q in QUANTILES)
+                report["summaries"].setdefault(name, []).append(summary)
+        return report
+
+    def render_prometheus(self) -> str:
+        """
+        Metrics in the Prometheus text format, timings as summaries.
+        """
+        lines: List[str] = []
+        report = self.get_report()
+        for kind, metric_type in (("counters", "counter"), ("gauges", "gauge")):
+            for name, samples in report[kind].items():
+                lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} {metric_type}")
+                for sample in samples:
+                    lines.append(_format_sample(name, tuple(sample["labels"].items()), sample["value"]))
+        for name, summaries in report["summaries"].items():
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}{name} summary")
+            for summary in summaries:
+                labels = tuple(summary["labels"].items())
+                for quantile in QUANTILES:
+                    lines.append(
+                        _format_sample(
+                            name, labels + (("quantile", str(quantile)),), summary[f"p{int(quantile * 100)}"]
+                        )
+                    )
+                lines.append(_format_sample(f"{name}_sum", labels, summary["sum"]))
+                lines.append(_format_sample(f"{name}_count", labels, summary["count"]))
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path: Path, **extra: Any) -> None:
+        """
+        Write the JSON run report, `extra` fields are added to its top level.
+        """
+        report = dict(extra)
+        report.update(self.get_report())
+        _write_atomically(path, json.dumps(report, ensure_ascii=False, indent=2))
+
+    def write_prometheus(self, path: Path) -> None:
+        """
+        Write a textfile for the node exporter textfile collector, replaced at once so it is never read half written.
+        """
+        _write_atomically(path, self.render_prometheus())
+
+
+def _write_atomically(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    replace(tmp_path, path)
+
+
+_METRICS: Optional[Metrics] = None
+_METRICS_LOCK = Lock()
+
+
+def get_metrics() -> Metrics:
+    global _METRICS
+    with _METRICS_LOCK:
+        if _METRICS is None:
+            _METRICS = Metrics()
+    return _METRICS
@@ -0,0 +1,86 @@
+import random
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple, TYPE_CHECKING
+
+import pytest
+
+import cars.config
+from cars.domain.data_collectors.batch import CarJob
+from cars.domain.data_collectors.collectors import CarDataT
+from cars.domain.google_sheets_integration.fake_backend import InMemorySheetsBackend
+
+if TYPE_CHECKING:
+    from cars.config.app import AppConfig
+
+CONFIG_ROOT = Path(__file__).parents[2] / "config"
+
+ResultsT = List[Tuple[CarJob, List[CarDataT]]]
+SheetsStateT = Dict[str, Tuple[List[List[Any]], List[Any]]]
+
+
+def get_state(backend: InMemorySheetsBackend) -> SheetsStateT:
+    """
+    Values and merged ranges of every sheet by title.
+    """
+    return {sheet.title: (sheet.get_values(), sorted(sheet.merges)) for sheet in backend.sheets.values()}
+
+
+def get_text_state(backend: InMemorySheetsBackend) -> SheetsStateT:
+    """
+    State with values as text, the values api keeps numbers numeric.
+    """
+    return {
+        title: ([[str(value) for value in row] for row in values], merges)
+        for title, (values, merges) in get_state(backend).items()
+    }
+
+
+@pytest.fixture
+def set_app_config(monkeypatch: pytest.MonkeyPatch) -> Callable[..., "AppConfig"]:
+    """
+    Use the app config of the repository with sections updated by keyword arguments.
+    """
+    import yaml
+
+    from cars.config.app import AppConfig
+
+    def set_config(**updates: Dict[str, Any]) -> "AppConfig":
+        data = yaml.full_load((CONFIG_ROOT / "config.yaml").read_text(encoding="utf-8"))
+        for section, values in updates.items():
+            data[section] = {**data.get(section, {}), **values}
+        config = AppConfig(**data)
+        monkeypatch.setattr(cars.config, "_APP_CONFIG", config)
+        return config
+
+    return set_config
+
+
+@pytest.fixture
+def app_config(set_app_config: Callable[..., "AppConfig"]) -> "AppConfig":
+    return set_app_config()
+
+
+@pytest.fixture
+def make_results() -> Callable[..., ResultsT]:
+    """
+    Collected data of `cars_count` cars with `rows_count` adverts each, brands of ten models.
+    """
+
+    def make(cars_count: int, rows_count: int, seed: int = 0) -> ResultsT:
+        rnd = random.Random(seed)
+        results: ResultsT = []
+        for i in range(cars_count):
+            rows = [
+                (
+                    rnd.randint(1000, 30000),
+                    rnd.randint(1990, 2022),
+                    f"https://cars.av.by/brand/model/{100000000 + i * rows_count + j}",
+                    rnd.randint(1, 300),
+                    rnd.choice(["купе", "седан", "лифтбек"]),
+                )
+                for j in range(rows_count)
+            ]
+            results.append((CarJob(f"Brand {i // 10}", f"Model {i % 10}", "", None), rows))
+        return results
+
+    return make
@@ -0,0 +1,38 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+# loaded only by commands that collect or write data
+HEAVY_MODULES = ("xlwt", "requests", "googleapiclient", "pydantic", "yaml")
+
+IMPORT_RUNNER = """
+import json
+import sys
+
+import cars.cli
+import cars.config
+
+print(json.dumps({
+    "modules": [name for name in %r if name in sys.modules],
+    "config_loaded": cars.config._APP_CONFIG is not None or cars.config._CARS_CONFIG is not None,
+}))
+"""
+
+
+def test_cli_import_is_lazy(tmp_path: Path) -> None:
+    env = dict(os.environ)
+    env.pop("CONFIG_PATH", None)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [str(Path(__file__).parents[2]), env.get("PYTHONPATH")]))
+    # no config in an empty directory, reading it on import fails the run
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_RUNNER % (HEAVY_MODULES,)],
+        cwd=tmp_path,
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    result = json.loads(output)
+    assert result == {"modules": [], "config_loaded": False}
@@ -0,0 +1,51 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+
+pytest.importorskip("numpy")
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+from cars.cli.sinks import ParquetSink  # noqa: E402
+from cars.domain.data_collectors.collectors import CarDataT  # noqa: E402
+from cars.domain.data_collectors.columnar import CarDataColumns  # noqa: E402
+
+ROWS: List[CarDataT] = [
+    (12000, 2015, "https://cars.av.by/1", 10, "седан"),
+    (9000, 2012, "https://cars.av.by/2", 3, "купе"),
+    (15000, 2018, "https://cars.av.by/3", 40, "седан"),
+    (7000, 2009, "https://cars.av.by/4", 1, "лифтбек"),
+]
+
+
+def test_arrow_table_keeps_rows() -> None:
+    columns = CarDataColumns.from_rows(iter(ROWS))
+
+    table = columns.to_arrow()
+
+    assert len(columns) == len(ROWS)
+    assert table.column("body_type").type == pa.dictionary(pa.uint16(), pa.string())
+    assert [tuple(row.values()) for row in table.to_pylist()] == ROWS
+
+
+def test_empty_rows() -> None:
+    columns = CarDataColumns.from_rows([])
+
+    assert len(columns) == 0
+    assert columns.to_arrow().num_rows == 0
+
+
+def test_parquet_sink_writes_full_row_groups(tmp_path: Path) -> None:
+    filename = tmp_path / "cars.parquet"
+    sink = ParquetSink(str(filename), row_group_size=3)
+    sink.add_car_data("Audi", "A4", "B8", ROWS[:2])
+    sink.add_car_data("Audi", "A6", "", iter(ROWS))
+    sink.add_car_data("BMW", "X5", "", [])
+    sink.save()
+
+    parquet_file = pq.ParquetFile(filename)
+    assert [parquet_file.metadata.row_group(i).num_rows for i in range(parquet_file.num_row_groups)] == [3, 3]
+    assert [tuple(row.values()) for row in parquet_file.read().to_pylist()] == [
+        ("Audi", "A4", "B8", *row) for row in ROWS[:2]
+    ] + [("Audi", "A6", "", *row) for row in ROWS]
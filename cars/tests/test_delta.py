@@ -0,0 +1,100 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import pytest
+
+from cars.domain.data_collectors.collectors import CarDataT
+from cars.domain.data_collectors.delta import KnownAdvertsT, crawl_delta
+
+
+def get_row(url: str, price: int = 10000) -> CarDataT:
+    return (price, 2015, url, 10, "седан")
+
+
+class StubParser:
+    """
+    Parser of pages given newest first, `count` is the total count reported by the api.
+    """
+
+    brand = "Audi"
+    model = "A4"
+
+    def __init__(self, pages: List[List[CarDataT]], count: Optional[int]) -> None:
+        self.pages = pages
+        self.count = count
+        self.loaded_pages: List[int] = []
+        self.loaded_all = False
+
+    def get_page_response(self, page_id: int, sorting: Optional[int] = None) -> Dict[str, Any]:
+        self.loaded_pages.append(page_id)
+        response_data: Dict[str, Any] = {"page": page_id}
+        if self.count is not None:
+            response_data["count"] = self.count
+        return response_data
+
+    def parse_page(self, response_data: Dict[str, Any]) -> Tuple[List[CarDataT], int]:
+        return self.pages[response_data["page"] - 1], len(self.pages)
+
+    @property
+    def car_data(self) -> List[CarDataT]:
+        self.loaded_all = True
+        return [row for page in self.pages for row in page]
+
+
+def get_known(*urls: str) -> KnownAdvertsT:
+    return {url: 10000 for url in urls}
+
+
+PAGES = [
+    [get_row("new"), get_row("k1")],
+    [get_row("k2", 9000), get_row("k3")],
+    [get_row("k4"), get_row("k5")],
+]
+
+
+def test_stops_at_first_known_page(app_config: Any) -> None:
+    parser = StubParser(PAGES, count=6)
+
+    report = crawl_delta(parser, get_known("k1", "k2", "k3", "k4", "k5"))  # type: ignore[arg-type]
+
+    assert parser.loaded_pages == [1, 2]
+    assert not parser.loaded_all
+    assert not report.is_full
+    assert report.new == [get_row("new")]
+    assert report.price_changed == [("k2", 10000, 9000)]
+    assert report.removed == []
+    assert report.known == {**get_known("new", "k1", "k3", "k4", "k5"), "k2": 9000}
+    assert report.warning is None
+
+
+def test_count_mismatch_loads_every_page(app_config: Any) -> None:
+    parser = StubParser(PAGES, count=6)
+
+    report = crawl_delta(parser, get_known("k1", "k2", "k3", "k4", "k5", "gone"))  # type: ignore[arg-type]
+
+    assert parser.loaded_all
+    assert report.is_full
+    assert report.new == [get_row("new")]
+    assert report.removed == ["gone"]
+    assert "gone" not in report.known
+    assert report.warning is None
+
+
+@pytest.mark.parametrize(
+    "first_page, is_full, warning",
+    [
+        ([get_row("new"), get_row("k1")], False, "removed adverts are reported by the next full run"),
+        ([get_row("new"), get_row("new 2"), get_row("k1")], True, "loading every page"),
+    ],
+    ids=["half_known", "mostly_new"],
+)
+def test_missing_count_depends_on_known_share(
+    app_config: Any, first_page: List[CarDataT], is_full: bool, warning: str
+) -> None:
+    parser = StubParser([first_page, *PAGES[1:]], count=None)
+
+    report = crawl_delta(parser, get_known("k1", "k2", "k3", "k4", "k5", "gone"))  # type: ignore[arg-type]
+
+    assert parser.loaded_all is is_full
+    assert report.is_full is is_full
+    assert report.removed == (["gone"] if is_full else [])
+    assert report.warning is not None and report.warning.endswith(warning)
@@ -0,0 +1,104 @@
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, List
+
+import pytest
+
+from cars.domain.data_collectors.collectors import CarDataT
+from cars.domain.history import store
+from cars.domain.history.store import HistoryStore
+from cars.exceptions import ProjectError
+
+OBSERVED_AT = datetime(2024, 5, 1, 12, 30)
+ROWS: List[CarDataT] = [
+    (12000, 2015, "https://cars.av.by/1", 10, "седан"),
+    (9000, 2012, "https://cars.av.by/2", 3, "купе"),
+    (15000, 2018, "https://cars.av.by/3", 40, "седан"),
+]
+
+
+def read_observations(path: Path) -> List[tuple]:
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(
+            "SELECT brand, model, generation, url, price FROM observations ORDER BY brand, model, generation, url"
+        ).fetchall()
+    finally:
+        connection.close()
+
+
+def test_advert_of_several_cars_is_kept_for_each(tmp_path: Path) -> None:
+    path = tmp_path / "history.db"
+    history = HistoryStore(path)
+    history.add_observations("Audi", "A4", "B8", ROWS[:1], OBSERVED_AT)
+    history.add_observations("Audi", "A4", "", ROWS, OBSERVED_AT)
+    history.close()
+
+    assert read_observations(path) == [
+        ("Audi", "A4", "", "https://cars.av.by/1", 12000),
+        ("Audi", "A4", "", "https://cars.av.by/2", 9000),
+        ("Audi", "A4", "", "https://cars.av.by/3", 15000),
+        ("Audi", "A4", "B8", "https://cars.av.by/1", 12000),
+    ]
+
+
+def test_track_stores_rows_in_batches(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(store, "TRACK_BATCH_SIZE", 2)
+    path = tmp_path / "history.db"
+    history = HistoryStore(path)
+
+    assert list(history.track("Audi", "A4", "", iter(ROWS), OBSERVED_AT)) == ROWS
+    history.close()
+
+    assert [row[3] for row in read_observations(path)] == [row[2] for row in ROWS]
+
+
+def test_failed_car_is_not_stored(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(store, "TRACK_BATCH_SIZE", 2)
+    path = tmp_path / "history.db"
+    history = HistoryStore(path)
+
+    def fail_after_rows() -> Iterator[CarDataT]:
+        yield from ROWS
+        raise ProjectError("page failed")
+
+    with pytest.raises(ProjectError):
+        for _ in history.track("Audi", "A4", "", fail_after_rows(), OBSERVED_AT):
+            pass
+    history.close()
+
+    assert read_observations(path) == []
+
+
+def test_database_keyed_by_url_is_migrated(tmp_path: Path) -> None:
+    path = tmp_path / "history.db"
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        """
+        CREATE TABLE observations (
+            url TEXT NOT NULL,
+            observed_at TEXT NOT NULL,
+            brand TEXT NOT NULL,
+            model TEXT NOT NULL,
+            generation TEXT NOT NULL,
+            price INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            days_on_sale INTEGER NOT NULL,
+            body_type TEXT NOT NULL,
+            PRIMARY KEY (url, observed_at)
+        );
+        CREATE INDEX observations_car ON observations (brand, model, generation, observed_at);
+        INSERT INTO observations VALUES ('https://cars.av.by/1', '2024-05-01 12:30:00', 'Audi', 'A4', 'B8', 12000, 2015, 10, 'седан');
+        """
+    )
+    connection.close()
+
+    history = HistoryStore(path)
+    history.add_observations("Audi", "A4", "", ROWS[:1], OBSERVED_AT)
+    history.close()
+
+    assert read_observations(path) == [
+        ("Audi", "A4", "", "https://cars.av.by/1", 12000),
+        ("Audi", "A4", "B8", "https://cars.av.by/1", 12000),
+    ]
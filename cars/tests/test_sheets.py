@@ -0,0 +1,174 @@
+import json
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+import pytest
+from click.testing import CliRunner
+
+from cars.cli.helpers import add_gsheet_operations, get_write_operations
+from cars.domain.google_sheets_integration.backend import SheetsApiError
+from cars.domain.google_sheets_integration.fake_backend import InMemorySheetsBackend
+from cars.domain.google_sheets_integration.operations import AddSheet, DeleteSheet, Operation, WriteData
+from cars.domain.google_sheets_integration.sheets import BatchUpdateJournal, SheetsRequests, plan_chunks
+from cars.exceptions import SheetsRequestError
+from cars.tests.conftest import ResultsT, get_state, get_text_state
+
+
+class FailingBackend(InMemorySheetsBackend):
+    """
+    Spreadsheet that rejects every batchUpdate after the first `ok_calls` ones.
+    """
+
+    def __init__(self, ok_calls: int) -> None:
+        super().__init__()
+        self.ok_calls = ok_calls
+
+    def batch_update(self, spreadsheet_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+        if self.ok_calls <= 0:
+            raise SheetsApiError("Internal error", 400)
+        self.ok_calls -= 1
+        return super().batch_update(spreadsheet_id, body)
+
+
+def get_sheet_operations(sheet_id: int, rows_count: int) -> List[Operation]:
+    values: List[List[Any]] = [["price", "url"]]
+    values.extend([[1000 + i, f"https://cars.av.by/brand/model/{i}"] for i in range(rows_count)])
+    return [AddSheet(f"Sheet {sheet_id}", sheet_id), *get_write_operations(sheet_id, values)]
+
+
+def get_chunk_size(chunk: Dict[str, Any]) -> int:
+    return sum(len(json.dumps(request)) for request in chunk["requests"])
+
+
+def write(backend: InMemorySheetsBackend, results: ResultsT, journal_path: Path) -> None:
+    requests = SheetsRequests(backend, "spreadsheet", journal_path)
+    add_gsheet_operations(requests, results, lambda *_: None)
+    requests.execute()
+
+
+def test_small_sheets_share_bodies() -> None:
+    operations = [operation for sheet_id in range(1, 11) for operation in get_sheet_operations(sheet_id, 5)]
+
+    phases = plan_chunks(operations, 1024 * 1024)
+
+    assert len(phases) == 1
+    assert phases[0] == [[{"method": "batchUpdate", "requests": [operation.to_dict() for operation in operations]}]]
+
+
+def test_large_sheet_is_split_into_its_own_chain() -> None:
+    small = get_sheet_operations(1, 5)
+    large = get_sheet_operations(2, 500)
+    max_chunk_bytes = 10 * 1024
+
+    (phase,) = plan_chunks(small + large, max_chunk_bytes)
+
+    assert len(phase) == 2
+    assert phase[0] == [{"method": "batchUpdate", "requests": [operation.to_dict() for operation in small]}]
+    assert len(phase[1]) > 1
+    assert all(get_chunk_size(chunk) <= max_chunk_bytes for chunk in phase[1])
+    rows = [
+        row
+        for chunk in phase[1]
+        for request in chunk["requests"]
+        for row in request.get("updateCells", {}).get("rows", [])
+    ]
+    data = large[1]
+    assert isinstance(data, WriteData)
+    assert rows == data.to_dict()["updateCells"]["rows"]
+
+
+def test_deleted_sheets_are_sent_last() -> None:
+    operations = [DeleteSheet(0), *get_sheet_operations(1, 5)]
+
+    phases = plan_chunks(operations, 1024 * 1024)
+
+    assert [[chunk["requests"] for chain in phase for chunk in chain] for phase in phases] == [
+        [[operation.to_dict() for operation in operations[1:]]],
+        [[DeleteSheet(0).to_dict()]],
+    ]
+
+
+def test_last_sheet_is_not_deleted() -> None:
+    backend = InMemorySheetsBackend()
+
+    with pytest.raises(SheetsApiError, match="remove all the sheets"):
+        backend.batch_update("spreadsheet", {"requests": [DeleteSheet(0).to_dict()]})
+    assert list(backend.sheets) == [0]
+
+
+def test_default_sheet_is_replaced(app_config: Any, make_results: Callable[..., ResultsT], tmp_path: Path) -> None:
+    backend = InMemorySheetsBackend()
+
+    write(backend, make_results(3, 5), tmp_path / "journal.json")
+
+    assert sorted(get_state(backend)) == ["Brand 0 Model 0", "Brand 0 Model 1", "Brand 0 Model 2", "Summary"]
+
+
+def test_journal_keeps_applied_chunks(tmp_path: Path) -> None:
+    journal = BatchUpdateJournal(tmp_path / "journal.json")
+    phases = plan_chunks([DeleteSheet(0), *get_sheet_operations(1, 5)], 1024 * 1024)
+
+    journal.start("spreadsheet", phases)
+    journal.commit((0, 0, 0))
+
+    assert journal.load() == ("spreadsheet", phases, {(0, 0, 0)})
+    journal.clear()
+    assert not journal.exists()
+    assert not journal.progress_path.exists()
+
+
+def test_resume_after_failure(
+    set_app_config: Callable[..., Any],
+    make_results: Callable[..., ResultsT],
+    tmp_path: Path,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    set_app_config(sheets={"max_chunk_bytes": 20 * 1024, "workers": 1})
+    results = make_results(12, 50)
+    journal_path = tmp_path / "journal.json"
+    expected = InMemorySheetsBackend()
+    write(expected, results, tmp_path / "expected.json")
+    backend = FailingBackend(ok_calls=2)
+
+    with pytest.raises(SheetsRequestError, match="Progress is saved"):
+        write(backend, results, journal_path)
+    assert get_state(backend) != get_state(expected)
+
+    from cars.cli.collector_google import collecting_group
+
+    backend.ok_calls = 1000
+    monkeypatch.setattr("cars.cli.helpers.get_sheets_backend", lambda _: backend)
+    result = CliRunner().invoke(
+        collecting_group,
+        ["resume", "--journal", str(journal_path)],
+        env={"SPREADSHEET_ID": "spreadsheet", "TOKEN_PATH": "token.json"},
+    )
+
+    assert result.exit_code == 0, result.output
+    assert get_state(backend) == get_state(expected)
+    assert not journal_path.exists()
+
+
+def test_resume_of_another_spreadsheet_fails(app_config: Any, tmp_path: Path) -> None:
+    journal_path = tmp_path / "journal.json"
+    BatchUpdateJournal(journal_path).start("spreadsheet", [])
+
+    with pytest.raises(SheetsRequestError, match="written for spreadsheet spreadsheet"):
+        SheetsRequests(InMemorySheetsBackend(), "another", journal_path).resume()
+
+
+def test_values_api_sheets_share_calls(app_config: Any, make_results: Callable[..., ResultsT]) -> None:
+    results = make_results(100, 20)
+    expected = InMemorySheetsBackend()
+    requests = SheetsRequests(expected, "spreadsheet")
+    add_gsheet_operations(requests, results, lambda *_: None)
+    requests.execute()
+    backend = InMemorySheetsBackend()
+    requests = SheetsRequests(backend, "spreadsheet")
+    add_gsheet_operations(requests, results, lambda *_: None, values_api_sheets=True)
+
+    requests.execute()
+
+    # structural requests, values of every sheet, formats and merges of written cells, the default sheet deleted
+    assert backend.calls == {"get": 1, "batchUpdate": 3, "values.batchUpdate": 1}
+    assert get_text_state(backend) == get_text_state(expected)
@@ -0,0 +1,55 @@
+import json
+from typing import Any, Iterator, List, Tuple
+
+from cars.cli.helpers import get_write_operations
+from cars.domain.data_collectors.collectors import CarsParser
+from cars.domain.google_sheets_integration.operations import WriteData
+
+ROWS_COUNT = 1000
+# bytes a cell may add to its bare value as JSON, about 48 now and 160 with per cell formats
+MAX_CELL_OVERHEAD = 64
+
+
+def get_sheet_values() -> List[List[Any]]:
+    values: List[List[Any]] = [list(CarsParser.columns_order)]
+    for i in range(ROWS_COUNT):
+        values.append(
+            [
+                10000 + i * 7 % 20000,
+                1990 + i % 33,
+                f"https://cars.av.by/ford/probe/{100000000 + i}",
+                1 + i % 300,
+                ("купе", "седан", "лифтбек")[i % 3],
+            ]
+        )
+    return values
+
+
+def iter_items(data: Any) -> Iterator[Tuple[str, Any]]:
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield key, value
+            yield from iter_items(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from iter_items(value)
+
+
+def test_write_data_size() -> None:
+    values = get_sheet_values()
+    cells_count = sum(len(row) for row in values)
+    size = len(json.dumps(WriteData(1, values).to_dict()).encode())
+    assert size <= len(json.dumps(values).encode()) + cells_count * MAX_CELL_OVERHEAD
+
+
+def test_write_data_has_no_cell_formats() -> None:
+    request = WriteData(1, get_sheet_values()).to_dict()
+    keys = {key for key, _ in iter_items(request)}
+    assert "userEnteredFormat" not in keys
+    assert request["updateCells"]["fields"] == "userEnteredValue"
+
+
+def test_sheet_operations_have_no_wildcard_fields() -> None:
+    for operation in get_write_operations(1, get_sheet_values()):
+        fields = [value for key, value in iter_items(operation.to_dict()) if key == "fields"]
+        assert "*" not in fields
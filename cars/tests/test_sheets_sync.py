@@ -0,0 +1,103 @@
+from typing import Any, Callable, List
+
+import pytest
+
+from cars.cli.helpers import add_gsheet_operations, blank_merged_values
+from cars.domain.data_collectors.batch import CarJob
+from cars.domain.google_sheets_integration.fake_backend import InMemorySheetsBackend
+from cars.domain.google_sheets_integration.sheets import SheetsRequests
+from cars.tests.conftest import ResultsT, get_state
+
+WRITE_METHODS = ("batchUpdate", "values.batchUpdate")
+
+
+@pytest.fixture(params=[False, True], ids=["update_cells", "values_api"])
+def values_api(request: pytest.FixtureRequest) -> bool:
+    return request.param
+
+
+@pytest.fixture
+def results(app_config: Any, make_results: Callable[..., ResultsT]) -> ResultsT:
+    return make_results(12, 10)
+
+
+def write(backend: InMemorySheetsBackend, results: ResultsT, values_api: bool, sync: bool = False) -> None:
+    requests = SheetsRequests(backend, "spreadsheet")
+    add_gsheet_operations(requests, results, lambda *_: None, sync=sync, values_api_sheets=values_api)
+    requests.execute()
+
+
+def synced(results: ResultsT, changed_results: ResultsT, values_api: bool) -> InMemorySheetsBackend:
+    backend = InMemorySheetsBackend()
+    write(backend, results, values_api)
+    backend.calls.clear()
+    write(backend, changed_results, values_api, sync=True)
+    return backend
+
+
+def rewritten(results: ResultsT, values_api: bool) -> InMemorySheetsBackend:
+    backend = InMemorySheetsBackend()
+    write(backend, results, values_api)
+    return backend
+
+
+def with_rows(results: ResultsT, position: int, rows: List[Any]) -> ResultsT:
+    changed = list(results)
+    changed[position] = (changed[position][0], rows)
+    return changed
+
+
+def test_unchanged_sync_writes_nothing(results: ResultsT, values_api: bool) -> None:
+    backend = synced(results, results, values_api)
+
+    assert not set(backend.calls) & set(WRITE_METHODS)
+    assert get_state(backend) == get_state(rewritten(results, values_api))
+
+
+def test_shrunk_sheet_is_cleared(results: ResultsT, values_api: bool) -> None:
+    job, rows = results[3]
+    changed = with_rows(results, 3, rows[:4])
+
+    backend = synced(results, changed, values_api)
+
+    # header and the rows left
+    assert len(backend.get_sheet(f"{job.brand} {job.model}").get_values()) == 5
+    assert get_state(backend) == get_state(rewritten(changed, values_api))
+
+
+def test_grown_sheet_gets_new_rows(results: ResultsT, values_api: bool, make_results: Callable[..., ResultsT]) -> None:
+    job, rows = results[3]
+    _, new_rows = make_results(1, 5, seed=1)[0]
+    changed = with_rows(results, 3, rows + new_rows)
+
+    backend = synced(results, changed, values_api)
+
+    assert len(backend.get_sheet(f"{job.brand} {job.model}").get_values()) == 16
+    assert get_state(backend) == get_state(rewritten(changed, values_api))
+
+
+def test_sync_matches_full_write(results: ResultsT, values_api: bool) -> None:
+    changed = list(results)
+    # a changed price, a car gone, a car with a new brand and one with the same model as the car above
+    job, rows = changed[1]
+    changed[1] = (job, [(rows[0][0] + 1, *rows[0][1:]), *rows[1:]])
+    del changed[5]
+    changed.append((CarJob("Brand 9", "Model 0", "", None), results[0][1]))
+    changed.append((CarJob("Brand 9", "Model 0", "Gen 2", None), results[2][1]))
+
+    backend = synced(results, changed, values_api)
+
+    assert get_state(backend) == get_state(rewritten(changed, values_api))
+    assert "Brand 0 Model 5" not in get_state(backend)
+
+
+def test_blank_merged_values() -> None:
+    values = [["brand", "model"], ["Audi", "A4"], ["Audi", "A4"], ["Audi", "A6"], ["BMW", "X5"]]
+
+    assert blank_merged_values(values, [0, 1]) == [
+        ["brand", "model"],
+        ["Audi", "A4"],
+        ["", ""],
+        ["", "A6"],
+        ["BMW", "X5"],
+    ]
@@ -0,0 +1,79 @@
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Tuple
+from xml.etree import ElementTree
+
+import pytest
+
+pytest.importorskip("xlsxwriter")
+
+from cars.cli.xlsx_collector import XlsxDataCollector  # noqa: E402
+
+NAMESPACE = {"x": "http://schemas.openxmlformats.org/spreadsheetml/2006/main"}
+
+
+def read_first_sheet(filename: Path) -> Tuple[ElementTree.Element, Dict[str, str]]:
+    """
+    Xml of the first sheet and its cell values, formulas by their cached value.
+    """
+    with zipfile.ZipFile(filename) as archive:
+        sheet = ElementTree.fromstring(archive.read("xl/worksheets/sheet1.xml"))
+        shared_strings: List[str] = []
+        if "xl/sharedStrings.xml" in archive.namelist():
+            strings = ElementTree.fromstring(archive.read("xl/sharedStrings.xml"))
+            shared_strings = ["".join(item.itertext()) for item in strings.iterfind("x:si", NAMESPACE)]
+
+    values = {}
+    for cell in sheet.iterfind(".//x:c", NAMESPACE):
+        if cell.get("t") == "inlineStr":
+            text = "".join(cell.itertext())
+        else:
+            text = cell.findtext("x:v", "", NAMESPACE)
+            if text and cell.get("t") == "s":
+                text = shared_strings[int(text)]
+        if text:
+            values[cell.attrib["r"]] = text
+    return sheet, values
+
+
+def test_summary_merges_repeated_brands_and_models(tmp_path: Path) -> None:
+    filename = tmp_path / "cars.xlsx"
+    collector = XlsxDataCollector(str(filename))
+    cars = [
+        ("Audi", "A4", "B8"),
+        ("Audi", "A4", "B9"),
+        ("Audi", "A6", ""),
+        ("BMW", "X5", ""),
+    ]
+    for brand, model, generation in cars:
+        collector.add_car_data(brand, model, generation, [(10000, 2015, "https://cars.av.by/1", 10, "седан")])
+    collector.save()
+
+    sheet, values = read_first_sheet(tmp_path / "cars.summary.xlsx")
+    merged: List[str] = [cell.attrib["ref"] for cell in sheet.iterfind(".//x:mergeCell", NAMESPACE)]
+    assert sorted(merged) == ["A2:A4", "B2:B3"]
+
+    assert "A3" not in values and "A4" not in values and "B3" not in values
+    # merged cells keep the value of their first cell, the rest of the rows is written in full
+    assert {ref: values[ref] for ref in ("A2", "B2", "C3", "B4", "A5")} == {
+        "A2": "Audi",
+        "B2": "A4",
+        "C3": "B9",
+        "B4": "A6",
+        "A5": "BMW",
+    }
+
+
+def test_car_sheets_are_written(tmp_path: Path) -> None:
+    filename = tmp_path / "cars.xlsx"
+    collector = XlsxDataCollector(str(filename))
+    collector.add_car_data("Audi", "A4", "", [(10000, 2015, "https://cars.av.by/1", 10, "седан")])
+    collector.save()
+
+    _, values = read_first_sheet(filename)
+    assert {ref: values[ref] for ref in ("A2", "B2", "C2", "E2")} == {
+        "A2": "10000",
+        "B2": "2015",
+        "C2": "1",
+        "E2": "седан",
+    }